@@ -4,12 +4,22 @@
 from django.conf.urls import url, patterns
 
 from .utils import auto_patterns
-from .views import keep_alive, user_list, delete_user, delete_pending_user, change_user_whitelist
+from .views import (
+    keep_alive,
+    user_list,
+    delete_user,
+    delete_pending_user,
+    change_user_whitelist,
+    cache_stats
+)
 
 # import modules with auto_views in them
 import greenday_core.indexers
 import greenday_core.youtube_client
 import greenday_core.denormalisers
+import greenday_core.update_counters
+import greenday_core.event_archive
+import greenday_channel.onlinecollaborators
 
 
 urlpatterns = auto_patterns(
@@ -30,6 +40,24 @@ urlpatterns += auto_patterns(
     prefix='denormalisers'
 )
 
+urlpatterns += auto_patterns(
+    greenday_core.update_counters,
+    overview=True,
+    prefix='update_counters'
+)
+
+urlpatterns += auto_patterns(
+    greenday_core.event_archive,
+    overview=True,
+    prefix='event_archive'
+)
+
+urlpatterns += auto_patterns(
+    greenday_channel.onlinecollaborators,
+    overview=True,
+    prefix='collaborators'
+)
+
 urlpatterns += patterns(
     '',
     url(r'^ka/?$', keep_alive, name='keep-alive'),
@@ -45,5 +73,6 @@ urlpatterns += patterns(
     url(
         r'^users/change_user_whitelist/(?P<id>\d+)/$',
         change_user_whitelist,
-        name='change_user_whitelist')
+        name='change_user_whitelist'),
+    url(r'^cache_stats/?$', cache_stats, name='cache_stats')
 )
@@ -11,6 +11,7 @@ from django.http import HttpResponse
 from django.utils import timezone
 
 from greenday_core.email_templates import NEW_USER_INVITED_NO_PROJECT
+from greenday_core.memoize_cache import cache_manager
 from greenday_core.models import PendingUser, User
 from greenday_core.utils import send_email
 from .forms import InviteNewUserForm
@@ -143,6 +144,36 @@ class ChangeUserWhitelistView(TemplateView):
 change_user_whitelist = ChangeUserWhitelistView.as_view()
 
 
+class CacheStatsView(TemplateView):
+    """
+        Django view to report hit ratios and compute costs of memoised
+        function calls
+    """
+    template_name = "cache_stats.html"
+
+    def get_context_data(self, **kwargs):
+        """
+            Flushes this instance's stats and gets the report across all
+            instances
+        """
+        cache_manager.stats.flush()
+
+        return {
+            'stats': cache_manager.stats.get_report()
+        }
+
+    def post(self, request, *args, **kwargs):
+        """
+            Resets all stats
+        """
+        cache_manager.stats.reset()
+
+        return redirect("cache_stats")
+
+
+cache_stats = CacheStatsView.as_view()
+
+
 def keep_alive(request):
     """
         Simple request handler that can be hit by a cron to keep an
@@ -15,6 +15,7 @@
     classes are made serveable.
 """
 import endpoints
+import functools
 import os
 from protorpc import remote
 from protorpc import messages, message_types
@@ -27,6 +28,8 @@ from greenday_core.api_exceptions import (
     ForbiddenException,
     UnauthorizedException
 )
+from greenday_core.eventbus import buffered_appevents
+from greenday_core.memoize_cache import PreEncodedMessage
 from .utils import get_current_user
 
 # Valid client IDs from the Google API Console
@@ -102,6 +105,16 @@ class GreendayMethodDecorator(object):
         Our API method decorator - wraps the endpoints one so that we can add
         some extra generic behaviour
 
+        Application events published by the method are buffered and
+        published together once it returns. They are discarded if it
+        raises.
+
+        API methods may return a
+        :class:`PreEncodedMessage <greenday_core.memoize_cache.PreEncodedMessage>`.
+        It is passed straight back to callers which set
+        `pre_encoded_responses` on the service instance, provided the method
+        has no post middlewares. Otherwise it is decoded to a message.
+
         See endpoints.api_config.method() for the code this is based on
     """
     def __init__(
@@ -159,7 +172,16 @@ class GreendayMethodDecorator(object):
             remote_decorator = remote.method(self.request_message,
                 self.response_message)
 
-        remote_method = remote_decorator(api_method)
+        @functools.wraps(api_method)
+        def decoding_api_method(service_instance, request):
+            response = api_method(service_instance, request)
+
+            if isinstance(response, PreEncodedMessage):
+                response = response.to_message()
+
+            return response
+
+        remote_method = remote_decorator(decoding_api_method)
 
         def invoke_remote(service_instance, request):
             endpoints.users_id_token._maybe_set_current_user_vars(
@@ -168,19 +190,27 @@ class GreendayMethodDecorator(object):
                 request=request)
 
             try:
-                for middleware in self.pre_middlewares:
-                    resp = middleware(service_instance, request)
-                    if resp:
-                        return resp
-
-                response = remote_method(service_instance, request)
-
-                for middleware in self.post_middlewares:
-                    resp = middleware(service_instance, request, response)
-                    if resp:
-                        response = resp
-
-                return response
+                # events are published in one batch if the method succeeds
+                with buffered_appevents():
+                    for middleware in self.pre_middlewares:
+                        resp = middleware(service_instance, request)
+                        if resp:
+                            return resp
+
+                    if (getattr(
+                            service_instance, 'pre_encoded_responses', False)
+                            and not self.post_middlewares):
+                        # bypass the remote method's response type check
+                        response = api_method(service_instance, request)
+                    else:
+                        response = remote_method(service_instance, request)
+
+                    for middleware in self.post_middlewares:
+                        resp = middleware(service_instance, request, response)
+                        if resp:
+                            response = resp
+
+                    return response
             except Exception as e:
                 for middleware in self.error_middlewares:
                     resp = middleware(service_instance, request, e)
@@ -0,0 +1,89 @@
+"""
+    Background warming of the cached responses of hot project endpoints
+"""
+import datetime
+import logging
+
+import deferred_manager
+
+from google.appengine.api import memcache
+
+from django.conf import settings
+from django.utils import timezone
+
+from greenday_core.models import Project
+
+
+# seconds over which invalidations of a project share a warming task
+WARM_DELAY = 5
+
+
+def defer_warm_project_caches(project):
+    """
+        Queues a task to recompute the project's hot cached responses
+        after its scope is invalidated
+
+        Invalidations within a few seconds of each other share a single
+        task. Only the first of them reaches the datastore to defer it.
+    """
+    if not settings.MEMOISE_WARM_CACHES:
+        return
+
+    task_reference = "warm-project-caches-{0}".format(project.pk)
+
+    # deferred_manager's own dedupe covers the flag being evicted
+    if not memcache.add(
+            task_reference, True, time=WARM_DELAY, namespace="cache-warming"):
+        return
+
+    deferred_manager.defer(
+        warm_project_caches,
+        project.pk,
+        task_reference=task_reference,
+        unique_until=timezone.now() + datetime.timedelta(seconds=WARM_DELAY),
+        _queue="cache-warming",
+        _countdown=WARM_DELAY)
+
+
+def warm_project_caches(project_id):
+    """
+        Recomputes the standard variants of the cached responses which are
+        scoped by :func:`greenday_core.memoize_cache.project_scope <greenday_core.memoize_cache.project_scope>`
+    """
+    try:
+        project = Project.objects.get(pk=project_id)
+    except Project.DoesNotExist:
+        logging.info("Project %s deleted before warming caches", project_id)
+        return
+
+    for warm in PROJECT_SCOPE_WARMERS:
+        warm(project)
+
+
+def _warm_video_lists(project):
+    """
+        Recomputes the project's cached video and archived video lists
+    """
+    # the API modules import this one to queue warming
+    from .video.video_api import VideoAPI
+    from .video.containers import VideoFilterContainer
+
+    video_api = VideoAPI()
+    for archived in (False, True):
+        video_api.cached_video_list(
+            VideoFilterContainer.combined_message_class(
+                project_id=project.pk, archived=archived),
+            project)
+
+
+def _warm_project_stats(project):
+    """
+        Recomputes the project's cached stats
+    """
+    from .project.project_api import ProjectAPI
+
+    ProjectAPI().cached_project_stats(project)
+
+
+# the calls to recompute when a project's scope is invalidated
+PROJECT_SCOPE_WARMERS = (_warm_video_lists, _warm_project_stats)
@@ -10,6 +10,8 @@ import dateutil.parser
 
 from django.http import HttpResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
+from greenday_core.memoize_cache import PreEncodedMessage
+
 from .api import greenday_api
 
 from .dev_appserver2_endpoints import (
@@ -192,6 +194,7 @@ class GreendayDjangoApi(object):
 
         api_service = api_class()
         api_service.request = request
+        api_service.pre_encoded_responses = True
 
         request_data = self.transform_rest_request(
             request, params, method_params, method.remote.request_type)
@@ -208,9 +211,13 @@ class GreendayDjangoApi(object):
                 status=getattr(e, "http_status", 500)
             )
         else:
-            response_message.check_initialized()
+            if isinstance(response_message, PreEncodedMessage):
+                # cached response which is already encoded
+                response = response_message.data
+            else:
+                response_message.check_initialized()
 
-            response = json.dumps(response_message, cls=MessageJSONEncoder, protojson_protocol=self.protocol)
+                response = json.dumps(response_message, cls=MessageJSONEncoder, protojson_protocol=self.protocol)
             return HttpResponse(
                 response,
                 content_type='application/json')
@@ -8,7 +8,10 @@ from protorpc import messages as api_messages
 from django.contrib.auth import get_user_model
 
 # GREENDAY
-from greenday_core.api_exceptions import UnauthorizedException
+from greenday_core.api_exceptions import (
+    BadRequestException,
+    UnauthorizedException
+)
 from greenday_core.constants import EventKind
 from greenday_core.models import (
     Event,
@@ -45,7 +48,10 @@ EventRequestContainer = endpoints.ResourceContainer(
     ts=api_messages.IntegerField(2, required=True),
     id=api_messages.IntegerField(3, variant=api_messages.Variant.INT32),
     kind=api_messages.IntegerField(4, variant=api_messages.Variant.INT32),
-    project_id=api_messages.IntegerField(5, variant=api_messages.Variant.INT32)
+    project_id=api_messages.IntegerField(5, variant=api_messages.Variant.INT32),
+    cursor=api_messages.StringField(6),
+    page_size=api_messages.IntegerField(
+        7, variant=api_messages.Variant.INT32)
 )
 
 
@@ -79,18 +85,26 @@ class EventAPI(BaseAPI):
         """
             Lists application events.
 
-            Returns events along with the associated objects in separate lists
+            Returns a page of events along with the associated objects in
+            separate lists. Pass next_cursor back to get the next page.
+            All events are returned if neither page_size nor cursor is
+            passed.
         """
         timestamp = datetime.datetime.utcfromtimestamp(request.ts)
 
         kind = EventKind(request.kind) if request.kind else None
 
-        events, objects = eventbus.get_events_with_objects(
-            timestamp,
-            kind=kind,
-            object_id=request.id,
-            project_id=request.project_id
-        )
+        try:
+            events, objects, next_cursor = eventbus.get_events_with_objects(
+                timestamp,
+                kind=kind,
+                object_id=request.id,
+                project_id=request.project_id,
+                cursor=request.cursor,
+                page_size=request.page_size
+            )
+        except ValueError as e:
+            raise BadRequestException(str(e))
 
         message_args = {
             'events': map(self.event_mapper.map, events),
@@ -99,7 +113,8 @@ class EventAPI(BaseAPI):
             'videos': map(self.video_mapper.map, objects['video']),
             'video_collections': map(
                 self.video_collection_mapper.map, objects['video_collection']),
-            'project_comments': map(self.comment_mapper.map, objects['project_comment'])
+            'project_comments': map(self.comment_mapper.map, objects['project_comment']),
+            'next_cursor': next_cursor
         }
 
         return EventListResponse(**message_args)
@@ -40,3 +40,5 @@ class EventListResponse(DjangoProtoRPCMessage):
         VideoResponseMessage, 5, repeated=True)
     project_comments = messages.MessageField(
         CommentResponseMessageSlim, 6, repeated=True)
+
+    next_cursor = messages.StringField(7)
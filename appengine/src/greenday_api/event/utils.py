@@ -1,9 +1,6 @@
 """
     Utils module for events API
 """
-import json
-from protorpc.protojson import encode_message
-
 from django.contrib.auth import get_user_model
 from django.utils.functional import SimpleLazyObject
 
@@ -11,6 +8,7 @@ from greenday_core.constants import EventModel, CODES_PER_MODEL
 from greenday_core.models import Project, PendingUser
 
 from ..mapper import GeneralMapper
+from ..utils import message_to_dict
 from ..comment.mappers import CommentMapper
 from ..video.mappers import VideoMapper, VideoCollectionMapper
 from ..comment.messages import CommentResponseMessageSlim
@@ -35,13 +33,11 @@ MESSAGE_MAPPER_MAP = SimpleLazyObject(lambda: {
 
 def get_model_message(event, model):
     """
-        Generic method to map a Django model to a response
-        message
+        Generic method to map a Django model to the JSON-ready dict of its
+        response message
     """
     model_enum = EventModel(event.kind / CODES_PER_MODEL)
     mapper = MESSAGE_MAPPER_MAP.get(model_enum)
 
     if mapper:
-        message = mapper.map(model)
-        # TODO: don't encode and decode to string
-        return json.loads(encode_message(message))
+        return message_to_dict(mapper.map(model))
@@ -33,6 +33,12 @@ ProjectIDContainer = endpoints.ResourceContainer(
     api_messages.Message,
     project_id=api_messages.IntegerField(2, variant=api_messages.Variant.INT32)
 )
+ProjectUpdatesContainer = endpoints.ResourceContainer(
+    api_messages.Message,
+    project_id=api_messages.IntegerField(2, variant=api_messages.Variant.INT32),
+    cursor=api_messages.StringField(3),
+    page_size=api_messages.IntegerField(4, variant=api_messages.Variant.INT32)
+)
 ProjectUploadImageContainer = endpoints.ResourceContainer(
     ProjectUploadImageMessage,
     id=api_messages.IntegerField(2, variant=api_messages.Variant.INT32)
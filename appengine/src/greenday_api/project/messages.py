@@ -193,6 +193,7 @@ class ProjectUpdatesMessage(messages.Message):
         GenericProjectUpdateMessage, 1, repeated=True)
     users_joined = messages.MessageField(
         GenericProjectUpdateMessage, 2, repeated=True)
+    next_cursor = messages.StringField(3)
 
 
 class ProjectUpdateCountsMessage(messages.Message):
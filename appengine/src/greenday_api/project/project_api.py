@@ -10,10 +10,12 @@ from django.conf import settings
 from django.utils import timezone
 
 from greenday_core import eventbus
-from greenday_core.memoize_cache import cache_manager
+from greenday_core.memoize_cache import (
+    cache_manager, memoised, project_scope, user_scope)
 from greenday_core.api_exceptions import (
     BadRequestException, ForbiddenException, NotFoundException)
 from greenday_core.constants import EventKind
+from greenday_core.update_counters import get_update_counts
 from greenday_core.models import (
     Project,
     ProjectUser,
@@ -71,6 +73,7 @@ from .containers import (
     ProjectUserEntityContainer,
     ProjectUserIDEntityContainer,
     ProjectIDContainer,
+    ProjectUpdatesContainer,
 )
 
 """
@@ -138,7 +141,8 @@ class ProjectAPI(BaseAPI, ProjectAPIMixin):
             _project_list_user,
             self.current_user,
             request.pending,
-            message_type=ProjectListResponse)
+            message_type=ProjectListResponse,
+            scopes=[user_scope(self.current_user)])
 
     @greenday_method(IDContainer, ProjectResponseMessage,
                       path='project/{id}', http_method='GET', name='get',
@@ -458,13 +462,16 @@ class ProjectAPI(BaseAPI, ProjectAPIMixin):
 
         return message_types.VoidMessage()
 
-    @greenday_method(ProjectIDContainer, ProjectUpdatesMessage,
+    @greenday_method(ProjectUpdatesContainer, ProjectUpdatesMessage,
                       path='project/my/{project_id}/updates',
                       http_method='GET', name='my_project_updates',
                       pre_middlewares=[auth_required])
     def project_updates_user(self, request):
         """
-            Gets a list of all project updates that the user has not yet seen
+            Gets a page of the project updates that the user has not yet
+            seen, newest first
+
+            Returns all of them if neither page_size nor cursor is passed
         """
         project = self.get_project(
             request.project_id, assigned_only=True
@@ -475,29 +482,39 @@ class ProjectAPI(BaseAPI, ProjectAPIMixin):
             raise ForbiddenException(
                 "User has no relationship with this project")
 
-        events, objects = eventbus.get_events_with_objects(
-            user_relation.last_updates_viewed,
-            kind=(
-                EventKind.VIDEOCREATED,
-                EventKind.USERACCEPTEDPROJECTINVITE,
-            ),
-            project_id=request.project_id
-        )
+        try:
+            events, objects, next_cursor = eventbus.get_events_with_objects(
+                user_relation.last_updates_viewed,
+                kind=(
+                    EventKind.VIDEOCREATED,
+                    EventKind.USERACCEPTEDPROJECTINVITE,
+                ),
+                project_id=request.project_id,
+                cursor=request.cursor,
+                page_size=request.page_size
+            )
+        except ValueError as e:
+            raise BadRequestException(str(e))
 
         items = {
             "created_videos": [],
-            "users_joined": []
+            "users_joined": [],
+            "next_cursor": next_cursor
         }
         model_type_to_event_type = {
             "video": "created_videos",
             "user": "users_joined"
         }
 
+        # events are newest first so keep the first event for each object
+        events_by_object = {}
+        for e in events:
+            events_by_object.setdefault(
+                (e.object_type.lower(), e.object_id), e)
+
         for model_type, models in objects.items():
             for model in models:
-                # assuming that there should only be one event per object
-                event = next(
-                    (e for e in events if e.object_id == model.id), None)
+                event = events_by_object.get((model_type, model.id))
 
                 update_message = self.project_update_mapper.map(model, event)
                 items[model_type_to_event_type[model_type]].append(
@@ -512,6 +529,8 @@ class ProjectAPI(BaseAPI, ProjectAPIMixin):
     def project_update_counts_user(self, request):
         """
             Gets a count of all project updates that the user has not seen
+
+            Reads the user's materialised update counters
         """
         project = self.get_project(
             request.project_id, assigned_only=True
@@ -522,22 +541,16 @@ class ProjectAPI(BaseAPI, ProjectAPIMixin):
             raise ForbiddenException(
                 "User has no relationship with this project")
 
-        event_counts = eventbus.get_event_counts(
-            user_relation.last_updates_viewed,
-            kind=(
-                EventKind.VIDEOCREATED,
-                EventKind.USERACCEPTEDPROJECTINVITE,
-            ),
-            project_id=request.project_id)
-
-        event_type_to_model_type = {
-            "created_videos": "video",
-            "users_joined": "user"
+        update_counts = get_update_counts(user_relation)
+
+        event_type_to_kind = {
+            "created_videos": EventKind.VIDEOCREATED,
+            "users_joined": EventKind.USERACCEPTEDPROJECTINVITE
         }
 
         items = {
-            event_type: event_counts.get(model_type, 0)
-            for event_type, model_type in event_type_to_model_type.items()
+            event_type: update_counts.get(kind, 0)
+            for event_type, kind in event_type_to_kind.items()
         }
 
         return ProjectUpdateCountsMessage(**items)
@@ -644,6 +657,16 @@ class ProjectAPI(BaseAPI, ProjectAPIMixin):
         """
         project = self.get_project(request.project_id)
 
+        return ProjectStatsMessage(**self.cached_project_stats(project))
+
+    def cached_project_stats(self, project):
+        """
+            Gets stats on videos and tag counts for the project, caching
+            the result
+
+            Does not depend on the current user so that caches can be
+            warmed in the background
+        """
         def _get_project_stats(project):
             total_tags = VideoTagInstance.objects.filter(
                 video_tag__project=project).count()
@@ -687,11 +710,11 @@ class ProjectAPI(BaseAPI, ProjectAPIMixin):
                         count=tag_obj[tag_name_count_path]
                     ) for tag_obj in tags]
             }
-        items = cache_manager.get_or_set(
+        return cache_manager.get_or_set(
             _get_project_stats,
-            project)
-
-        return ProjectStatsMessage(**items)
+            project,
+            scopes=[project_scope(project)],
+            stale_timeout=60)
 
     @greenday_method(
         ProjectIDContainer,
@@ -708,6 +731,26 @@ class ProjectAPI(BaseAPI, ProjectAPIMixin):
             request.project_id, assigned_only=True
         )
 
+        channels = self.cached_distinct_channels(project)
+
+        return DistinctChannelListResponse(
+            items=[
+                DistinctChannelMessage(
+                    id=channel_id,
+                    name=channel_name)
+                for channel_id, channel_name in channels.items()],
+            is_list=True
+        )
+
+    def cached_distinct_channels(self, project):
+        """
+            Gets a dict of the distinct channel IDs and names of videos in
+            the project, caching the result
+        """
+        @memoised(
+            depends_on=[Video],
+            scope=lambda project: project.pk,
+            timeout=60 * 60 * 6)
         def _get_project_distinct_channels(project):
             return {
                 o['channel_id']: o['channel_name']
@@ -718,18 +761,7 @@ class ProjectAPI(BaseAPI, ProjectAPIMixin):
                     .distinct()
                 )
             }
-        channels = cache_manager.get_or_set(
-            _get_project_distinct_channels,
-            project)
-
-        return DistinctChannelListResponse(
-            items=[
-                DistinctChannelMessage(
-                    id=channel_id,
-                    name=channel_name)
-                for channel_id, channel_name in channels.items()],
-            is_list=True
-        )
+        return _get_project_distinct_channels(project)
 
     def _get_image_url(self, image_gcs_filename):
         """
@@ -11,8 +11,9 @@ from greenday_core.api_exceptions import (
     NotFoundException,
     TagAlreadyAppliedToProject
 )
-from greenday_core.memoize_cache import cache_manager
-from greenday_core.models import ProjectTag, GlobalTag, Project
+from greenday_core.memoize_cache import invalidate_dependants, memoised
+from greenday_core.models import (
+    ProjectTag, GlobalTag, Project, VideoTagInstance)
 
 from ..api import (
     BaseAPI,
@@ -23,7 +24,8 @@ from ..api import (
 from ..utils import (
     get_obj_or_api_404,
     update_object_from_request,
-    patch_object_from_request
+    patch_object_from_request,
+    encode_response_json
 )
 from ..project.mixins import ProjectAPIMixin
 
@@ -70,6 +72,18 @@ class ProjectTagAPI(BaseAPI, ProjectAPIMixin):
         """ Lists all tags on the project """
         project = self.get_project(request.project_id, assigned_only=True)
 
+        return self.cached_projecttag_list(project)
+
+    def cached_projecttag_list(self, project):
+        """
+            Lists all tags on the project, caching the response
+        """
+        @memoised(
+            depends_on=[ProjectTag, GlobalTag, VideoTagInstance],
+            scope=lambda project: project.pk,
+            timeout=60 * 60 * 6,
+            message_type=ProjectTagListResponse,
+            encoder=encode_response_json)
         def _projecttag_list(project):
             tags = list(
                 ProjectTag.get_tree()
@@ -82,10 +96,7 @@ class ProjectTagAPI(BaseAPI, ProjectAPIMixin):
                 items=map(self.slim_mapper.map, tags),
                 is_list=True)
 
-        return cache_manager.get_or_set(
-            _projecttag_list,
-            project,
-            message_type=ProjectTagListResponse)
+        return _projecttag_list(project)
 
     @greenday_method(
         ProjectTagIDContainer,
@@ -299,4 +310,7 @@ class ProjectTagAPI(BaseAPI, ProjectAPIMixin):
         # reload because treebeard uses updates and doesn't update mode
         project_tag = ProjectTag.objects.get(pk=project_tag.pk)
 
+        # treebeard's updates don't send post_save
+        invalidate_dependants(project_tag)
+
         return self.mapper.map(project_tag)
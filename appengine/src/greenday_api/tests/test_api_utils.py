@@ -2,7 +2,11 @@
     Tests for :mod:`greenday_api.utils <greenday_api.utils>`
 """
 # LIBRARIES
+import datetime
+import json
 import os
+from protorpc import messages, message_types
+from protorpc.protojson import encode_message
 
 # FRAMEWORK
 from django.contrib.auth import get_user_model
@@ -17,6 +21,7 @@ from .base import ApiTestCase
 from ..utils import (
     get_current_user,
     is_field_nullable,
+    message_to_dict,
 )
 
 
@@ -77,3 +82,58 @@ class IsFieldNullableTests(ApiTestCase):
             Returns False as Permission.content_type_id is not nullable
         """
         self.assertFalse(is_field_nullable(Permission, "content_type_id"))
+
+
+class DummyColour(messages.Enum):
+    """
+        Enum used to test message conversion
+    """
+    RED = 1
+    BLUE = 2
+
+
+class DummyChildMessage(messages.Message):
+    """
+        Nested message used to test message conversion
+    """
+    name = messages.StringField(1)
+    created = message_types.DateTimeField(2)
+
+
+class DummyParentMessage(messages.Message):
+    """
+        Message used to test message conversion
+    """
+    id = messages.IntegerField(1)
+    colour = messages.EnumField(DummyColour, 2)
+    data = messages.BytesField(3)
+    child = messages.MessageField(DummyChildMessage, 4)
+    children = messages.MessageField(DummyChildMessage, 5, repeated=True)
+    tags = messages.StringField(6, repeated=True)
+    unset = messages.StringField(7)
+    ratio = messages.FloatField(8)
+
+
+class MessageToDictTests(ApiTestCase):
+    """
+        Test case for
+        :func:`greenday_api.utils.message_to_dict <greenday_api.utils.message_to_dict>`
+    """
+    def test_matches_encode_message(self):
+        """
+            The dict is what decoding the output of encode_message() gives
+        """
+        now = datetime.datetime(2015, 3, 4, 5, 6, 7, 8)
+        message = DummyParentMessage(
+            id=42,
+            colour=DummyColour.BLUE,
+            data="bytes",
+            child=DummyChildMessage(name=u"child", created=now),
+            children=[
+                DummyChildMessage(name=u"a"),
+                DummyChildMessage(created=now)
+            ],
+            ratio=0.5)
+
+        self.assertEqual(
+            json.loads(encode_message(message)), message_to_dict(message))
@@ -0,0 +1,137 @@
+"""
+    Tests for :mod:`greenday_api.cache_warming <greenday_api.cache_warming>`
+"""
+import mock
+from milkman.dairy import milkman
+
+from django.core.cache import caches
+from django.test.utils import override_settings
+
+from greenday_core.memoize_cache import MemoiseCacheManager
+from greenday_core.models import Project
+
+from .base import ApiTestCase
+from ..cache_warming import defer_warm_project_caches, warm_project_caches
+from ..video.containers import VideoFilterContainer
+from ..video.video_api import VideoAPI
+
+
+class DeferWarmProjectCachesTestCase(ApiTestCase):
+    """
+        Tests for :func:`greenday_api.cache_warming.defer_warm_project_caches <greenday_api.cache_warming.defer_warm_project_caches>`
+    """
+    def setUp(self):
+        """
+            Bootstrap test data
+        """
+        super(DeferWarmProjectCachesTestCase, self).setUp()
+        self.project = milkman.deliver(Project)
+
+    @override_settings(MEMOISE_WARM_CACHES=True)
+    @mock.patch("greenday_api.cache_warming.warm_project_caches")
+    def test_warm(self, mock_warm_project_caches):
+        """
+            Warming is queued for the project
+        """
+        defer_warm_project_caches(self.project)
+
+        mock_warm_project_caches.assert_called_once_with(self.project.pk)
+
+    @override_settings(MEMOISE_WARM_CACHES=True)
+    @mock.patch("greenday_api.cache_warming.deferred_manager.defer")
+    def test_invalidations_share_task(self, mock_defer):
+        """
+            Invalidations in quick succession only defer one task
+        """
+        defer_warm_project_caches(self.project)
+        defer_warm_project_caches(self.project)
+
+        self.assertEqual(1, mock_defer.call_count)
+
+    @override_settings(MEMOISE_WARM_CACHES=False)
+    @mock.patch("greenday_api.cache_warming.warm_project_caches")
+    def test_disabled(self, mock_warm_project_caches):
+        """
+            Nothing is queued when warming is disabled
+        """
+        defer_warm_project_caches(self.project)
+
+        self.assertFalse(mock_warm_project_caches.called)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cache-warming-tests',
+    }
+})
+class WarmProjectCachesTestCase(ApiTestCase):
+    """
+        Tests for :func:`greenday_api.cache_warming.warm_project_caches <greenday_api.cache_warming.warm_project_caches>`
+    """
+    api_type = VideoAPI
+
+    def setUp(self):
+        """
+            Bootstrap test data and a cache manager backed by a real cache
+        """
+        super(WarmProjectCachesTestCase, self).setUp()
+        caches['default'].clear()
+
+        self.manager = MemoiseCacheManager(local_cache_size=0)
+        for module in (
+                "greenday_core.memoize_cache",
+                "greenday_api.video.video_api",
+                "greenday_api.project.project_api"):
+            patcher = mock.patch(module + ".cache_manager", self.manager)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.project = milkman.deliver(Project)
+        self.project.set_owner(self.admin)
+        self.create_video(project=self.project)
+
+    def test_video_list_warmed(self):
+        """
+            The first video list request after warming is a cache hit
+        """
+        warm_project_caches(self.project.pk)
+
+        self._sign_in(self.admin)
+        response = self.api.video_list(
+            VideoFilterContainer.combined_message_class(
+                project_id=self.project.pk))
+
+        self.assertEqual(1, len(response.items))
+
+        stats = self.manager.stats._stats[
+            "greenday_api.video.video_api._video_list"]
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(2, stats['misses'])
+
+    def test_project_scope_only(self):
+        """
+            Only the calls scoped by the project are warmed
+        """
+        warm_project_caches(self.project.pk)
+
+        warmed = self.manager.stats._stats
+        self.assertIn("greenday_api.video.video_api._video_list", warmed)
+        self.assertIn(
+            "greenday_api.project.project_api._get_project_stats", warmed)
+        self.assertNotIn(
+            "greenday_api.projecttag.projecttag_api._projecttag_list", warmed)
+        self.assertNotIn(
+            "greenday_api.project.project_api._get_project_distinct_channels",
+            warmed)
+
+    def test_project_deleted(self):
+        """
+            Warming a deleted project does nothing
+        """
+        project_id = self.project.pk
+        self.project.delete()
+
+        warm_project_caches(project_id)
+
+        self.assertEqual({}, self.manager.stats._stats)
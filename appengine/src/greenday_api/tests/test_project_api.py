@@ -13,6 +13,7 @@ from django.utils import timezone
 
 # GREENDAY
 from greenday_core.api_exceptions import ForbiddenException, NotFoundException
+from greenday_core.memoize_cache import user_scope
 from greenday_core.models import (
     Project,
     UserVideoDetail,
@@ -52,19 +53,8 @@ class ProjectAPITestsMixin(object):
 
             Requires memoize_cache.cache_manager to be mocked and passed
         """
-        m_cache_manager.delete_many.assert_called_with((
-            "greenday_api.project.project_api._project_list_user",
-            (user, True),
-            {}
-        ), (
-            "greenday_api.project.project_api._project_list_user",
-            (user, False),
-            {}
-        ), (
-            "greenday_api.project.project_api._project_list_user",
-            (user, None),
-            {}
-        ))
+        m_cache_manager.invalidate_scopes.assert_called_with(
+            user_scope(user))
 
 
 class ProjectAPITests(TestEventBusMixin, TestCaseTagHelpers, ProjectAPITestsMixin, ApiTestCase):
@@ -785,7 +775,7 @@ class ProjectAPIUserTests(TestEventBusMixin, ApiTestCase, ProjectAPITestsMixin):
         with self.assertEventRecorded(
                 EventKind.USERACCEPTEDPROJECTINVITE,
                 project_id=self.project.pk,
-                object_id=self.user.pk), self.assertNumQueries(8):
+                object_id=self.user.pk), self.assertNumQueries(9):
             response = self.api.accept_project_invitation(request)
 
         self.assertEqual(self.project.pk, response.id)
@@ -827,7 +817,7 @@ class ProjectAPIUserTests(TestEventBusMixin, ApiTestCase, ProjectAPITestsMixin):
         with self.assertEventRecorded(
                 EventKind.USERACCEPTEDPROJECTINVITE,
                 project_id=self.project.pk,
-                object_id=user.pk), self.assertNumQueries(10):
+                object_id=user.pk), self.assertNumQueries(11):
             response = self.api.accept_project_invitation(request)
 
         self.assertEqual(self.project.pk, response.id)
@@ -5,6 +5,7 @@
 """
 # LIBRARIES
 import datetime
+import mock
 from milkman.dairy import milkman
 
 # FRAMEWORK
@@ -16,13 +17,15 @@ from greenday_core.models import (
     Video,
     Event
 )
+from greenday_core.api_exceptions import BadRequestException
 from greenday_core.constants import EventKind
 
 from .base import ApiTestCase, TestEventBusMixin
 
 from ..project.project_api import (
     ProjectAPI,
-    ProjectIDContainer
+    ProjectIDContainer,
+    ProjectUpdatesContainer
 )
 
 
@@ -101,7 +104,7 @@ class ProjectUpdateTests(
         request = ProjectIDContainer.combined_message_class(
             project_id=self.project.id)
 
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(6):
             response = self.api.update_last_viewed(request)
 
         project_user = self.reload(project_user)
@@ -120,7 +123,7 @@ class ProjectUpdateTests(
         self.project.set_updates_viewed(
             self.admin, last_viewed_at=self.now - datetime.timedelta(hours=3))
 
-        request = ProjectIDContainer.combined_message_class(
+        request = ProjectUpdatesContainer.combined_message_class(
             project_id=self.project.pk)
 
         with self.assertNumQueries(6):
@@ -137,7 +140,7 @@ class ProjectUpdateTests(
         self.project.set_updates_viewed(
             self.admin)
 
-        request = ProjectIDContainer.combined_message_class(
+        request = ProjectUpdatesContainer.combined_message_class(
             project_id=self.project.pk)
 
         with self.assertNumQueries(4):
@@ -145,6 +148,34 @@ class ProjectUpdateTests(
 
         self.assertEqual(0, len(response.created_videos))
 
+    def test_latest_event_per_object(self):
+        """
+            Objects with several events are shown with the latest one
+        """
+        self._sign_in(self.admin)
+
+        video = milkman.deliver(Video, project=self.project, user=self.admin)
+        events = [
+            Event.objects.create(
+                timestamp=self.now - datetime.timedelta(hours=i),
+                kind=EventKind.VIDEOCREATED,
+                project_id=self.project.pk,
+                object_id=video.pk)
+            for i in (2, 1)
+        ]
+
+        self.project.set_updates_viewed(
+            self.admin, last_viewed_at=self.now - datetime.timedelta(hours=3))
+
+        request = ProjectUpdatesContainer.combined_message_class(
+            project_id=self.project.pk)
+        response = self.api.project_updates_user(request)
+
+        self.assertEqual(1, len(response.created_videos))
+        self.assertEqual(
+            self.reload(events[1]).timestamp,
+            response.created_videos[0].timestamp)
+
     def test_users_joined(self):
         """
             Users joined since last viewing updates
@@ -157,7 +188,7 @@ class ProjectUpdateTests(
         self.project.add_admin(self.user)
         self.project.add_assigned(self.user2)
 
-        request = ProjectIDContainer.combined_message_class(
+        request = ProjectUpdatesContainer.combined_message_class(
             project_id=self.project.pk)
 
         with self.assertNumQueries(5):
@@ -167,7 +198,7 @@ class ProjectUpdateTests(
 
         self.users_accept_invite(self.user, self.user2)
 
-        request = ProjectIDContainer.combined_message_class(
+        request = ProjectUpdatesContainer.combined_message_class(
             project_id=self.project.pk)
 
         with self.assertNumQueries(5):
@@ -178,6 +209,81 @@ class ProjectUpdateTests(
         self.assertEqual(self.user.pk, response.users_joined[0].id)
         self.assertEqual(self.user2.pk, response.users_joined[1].id)
 
+    def test_paged(self):
+        """
+            Updates are returned a page at a time, newest first
+        """
+        self._sign_in(self.admin)
+
+        videos = list(self.create_videos(5))
+
+        self.project.set_updates_viewed(
+            self.admin, last_viewed_at=self.now - datetime.timedelta(hours=5))
+
+        request = ProjectUpdatesContainer.combined_message_class(
+            project_id=self.project.pk, page_size=3)
+        response = self.api.project_updates_user(request)
+
+        self.assertEqual(
+            [v.id for v in videos[:3]],
+            sorted(v.id for v in response.created_videos))
+        self.assertTrue(response.next_cursor)
+
+        request = ProjectUpdatesContainer.combined_message_class(
+            project_id=self.project.pk,
+            page_size=3,
+            cursor=response.next_cursor)
+        response = self.api.project_updates_user(request)
+
+        self.assertEqual(
+            [videos[3].id], [v.id for v in response.created_videos])
+        self.assertIsNone(response.next_cursor)
+
+    @mock.patch("greenday_core.eventbus.EVENT_PAGE_SIZE", 2)
+    def test_unpaged(self):
+        """
+            All updates are returned to clients which don't ask for a page
+        """
+        self._sign_in(self.admin)
+
+        videos = list(self.create_videos(5))
+
+        self.project.set_updates_viewed(
+            self.admin, last_viewed_at=self.now - datetime.timedelta(hours=5))
+
+        request = ProjectUpdatesContainer.combined_message_class(
+            project_id=self.project.pk)
+        response = self.api.project_updates_user(request)
+
+        self.assertEqual(
+            sorted(v.id for v in videos),
+            sorted(v.id for v in response.created_videos))
+        self.assertIsNone(response.next_cursor)
+
+    def test_invalid_cursor(self):
+        """
+            A malformed cursor is a bad request
+        """
+        self._sign_in(self.admin)
+
+        request = ProjectUpdatesContainer.combined_message_class(
+            project_id=self.project.pk, cursor=u"not-a-cursor")
+
+        self.assertRaises(
+            BadRequestException, self.api.project_updates_user, request)
+
+    def test_invalid_page_size(self):
+        """
+            A page size below 1 is a bad request
+        """
+        self._sign_in(self.admin)
+
+        request = ProjectUpdatesContainer.combined_message_class(
+            project_id=self.project.pk, page_size=-2)
+
+        self.assertRaises(
+            BadRequestException, self.api.project_updates_user, request)
+
 
 class ProjectUpdateCountsTests(
         TestEventBusMixin, ProjectUpdateTestMixin, ApiTestCase):
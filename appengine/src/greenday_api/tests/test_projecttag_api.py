@@ -88,6 +88,50 @@ class ProjectTagAPITests(TestEventBusMixin, TestCaseTagHelpers, ApiTestCase):
         nested_tag_resp = response.items[1]
         self.assertEqual(self.projecttag.pk, nested_tag_resp.parent_id)
 
+    def test_list_after_rename(self):
+        """
+            Renaming a tag's global tag invalidates the cached list
+        """
+        self._sign_in(self.admin)
+        list_request = ProjectIDContainer.combined_message_class(
+            project_id=self.project.pk)
+        self.api.projecttag_list(list_request)
+
+        self.api.projecttag_patch(
+            PutProjectTagContainer.combined_message_class(
+                project_id=self.project.pk,
+                project_tag_id=self.projecttag.pk,
+                name="renamed"))
+
+        response = self.api.projecttag_list(list_request)
+        self.assertEqual("renamed", response.items[0].name)
+
+    def test_list_after_move(self):
+        """
+            Moving a tag invalidates the cached list
+        """
+        _, projecttag_2 = self.create_project_tag(
+            project=self.project, name="tag2")
+
+        self._sign_in(self.admin)
+        list_request = ProjectIDContainer.combined_message_class(
+            project_id=self.project.pk)
+        response = self.api.projecttag_list(list_request)
+        self.assertEqual(
+            [self.projecttag.pk, projecttag_2.pk],
+            [t.id for t in response.items])
+
+        self.api.projecttag_move(
+            MoveProjectTagContainer.combined_message_class(
+                project_id=self.project.pk,
+                project_tag_id=self.projecttag.pk,
+                sibling_tag_id=projecttag_2.pk))
+
+        response = self.api.projecttag_list(list_request)
+        self.assertEqual(
+            [projecttag_2.pk, self.projecttag.pk],
+            [t.id for t in response.items])
+
     def test_get_project_tag(self):
         """
             Get a single tag on the project
@@ -121,7 +165,7 @@ class ProjectTagAPITests(TestEventBusMixin, TestCaseTagHelpers, ApiTestCase):
             image_url="http://imgr"
         )
 
-        with self.assertNumQueries(8):
+        with self.assertNumQueries(9):
             response = self.api.projecttag_put(request)
 
         self.globaltag = self.reload(self.globaltag)
@@ -141,7 +185,7 @@ class ProjectTagAPITests(TestEventBusMixin, TestCaseTagHelpers, ApiTestCase):
             description="new description",
         )
 
-        with self.assertNumQueries(8):
+        with self.assertNumQueries(9):
             response = self.api.projecttag_patch(request)
 
         self.globaltag = self.reload(self.globaltag)
@@ -160,7 +204,7 @@ class ProjectTagAPITests(TestEventBusMixin, TestCaseTagHelpers, ApiTestCase):
             image_url="http://imgr"
         )
 
-        with self.assertNumQueries(8):
+        with self.assertNumQueries(9):
             response = self.api.projecttag_create(request)
 
         global_tag = GlobalTag.objects.get(
@@ -278,7 +278,7 @@ class VideoBatchCreateTests(ApiTestCase):
             youtube_ids=["foo_45", "bar_59"]
         )
 
-        with self.assertNumQueries(18):
+        with self.assertNumQueries(20):
             response = self.api.video_batch_create(request)
         self.assertEqual(2, len(response.items))
         self.assertEqual(2, len(response.videos))
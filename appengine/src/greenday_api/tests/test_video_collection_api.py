@@ -234,7 +234,7 @@ class VideoCollectionAPITests(
             youtube_ids=[video.youtube_id, video2.youtube_id, video3.youtube_id]
         )
 
-        with self.assertNumQueries(18):
+        with self.assertNumQueries(17):
             response = self.api.add_video_batch_to_collection(request)
 
         for vid in (video, video2, video3):
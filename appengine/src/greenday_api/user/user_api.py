@@ -9,8 +9,9 @@ from django.db.models import Q
 
 from greenday_core.api_exceptions import ForbiddenException
 from greenday_core.constants import EventKind
-from greenday_core.memoize_cache import cache_manager
-from greenday_core.models import get_sentinel_user
+from greenday_core.memoize_cache import memoised
+from greenday_core.models import (
+    get_sentinel_user, UserVideoDetail, VideoTagInstance)
 from greenday_core.user_deletion import defer_delete_user
 
 from ..api import (
@@ -208,6 +209,12 @@ class UserAPI(BaseAPI):
         """
             Gets the application stats for the current user
         """
+        @memoised(
+            depends_on=[UserVideoDetail, VideoTagInstance],
+            scope=lambda user: user.pk,
+            scope_field='user',
+            timeout=60 * 60 * 6,
+            message_type=UserStatsResponse)
         def _get_current_user_stats(user):
             videos_watched = (
                 user.related_videos
@@ -221,7 +228,4 @@ class UserAPI(BaseAPI):
                 tags_added=user.owner_of_tag_instances.count()
             )
 
-        return cache_manager.get_or_set(
-            _get_current_user_stats,
-            self.current_user,
-            message_type=UserStatsResponse)
+        return _get_current_user_stats(self.current_user)
@@ -6,7 +6,7 @@ import json
 import urllib
 import urllib2
 from endpoints.protojson import EndpointsProtoJson
-from protorpc import messages
+from protorpc import messages, protojson
 from google.appengine.api import users
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -205,3 +205,51 @@ class MessageJSONEncoder(json.JSONEncoder):
             return result
         else:
             return super(MessageJSONEncoder, self).default(value)
+
+
+def encode_response_json(message):
+    """
+        Encodes a response message to JSON exactly as
+        :class:`greenday_api.django_api.GreendayDjangoApi <greenday_api.django_api.GreendayDjangoApi>`
+        serialises responses
+
+        Pass as the `encoder` to `cache_manager.get_or_set()` to cache
+        responses that can be served without re-encoding
+    """
+    return json.dumps(
+        message,
+        cls=MessageJSONEncoder,
+        protojson_protocol=protojson.ProtoJson.get_default())
+
+
+def message_to_dict(message, protojson_protocol=None):
+    """
+        Converts a message to the JSON-ready dict which protojson's
+        encode_message() would encode, without encoding it to a string
+
+        Unset fields are left out as encode_message() does
+    """
+    protocol = protojson_protocol or protojson.ProtoJson.get_default()
+
+    def _to_json_value(value):
+        if isinstance(value, messages.Message):
+            return message_to_dict(value, protojson_protocol=protocol)
+        if isinstance(value, messages.Enum):
+            return str(value)
+        if isinstance(value, (list, tuple)):
+            return [_to_json_value(v) for v in value]
+        return value
+
+    result = {}
+    for field in message.all_fields():
+        item = message.get_assigned_value(field.name)
+        if item not in (None, [], ()):
+            result[field.name] = _to_json_value(
+                protocol.encode_field(field, item))
+
+    for unknown_key in message.all_unrecognized_fields():
+        unrecognized_field, _ = message.get_unrecognized_field_info(
+            unknown_key)
+        result[unknown_key] = unrecognized_field
+
+    return result
@@ -1,23 +1,20 @@
 """
     Video API caching utilities
 """
-from greenday_core.memoize_cache import cache_manager
+from greenday_core.memoize_cache import cache_manager, project_scope
 
-from .containers import VideoFilterContainer
+from ..cache_warming import defer_warm_project_caches
 
 
-def remove_video_list_cache(project):
+def remove_video_list_cache(project, warm=True):
     """
-        Removes all cached keys for the video list
+        Invalidates all cached video lists and video tag lists
         for a given project.
+
+        Queues a task to recompute the project's hot cached responses
+        unless `warm` is False
     """
-    fn_name = "greenday_api.video.video_api._video_list"
+    cache_manager.invalidate_scopes(project_scope(project))
 
-    cache_manager.delete_many(
-        *[(
-            fn_name,
-            (VideoFilterContainer.combined_message_class(
-                project_id=project.pk, archived=x),
-            project), {})
-        for x in (True, False, None)]
-    )
+    if warm:
+        defer_warm_project_caches(project)
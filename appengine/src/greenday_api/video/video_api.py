@@ -10,8 +10,8 @@ from django.db.models import Q
 from greenday_core.api_exceptions import (
     BadRequestException, ForbiddenException, NotFoundException)
 from greenday_core.documents.video import VideoDocument
-from greenday_core.eventbus import publish_appevent
-from greenday_core.memoize_cache import cache_manager
+from greenday_core.eventbus import publish_appevent, publish_appevents
+from greenday_core.memoize_cache import cache_manager, project_scope
 from greenday_core.models import (
     Video,
     VideoCollection,
@@ -32,6 +32,7 @@ from ..searchbot import VideoSearch, process_comma_seperate_filters
 from ..utils import (
     get_obj_or_api_404,
     api_appevent,
+    encode_response_json,
 )
 from ..project.mixins import ProjectAPIMixin
 from ..mapper import GeneralMapper
@@ -96,8 +97,7 @@ class VideoAPI(BaseAPI, ProjectAPIMixin):
         path='project/{project_id}/video',
         http_method='GET',
         name='list',
-        pre_middlewares=[auth_required],
-        post_middlewares=[add_order_to_repeated])
+        pre_middlewares=[auth_required])
     def video_list(self, request):
         """
             API Endpoint to list all videos within the passed project
@@ -107,6 +107,16 @@ class VideoAPI(BaseAPI, ProjectAPIMixin):
             assigned_only=True
         )
 
+        return self.cached_video_list(request, project)
+
+    def cached_video_list(self, request, project):
+        """
+            Lists videos within the project, caching the response unless
+            the request is a search
+
+            Does not depend on the current user so that caches can be
+            warmed in the background
+        """
         def _video_list(request, project):
 
             if request.archived:
@@ -154,22 +164,30 @@ class VideoAPI(BaseAPI, ProjectAPIMixin):
                     if vid in video_dict
                 ]
 
-            # build the response
-            return VideoListResponse(
+            # build the response. Ordering is added here rather than by
+            # post middleware so that cached responses can be served as-is
+            response = VideoListResponse(
                 items=map(self.slim_mapper.map, videos),
                 is_list=True
             )
+            add_order_to_repeated(self, request, response)
+            return response
 
         if has_video_search_args(request):
             # don't cache search results
             return _video_list(request, project)
         else:
+            # an omitted archived flag shares the unarchived list's key
+            request.archived = bool(request.archived)
             return cache_manager.get_or_set(
                 _video_list,
                 request,
                 project,
                 message_type=VideoListResponse,
-                timeout=10)
+                encoder=encode_response_json,
+                scopes=[project_scope(project)],
+                timeout=10,
+                stale_timeout=30)
 
     @greenday_method(VideoEntityContainer, VideoResponseMessage,
                       path='project/{project_id}/video/{youtube_id}',
@@ -478,14 +496,15 @@ class VideoAPI(BaseAPI, ProjectAPIMixin):
 
         remove_video_list_cache(project)
 
-        for video_id in video_ids_to_update:
-            publish_appevent(
-                kind=EventKind.VIDEOUNARCHIVED if
+        publish_appevents([
+            {
+                "kind": EventKind.VIDEOUNARCHIVED if
                     request.unarchive else EventKind.VIDEOARCHIVED,
-                object_id=video_id,
-                video_id=video_id,
-                project_id=project.pk,
-                user=self.current_user)
+                "object_id": video_id,
+                "video_id": video_id,
+                "project_id": project.pk,
+                "user": self.current_user
+            } for video_id in video_ids_to_update])
 
         videos = (
             Video.all_objects
@@ -634,7 +653,7 @@ class VideoAPI(BaseAPI, ProjectAPIMixin):
             )
         }
 
-        success, error, videos = [], [], []
+        success, error, videos, created_video_ids = [], [], [], []
 
         for youtube_id in request.youtube_ids:
             if youtube_id in duplicate_videos:
@@ -692,13 +711,16 @@ class VideoAPI(BaseAPI, ProjectAPIMixin):
 
             success.append(
                 make_batch_response_message(video.youtube_id, success=True))
+            created_video_ids.append(video.pk)
 
-            publish_appevent(
-                EventKind.VIDEOCREATED,
-                object_id=video.pk,
-                video_id=video.pk,
-                project_id=project.pk,
-                user=self.current_user)
+        publish_appevents([
+            {
+                "kind": EventKind.VIDEOCREATED,
+                "object_id": video_id,
+                "video_id": video_id,
+                "project_id": project.pk,
+                "user": self.current_user
+            } for video_id in created_video_ids])
 
         remove_video_list_cache(project)
         return VideoBatchListResponseMessage(
@@ -988,4 +1010,6 @@ class VideoAPI(BaseAPI, ProjectAPIMixin):
         return cache_manager.get_or_set(
             _video_tag_filter,
             request,
-            message_type=VideoTagListResponse)
+            message_type=VideoTagListResponse,
+            encoder=encode_response_json,
+            scopes=[project_scope(project)])
@@ -8,7 +8,7 @@ from greenday_core.api_exceptions import BadRequestException, NotFoundException
 from greenday_core.models import VideoCollection, Video, VideoCollectionVideo
 from greenday_core.documents.video import VideoDocument
 from greenday_core.constants import EventKind
-from greenday_core.eventbus import publish_appevent
+from greenday_core.eventbus import publish_appevent, publish_appevents
 
 from ..api import (
     BaseAPI,
@@ -329,7 +329,7 @@ class VideoCollectionAPI(BaseAPI, ProjectAPIMixin):
                 error='Video is already in collection')
             for vid in already_in_collection_ids]
 
-        success, errors = [], []
+        success, errors, added_video_ids = [], [], []
 
         for vid, video in videos.items():
             if vid in already_in_collection_ids:
@@ -344,14 +344,17 @@ class VideoCollectionAPI(BaseAPI, ProjectAPIMixin):
             else:
                 success.append(
                     make_batch_response_message(video.youtube_id, success=True))
-
-                publish_appevent(
-                    EventKind.VIDEOADDEDTOCOLLECTION,
-                    object_id=video.pk,
-                    video_id=video.pk,
-                    project_id=project.pk,
-                    meta=collection.pk,
-                    user=self.current_user)
+                added_video_ids.append(video.pk)
+
+        publish_appevents([
+            {
+                "kind": EventKind.VIDEOADDEDTOCOLLECTION,
+                "object_id": video_id,
+                "video_id": video_id,
+                "project_id": project.pk,
+                "meta": collection.pk,
+                "user": self.current_user
+            } for video_id in added_video_ids])
 
         return VideoBatchListResponseMessage(
             items=success + errors + already_in_collection + does_not_exist,
@@ -407,13 +410,13 @@ class VideoCollectionAPI(BaseAPI, ProjectAPIMixin):
         )
         removed_from_collection = [vcv.video_id for vcv in collection_videos]
         collection_videos.delete()
-        for video_id in removed_from_collection:
-            publish_appevent(
-                EventKind.VIDEOREMOVEDFROMCOLLECTION,
-                object_id=video_id,
-                video_id=video_id,
-                project_id=project.pk,
-                meta=collection.pk,
-                user=self.current_user
-            )
+        publish_appevents([
+            {
+                "kind": EventKind.VIDEOREMOVEDFROMCOLLECTION,
+                "object_id": video_id,
+                "video_id": video_id,
+                "project_id": project.pk,
+                "meta": collection.pk,
+                "user": self.current_user
+            } for video_id in removed_from_collection])
         return message_types.VoidMessage()
@@ -0,0 +1,233 @@
+"""
+    Defines the storage backends of the channel managers
+
+    The managers talk to their backend through the subset of the App Engine
+    `memcache.Client` interface below, so any object which implements it can
+    be passed to them:
+
+        get, gets, get_multi, set, set_multi, add, add_multi, cas,
+        incr, offset_multi, delete, delete_multi
+"""
+import cPickle as pickle
+import random
+import threading
+import time
+from collections import Counter
+
+from google.appengine.api import memcache
+
+
+# memcache treats expiry times over 30 days as absolute unix timestamps
+MAX_RELATIVE_EXPIRY = 60 * 60 * 24 * 30
+
+
+def get_memcache_backend():
+    """
+        Gets the default backend, the App Engine memcache service
+    """
+    return memcache.Client()
+
+
+class LocalMemoryStore(object):
+    """
+        A thread-safe in-process store shared by any number of
+        :class:`LocalMemoryClient <greenday_channel.backends.LocalMemoryClient>`
+        instances
+
+        Counts the calls made to it in `stats` so that contention can be
+        measured. A `failure_rate` fraction of writes fail, as writes to
+        memcache can under load, to exercise the callers' retries.
+    """
+    def __init__(self, failure_rate=0):
+        self.lock = threading.RLock()
+        self.failure_rate = failure_rate
+        # {(namespace, key): (value, expires_at, version)}
+        self.items = {}
+        self.version = 0
+        self.stats = Counter()
+
+    def clear(self):
+        """
+            Removes all items and resets the stats
+        """
+        with self.lock:
+            self.items.clear()
+            self.stats.clear()
+
+    def write_fails(self):
+        """
+            Whether to fail a write, counting the failures
+        """
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.stats['write_failed'] += 1
+            return True
+        return False
+
+
+class LocalMemoryClient(object):
+    """
+        An in-process implementation of the `memcache.Client` methods used by
+        the channel managers
+
+        Values are pickled as memcache would, so callers never share mutable
+        objects. Like `memcache.Client`, each instance remembers the versions
+        of the items it has read with `gets` and `cas` fails if the item has
+        been written since.
+    """
+    def __init__(self, store=None):
+        self.store = store or LocalMemoryStore()
+        self._cas_versions = {}
+
+    @staticmethod
+    def _get_expiry(expiry):
+        if not expiry:
+            return None
+        if expiry > MAX_RELATIVE_EXPIRY:
+            return expiry
+        return time.time() + expiry
+
+    def _get_item(self, key, namespace):
+        item = self.store.items.get((namespace, key))
+        if item is None:
+            return None
+
+        expires_at = item[1]
+        if expires_at is not None and expires_at <= time.time():
+            del self.store.items[(namespace, key)]
+            return None
+
+        return item
+
+    def _set_item(self, key, value, expires_at, namespace, pickled=False):
+        self.store.version += 1
+        self.store.items[(namespace, key)] = (
+            value if pickled else pickle.dumps(value, -1),
+            expires_at,
+            self.store.version)
+
+    def get(self, key, namespace=None, for_cas=False):
+        return self.get_multi(
+            [key], namespace=namespace, for_cas=for_cas).get(key)
+
+    def gets(self, key, namespace=None):
+        return self.get(key, namespace=namespace, for_cas=True)
+
+    def get_multi(self, keys, key_prefix='', namespace=None, for_cas=False):
+        results = {}
+        with self.store.lock:
+            self.store.stats['get'] += len(keys)
+            for key in keys:
+                item = self._get_item(key_prefix + key, namespace)
+                if item is None:
+                    continue
+
+                if for_cas:
+                    self._cas_versions[(namespace, key_prefix + key)] = item[2]
+                results[key] = item[0]
+
+            self.store.stats['get_hit'] += len(results)
+
+        return {k: pickle.loads(v) for k, v in results.items()}
+
+    def set(self, key, value, time=0, namespace=None):
+        return not self.set_multi(
+            {key: value}, time=time, namespace=namespace)
+
+    def set_multi(self, mapping, time=0, key_prefix='', namespace=None):
+        pickled = {k: pickle.dumps(v, -1) for k, v in mapping.items()}
+        not_set = []
+        with self.store.lock:
+            self.store.stats['set'] += len(mapping)
+            for key, value in pickled.items():
+                if self.store.write_fails():
+                    not_set.append(key)
+                    continue
+
+                self._set_item(
+                    key_prefix + key, value, self._get_expiry(time),
+                    namespace, pickled=True)
+        return not_set
+
+    def add(self, key, value, time=0, namespace=None):
+        return not self.add_multi(
+            {key: value}, time=time, namespace=namespace)
+
+    def add_multi(self, mapping, time=0, key_prefix='', namespace=None):
+        not_added = []
+        with self.store.lock:
+            self.store.stats['add'] += len(mapping)
+            for key, value in mapping.items():
+                if self._get_item(key_prefix + key, namespace) is None:
+                    self._set_item(
+                        key_prefix + key, value, self._get_expiry(time),
+                        namespace)
+                else:
+                    not_added.append(key)
+
+            self.store.stats['add_failed'] += len(not_added)
+        return not_added
+
+    def cas(self, key, value, time=0, namespace=None):
+        with self.store.lock:
+            self.store.stats['cas'] += 1
+
+            version = self._cas_versions.pop((namespace, key), None)
+            item = self._get_item(key, namespace)
+            if (version is None or item is None or item[2] != version or
+                    self.store.write_fails()):
+                self.store.stats['cas_failed'] += 1
+                return False
+
+            self._set_item(key, value, self._get_expiry(time), namespace)
+            return True
+
+    def incr(self, key, delta=1, namespace=None, initial_value=None):
+        return self.offset_multi(
+            {key: delta},
+            namespace=namespace,
+            initial_value=initial_value)[key]
+
+    def decr(self, key, delta=1, namespace=None, initial_value=None):
+        return self.incr(
+            key, -delta, namespace=namespace, initial_value=initial_value)
+
+    def offset_multi(
+            self, mapping, key_prefix='', namespace=None, initial_value=None):
+        results = {}
+        with self.store.lock:
+            self.store.stats['incr'] += len(mapping)
+            for key, delta in mapping.items():
+                item = self._get_item(key_prefix + key, namespace)
+                if item is not None:
+                    expiry = item[1]
+                    value = pickle.loads(item[0])
+                elif initial_value is not None:
+                    expiry = None
+                    value = initial_value
+                else:
+                    results[key] = None
+                    continue
+
+                if self.store.write_fails():
+                    results[key] = None
+                    continue
+
+                # memcache counters do not go below zero
+                value = max(int(value) + delta, 0)
+                self._set_item(key_prefix + key, value, expiry, namespace)
+                results[key] = value
+        return results
+
+    def delete(self, key, seconds=0, namespace=None):
+        with self.store.lock:
+            self.store.stats['delete'] += 1
+            if self._get_item(key, namespace) is None:
+                return memcache.DELETE_ITEM_MISSING
+
+            del self.store.items[(namespace, key)]
+            return memcache.DELETE_SUCCESSFUL
+
+    def delete_multi(self, keys, seconds=0, key_prefix='', namespace=None):
+        for key in keys:
+            self.delete(key_prefix + key, namespace=namespace)
+        return True
@@ -1,17 +1,28 @@
 """
     Defines the channel manager
 """
+import logging
 import time
 import uuid
+from collections import OrderedDict
 
-from google.appengine.api import memcache
-
-from .utils import retry_until_truthy
+from .backends import get_memcache_backend
+from .utils import retry_failed_keys, retry_with_backoff
 
 
 class GreendayChannelManager(object):
     """
         A manager to encapsulate a memcache-based messaging queue
+
+        Each channel is an append-only ring buffer of `max_message_backlog`
+        slots. A counter holds the sequence number of the last message
+        published to the channel and message N is written to slot
+        N % max_message_backlog, so publishing costs the same however many
+        clients are subscribed.
+
+        Each client keeps a cursor of the last sequence number it has
+        pulled from each channel it subscribed to and pulls the slots after
+        it. Clients can only pull the channels in their cursor.
     """
     def __init__(
             self,
@@ -19,129 +30,280 @@ class GreendayChannelManager(object):
             message_namespace="channel-buckets",
             channels=None,
             max_message_backlog=200,
-            pull_retries=37,
-            pull_sleep=1.5,
-            default_cas_ttl=60*30):
+            pull_timeout=45,
+            pull_min_sleep=0.25,
+            pull_max_sleep=4,
+            default_cas_ttl=60*30,
+            lost_message_timeout=5,
+            client=None):
         """
             Creates a channel manager
+
+            client: the storage backend, defaults to memcache. See
+            :mod:`greenday_channel.backends <greenday_channel.backends>`
         """
         assert channels
         self.client_namespace = client_namespace
         self.message_namespace = message_namespace
-        self.client = memcache.Client()
+        self.client = client or get_memcache_backend()
         self.default_cas_ttl = default_cas_ttl
         self.max_message_backlog = max_message_backlog
         self.channels = channels
-        self.pull_retries = pull_retries
-        self.pull_sleep = pull_sleep
+        self.pull_timeout = pull_timeout
+        self.pull_min_sleep = pull_min_sleep
+        self.pull_max_sleep = pull_max_sleep
+        self.lost_message_timeout = lost_message_timeout
+
+    @staticmethod
+    def get_head_key(channel):
+        """
+            Gets the key of the channel's last sequence number
+        """
+        return u"{0}:head".format(channel)
+
+    def get_slot_key(self, channel, seq):
+        """
+            Gets the key of the slot holding the channel's message `seq`
+        """
+        return u"{0}:{1}".format(channel, seq % self.max_message_backlog)
 
     def publish_message(self, message):
         """
             Publishes a message to all subscribed clients in the client group
         """
-        def _publish_message(token):
-            messages = self.client.gets(token, namespace=self.message_namespace)
+        self.publish_messages([message])
 
-            if messages is None:
-                self.client.set(token, [], namespace=self.message_namespace)
-                return False
-            else:
-                messages.append(
-                    {'message': message,
-                    'time': time.time()
-                    })
+    def publish_messages(self, new_messages):
+        """
+            Publishes a list of messages to all subscribed clients in the
+            client group
+        """
+        self.publish_channel_messages(
+            OrderedDict((c, new_messages) for c in self.channels))
 
-            if self.client.cas(
-                    token,
-                    messages,
-                    time=self.default_cas_ttl,
-                    namespace=self.message_namespace):
-                if len(messages) > self.max_message_backlog:
-                    self.remove_client(token)
-                return True
+    def publish_channel_messages(self, messages_by_channel):
+        """
+            Publishes each channel's own list of messages
+
+            Takes one batch increment of the channels' sequence numbers and
+            one batch write of the slots, whatever the number of channels or
+            clients. Only the keys which fail are retried.
+        """
+        messages_by_channel = OrderedDict(
+            (c, m) for c, m in messages_by_channel.items() if m)
+
+        if not messages_by_channel:
+            return
+
+        def _offset_heads(deltas):
+            heads = self.client.offset_multi(
+                deltas,
+                namespace=self.message_namespace,
+                initial_value=0)
+            return {k: v for k, v in heads.items() if v is not None}
+
+        heads = retry_failed_keys(
+            _offset_heads,
+            {self.get_head_key(c): len(m)
+                for c, m in messages_by_channel.items()},
+            site="channel.offset_heads")
+
+        now = time.time()
+        slots = {}
+        for channel, new_messages in messages_by_channel.items():
+            head = heads.get(self.get_head_key(channel))
+            if head is None:
+                logging.warning(
+                    "Could not publish %s messages to channel %s",
+                    len(new_messages), channel)
+                continue
+
+            first_seq = head - len(new_messages) + 1
+            for seq, message in enumerate(new_messages, first_seq):
+                slots[self.get_slot_key(channel, seq)] = {
+                    'seq': seq,
+                    'message': message,
+                    'time': now
+                }
+
+        def _set_slots(slots):
+            not_set = set(self.client.set_multi(
+                slots,
+                time=self.default_cas_ttl,
+                namespace=self.message_namespace))
+            return {k: True for k in slots if k not in not_set}
+
+        written = retry_failed_keys(
+            _set_slots, slots, site="channel.set_slots")
+        if len(written) < len(slots):
+            logging.warning(
+                "Could not write %s message slots", len(slots) - len(written))
+
+    def get_heads(self, channels=None):
+        """
+            Gets the sequence number of the last message published to each
+            channel, defaulting to the manager's channels
+        """
+        channels = self.channels if channels is None else channels
+        heads = self.client.get_multi(
+            [self.get_head_key(c) for c in channels],
+            namespace=self.message_namespace)
 
-        # fan out
-        for channel in self.channels:
-            for token in self.get_client_tokens(channel):
-                retry_until_truthy(_publish_message, args=(token,))
+        return {
+            c: int(heads.get(self.get_head_key(c)) or 0)
+            for c in channels
+        }
 
     def pop_messages(self, token):
         """
-            Pops all messages for a given client
+            Pops all messages for a given client, waiting up to
+            `pull_timeout` seconds for one to be published
+
+            Only the manager's channels which the client subscribed to are
+            read. Returns None if the client is unknown, has expired or did
+            not subscribe to any of the channels.
+
+            Whilst waiting only the channels' sequence numbers are read,
+            backing off from `pull_min_sleep` to `pull_max_sleep` seconds
+            between reads. Returns an empty list if nothing was published.
         """
-        def _pop_messages():
-            messages = self.client.gets(token, namespace=self.message_namespace)
-            if messages is None:
-                self.client.set(token, [], namespace=self.message_namespace)
-                return False
-            if self.client.cas(token, [], namespace=self.message_namespace):
+        cursor = self.get_cursor(token)
+
+        if not cursor or not any(c in cursor for c in self.channels):
+            return None
+
+        deadline = time.time() + self.pull_timeout
+        sleep = self.pull_min_sleep
+        while True:
+            messages = self.read_messages(cursor)
+            if messages:
+                self.set_cursor(token, cursor)
                 return messages
 
-        return retry_until_truthy(
-            _pop_messages,
-            max_retries=self.pull_retries,
-            sleep=self.pull_sleep)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                # keeps idle clients from expiring
+                self.set_cursor(token, cursor)
+                return []
 
-    def add_client(self, token):
+            time.sleep(min(sleep, remaining))
+            sleep = min(sleep * 1.5, self.pull_max_sleep)
+
+    def read_messages(self, cursor):
         """
-            Adds a client to be subscribed
+            Reads the messages published after the cursor and moves the
+            cursor past them
 
-            token: uuid to identify the app client
+            Stops at a message whose sequence number has been taken but
+            whose slot has not been written yet, unless a later message has
+            been there for longer than `lost_message_timeout`
         """
-        def _add_client(channel):
+        channels = [c for c in self.channels if c in cursor]
+        heads = self.get_heads(channels)
+
+        # {channel: [sequence numbers to read]}
+        pending = {}
+        for channel in channels:
+            head, last = heads[channel], cursor[channel]
+
+            if head < last:
+                logging.warning(
+                    "Sequence of channel %s restarted at %s", channel, head)
+                last = cursor[channel] = 0
 
-            tokens = self.get_client_tokens(channel)
+            if head - last > self.max_message_backlog:
+                logging.warning(
+                    "Client missed %s messages on channel %s",
+                    head - last - self.max_message_backlog, channel)
+                last = cursor[channel] = head - self.max_message_backlog
 
-            if token not in tokens:
-                tokens.append(token)
+            if head > last:
+                pending[channel] = range(last + 1, head + 1)
 
-                return self.client.cas(
-                        channel,
-                        tokens,
-                        time=self.default_cas_ttl,
-                        namespace=self.client_namespace)
-            else:
-                return True
+        if not pending:
+            return []
 
-        done = 0
-        for channel in self.channels:
-            if retry_until_truthy(_add_client, args=(channel,)):
-                done += 1
+        slots = self.client.get_multi(
+            [self.get_slot_key(channel, seq)
+                for channel, seqs in pending.items() for seq in seqs],
+            namespace=self.message_namespace)
+
+        now = time.time()
+        messages = []
+        for channel in channels:
+            seqs = pending.get(channel, [])
+            channel_slots = [
+                slots.get(self.get_slot_key(channel, seq)) for seq in seqs]
+
+            for i, (seq, slot) in enumerate(zip(seqs, channel_slots)):
+                if slot is not None and slot['seq'] == seq:
+                    messages.append({
+                        'message': slot['message'],
+                        'time': slot['time']
+                    })
+                elif not (
+                        (slot is not None and slot['seq'] > seq) or
+                        self._is_lost(seqs[i + 1:], channel_slots[i + 1:], now)):
+                    break
+                else:
+                    logging.warning(
+                        "Lost message %s on channel %s", seq, channel)
 
-        return done == len(self.channels)
+                cursor[channel] = seq
 
+        return messages
 
-    def get_client_tokens(self, channel):
+    def _is_lost(self, later_seqs, later_slots, now):
         """
-            Gets all clients currently subscribed
+            Whether a message which has not been written should be given up
+            on because a later one was written long enough ago
         """
-        tokens = self.client.gets(channel, namespace=self.client_namespace)
+        return any(
+            slot is not None and slot['seq'] == seq and
+            now - slot['time'] > self.lost_message_timeout
+            for seq, slot in zip(later_seqs, later_slots))
 
-        if tokens is None:
-            self.client.set(channel, [], namespace=self.client_namespace)
-            tokens = []
+    def get_cursor(self, token):
+        """
+            Gets the {channel: sequence number} of the last message the
+            client has pulled from each channel
+        """
+        return self.client.get(token, namespace=self.client_namespace)
+
+    def set_cursor(self, token, cursor):
+        """
+            Stores the client's cursor
+
+            Retried as a lost write would deliver the messages again
+        """
+        return retry_with_backoff(
+            self.client.set,
+            site="channel.set_cursor",
+            args=(token, cursor),
+            kwargs={
+                'time': self.default_cas_ttl,
+                'namespace': self.client_namespace
+            })
 
-        return tokens
+    def add_client(self, token):
+        """
+            Adds a client to be subscribed to the manager's channels
+
+            The client receives the messages published after it subscribed.
+            The channels must already have been checked with
+            :func:`clean_channels <greenday_channel.utils.clean_channels>`
+            as the client can pull any of them.
+
+            token: uuid to identify the app client
+        """
+        return self.set_cursor(token, self.get_heads())
 
     def remove_client(self, token):
         """
             Removes a given subscribed client
         """
-        def _remove_client(channel):
-            tokens = self.get_client_tokens(channel)
-
-            if token in tokens:
-                tokens.remove(token)
-                return self.client.cas(
-                    channel,
-                    tokens,
-                    time=self.default_cas_ttl,
-                    namespace=self.client_namespace)
-            else:
-                return True
-
-        for channel in self.channels:
-            return retry_until_truthy(_remove_client, args=(channel,))
+        self.client.delete(token, namespace=self.client_namespace)
+        return True
 
     @classmethod
     def create_client_token(cls):
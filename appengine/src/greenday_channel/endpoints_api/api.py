@@ -3,16 +3,15 @@ Experiment to see if Endpoints will be able to serve the channels functionality
 """
 
 import endpoints
-import json
 from protorpc import remote
 
 from google.appengine.runtime import DeadlineExceededError
 
 from django.contrib.auth import get_user_model
-from django.core.serializers.json import DjangoJSONEncoder
 from django.core.exceptions import PermissionDenied
 
 from greenday_api.api import greenday_api
+from greenday_core.eventbus import with_buffered_appevents
 from greenday_core.api_exceptions import (
     ForbiddenException,
     InternalServerErrorException,
@@ -20,6 +19,7 @@ from greenday_core.api_exceptions import (
 )
 
 from ..channel import GreendayChannelManager
+from ..events import encode_pulled_messages
 from ..onlinecollaborators import OnlineCollaboratorsManager
 from ..utils import clean_channels
 
@@ -39,9 +39,16 @@ class ChannelsAPI(remote.Service):
         ChannelResponseMessage,
         path='channels/pull',
         http_method='GET')
+    @with_buffered_appevents
     def pull(self, request):
         """
         Pops the latest messages off the queue for the given client token
+
+        Waits for up to the channel manager's pull timeout, which is kept
+        below the request deadline
+
+        Only the channels which the token subscribed to are pulled. Unknown
+        or expired tokens are forbidden.
         """
         get_current_user()
 
@@ -51,29 +58,28 @@ class ChannelsAPI(remote.Service):
 
         try:
             messages = manager.pop_messages(request.token)
+            if messages is None:
+                raise ForbiddenException(
+                    "Not subscribed to the channels. Please resubscribe")
 
             project_channel = _get_project_channel(channels)
             if project_channel:
                 online_collaborator_manager = OnlineCollaboratorsManager(
                         project_channel.lstrip('projectid-'))
-                online_collaborator_manager.refresh_collaborator(request.token)
-                online_collaborator_manager.purge_expired_collaborators()
+                online_collaborator_manager.keep_alive(request.token)
 
         except DeadlineExceededError:
             # swallow DeadlineExceededError - client will retry
             return ChannelResponseMessage()
 
-        if messages is False:
-            # internal loop exhausted
-            return ChannelResponseMessage()
-        else:
-            return ChannelResponseMessage(items=json.dumps(messages, cls=DjangoJSONEncoder))
+        return ChannelResponseMessage(items=encode_pulled_messages(messages))
 
     @endpoints.method(
         ChannelRequestContainer,
         SubscribeResponseMessage,
         path='channels/subscribe',
         http_method='POST')
+    @with_buffered_appevents
     def subscribe(self, request):
         """
             Creates a client in memcache which will have events published to it
@@ -113,6 +119,7 @@ class ChannelsAPI(remote.Service):
         SubscribeResponseMessage,
         path='channels/unsubscribe',
         http_method='POST')
+    @with_buffered_appevents
     def unsubscribe(self, request):
         """
             Removes a subscribed client
@@ -0,0 +1,120 @@
+"""
+    Builds and caches the payloads of the events published to channels
+
+    An event's payload is encoded to JSON once, when it is published, and
+    cached by event ID. Channels only carry a reference to the event, and
+    pulls fetch the payloads of all of their events with one get_multi and
+    splice the pre-encoded JSON into the response.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from greenday_api.event.utils import get_model_message
+from greenday_core.eventbus import get_events_by_id
+
+from .backends import get_memcache_backend
+
+
+EVENT_PAYLOAD_NAMESPACE = "channel-events"
+
+# as long as messages are kept in the channels
+EVENT_PAYLOAD_TTL = 60 * 30
+
+
+def get_event_reference(event_id):
+    """
+        Gets the message published to channels for an event
+    """
+    return {"event_id": event_id}
+
+
+def is_event_reference(message):
+    """
+        Checks whether a message pulled from a channel is an event
+        reference made by :func:`get_event_reference`
+    """
+    return isinstance(message, dict) and message.keys() == ["event_id"]
+
+
+def encode_event_payload(event, model):
+    """
+        Encodes the JSON payload which clients pull for an event
+    """
+    return json.dumps({
+        "event": event.to_dict(),
+        "model": get_model_message(event, model) if model else None
+    }, cls=DjangoJSONEncoder)
+
+
+def cache_event_payloads(events, client=None):
+    """
+        Encodes and caches the payloads of a list of (event, model) tuples
+        with a single memcache call
+
+        Returns {event ID: payload}
+    """
+    payloads = {
+        event.pk: encode_event_payload(event, model)
+        for event, model in events
+    }
+
+    if payloads:
+        (client or get_memcache_backend()).set_multi(
+            {str(pk): payload for pk, payload in payloads.items()},
+            time=EVENT_PAYLOAD_TTL,
+            namespace=EVENT_PAYLOAD_NAMESPACE)
+
+    return payloads
+
+
+def get_event_payloads(event_ids, client=None):
+    """
+        Gets the cached payloads of events, rebuilding any which have been
+        evicted
+
+        Returns {event ID: payload}. Events which no longer exist are left
+        out.
+    """
+    client = client or get_memcache_backend()
+
+    cached = client.get_multi(
+        [str(pk) for pk in event_ids], namespace=EVENT_PAYLOAD_NAMESPACE)
+    payloads = {int(pk): payload for pk, payload in cached.items()}
+
+    missing = set(event_ids) - set(payloads)
+    if missing:
+        payloads.update(
+            cache_event_payloads(get_events_by_id(missing), client=client))
+
+    return payloads
+
+
+def encode_pulled_messages(messages, client=None):
+    """
+        Encodes the messages popped by
+        :meth:`GreendayChannelManager.pop_messages <greenday_channel.channel.GreendayChannelManager.pop_messages>`
+        to a JSON list
+
+        Event references are replaced by the events' cached payloads. Other
+        messages are encoded as they are.
+    """
+    event_ids = [
+        m['message']['event_id'] for m in messages
+        if is_event_reference(m['message'])
+    ]
+    payloads = get_event_payloads(event_ids, client=client) if event_ids else {}
+
+    items = []
+    for m in messages:
+        if is_event_reference(m['message']):
+            payload = payloads.get(m['message']['event_id'])
+            if payload is None:
+                continue
+        else:
+            payload = json.dumps(m['message'], cls=DjangoJSONEncoder)
+
+        items.append(u'{{"message": {0}, "time": {1}}}'.format(
+            payload, json.dumps(m['time'])))
+
+    return u"[{0}]".format(u", ".join(items))
@@ -0,0 +1,3 @@
+"""
+    Package for custom Django management functions
+"""
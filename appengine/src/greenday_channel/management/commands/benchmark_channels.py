@@ -0,0 +1,237 @@
+"""
+    Management command to benchmark the channel managers under load
+"""
+import datetime
+import random
+import threading
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from greenday_channel.backends import LocalMemoryClient, LocalMemoryStore
+from greenday_channel.channel import GreendayChannelManager
+from greenday_channel.onlinecollaborators import OnlineCollaboratorsManager
+from greenday_channel.utils import retry_stats
+
+
+def _percentile(values, percentile):
+    """
+        Gets the value at the given percentile of a sorted list
+    """
+    if not values:
+        return 0
+    index = int(round(percentile / 100.0 * (len(values) - 1)))
+    return values[index]
+
+
+class Subscriber(threading.Thread):
+    """
+        A client pulling one channel and keeping its presence alive on the
+        channel's project
+    """
+    def __init__(self, store, channel, project_id, pull_timeout):
+        super(Subscriber, self).__init__()
+        self.daemon = True
+        self.channel = channel
+        self.manager = GreendayChannelManager(
+            channels=[channel],
+            pull_timeout=pull_timeout,
+            pull_min_sleep=0.01,
+            pull_max_sleep=0.1,
+            client=LocalMemoryClient(store))
+        self.collaborators = OnlineCollaboratorsManager(
+            project_id, client=LocalMemoryClient(store))
+        self.token = self.manager.create_client_token()
+        self.manager.add_client(self.token)
+        self.stopping = threading.Event()
+        self.received = []
+        self.pulls = 0
+        self.pull_seconds = 0
+
+    def pull(self):
+        start = time.time()
+        messages = self.manager.pop_messages(self.token)
+        self.collaborators.refresh_collaborator(self.token)
+        self.pull_seconds += time.time() - start
+        self.pulls += 1
+        self.received.extend(m['message'] for m in messages)
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.pull()
+
+        # drain what was published before the publishers finished
+        self.manager.pull_timeout = 0
+        self.pull()
+
+
+class Publisher(threading.Thread):
+    """
+        A task publishing messages to random channels
+    """
+    def __init__(self, store, index, channels, messages):
+        """
+            channels: the channels to pick from for each message
+        """
+        super(Publisher, self).__init__()
+        self.daemon = True
+        self.store = store
+        self.index = index
+        self.channels = channels
+        self.messages = messages
+        self.published = []
+        self.latencies = []
+
+    def run(self):
+        for n in xrange(self.messages):
+            channel = random.choice(self.channels)
+            manager = GreendayChannelManager(
+                channels=[channel], client=LocalMemoryClient(self.store))
+
+            message = (self.index, n)
+            start = time.time()
+            manager.publish_message(message)
+            self.latencies.append(time.time() - start)
+            self.published.append((channel, message))
+
+
+class Command(BaseCommand):
+    """
+        Simulates subscribers, publishers and channels sharing an in-process
+        channel backend and reports publish latency, backend calls and the
+        ratio of messages delivered to subscribers
+    """
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--subscribers', '-n', action='store', dest='subscribers',
+            default=200, help='Number of subscribed clients', type="int"),
+        make_option(
+            '--publishers', '-m', action='store', dest='publishers',
+            default=4, help='Number of publishing tasks', type="int"),
+        make_option(
+            '--channels', '-k', action='store', dest='channels',
+            default=10, help='Number of channels', type="int"),
+        make_option(
+            '--messages', action='store', dest='messages',
+            default=100, help='Messages sent by each publisher', type="int"),
+        make_option(
+            '--pull-timeout', action='store', dest='pull_timeout',
+            default=0.5, help='Seconds a pull waits for messages',
+            type="float"),
+        make_option(
+            '--failure-rate', action='store', dest='failure_rate',
+            default=0, help='Fraction of backend writes which fail',
+            type="float"),
+        make_option(
+            '--hot-channel', action='store_true', dest='hot_channel',
+            default=False, help='Publish every message to the first channel'),
+    )
+
+    def handle(
+            self, subscribers=200, publishers=4, channels=10, messages=100,
+            pull_timeout=0.5, failure_rate=0, hot_channel=False, **kwargs):
+        store = LocalMemoryStore(failure_rate=failure_rate)
+        channel_names = ["projectid-{0}".format(i) for i in range(channels)]
+
+        subscriber_threads = [
+            Subscriber(store, channel_names[i % channels], i % channels,
+                       pull_timeout)
+            for i in range(subscribers)
+        ]
+        self.add_collaborators(subscriber_threads)
+
+        publisher_threads = [
+            Publisher(
+                store, i,
+                channel_names[:1] if hot_channel else channel_names,
+                messages)
+            for i in range(publishers)
+        ]
+
+        store.stats.clear()
+        retry_stats.reset()
+        start = time.time()
+
+        for thread in subscriber_threads + publisher_threads:
+            thread.start()
+
+        for thread in publisher_threads:
+            thread.join()
+        publish_seconds = time.time() - start
+
+        for thread in subscriber_threads:
+            thread.stopping.set()
+        for thread in subscriber_threads:
+            thread.join()
+
+        self.report_publishing(publisher_threads, publish_seconds)
+        self.report_delivery(publisher_threads, subscriber_threads)
+        self.report_backend(store, subscriber_threads)
+
+    def add_collaborators(self, subscriber_threads):
+        """
+            Puts every subscriber online on its channel's project without
+            publishing events
+        """
+        for i, thread in enumerate(subscriber_threads):
+            thread.collaborators.set_heartbeat(thread.token, {
+                'collaborator': {
+                    'id': i,
+                    'timestamp': datetime.datetime.utcnow()
+                }
+            })
+
+    def report_publishing(self, publisher_threads, publish_seconds):
+        latencies = sorted(
+            l for t in publisher_threads for l in t.latencies)
+
+        self.stdout.write(
+            u"published {0} messages in {1:.2f}s".format(
+                len(latencies), publish_seconds))
+        self.stdout.write(
+            u"publish latency p50 {0:.2f}ms p95 {1:.2f}ms p99 {2:.2f}ms "
+            u"max {3:.2f}ms".format(*[
+                _percentile(latencies, p) * 1000 for p in (50, 95, 99, 100)]))
+
+    def report_delivery(self, publisher_threads, subscriber_threads):
+        by_channel = {}
+        for thread in publisher_threads:
+            for channel, message in thread.published:
+                by_channel.setdefault(channel, set()).add(message)
+
+        expected = delivered = duplicated = 0
+        for thread in subscriber_threads:
+            published = by_channel.get(thread.channel, set())
+            received = [m for m in thread.received if m in published]
+            expected += len(published)
+            delivered += len(set(received))
+            duplicated += len(received) - len(set(received))
+
+        ratio = float(delivered) / expected if expected else 1
+        self.stdout.write(
+            u"delivered {0}/{1} ({2:.2%}) lost {3:.2%} duplicated {4}".format(
+                delivered, expected, ratio, 1 - ratio, duplicated))
+
+    def report_backend(self, store, subscriber_threads):
+        pulls = sum(t.pulls for t in subscriber_threads)
+        pull_seconds = sum(t.pull_seconds for t in subscriber_threads)
+        stats = store.stats
+
+        self.stdout.write(
+            u"{0} pulls, {1:.2f}ms/pull".format(
+                pulls, pull_seconds / pulls * 1000 if pulls else 0))
+        self.stdout.write(
+            u"backend calls: " + u", ".join(
+                u"{0} {1}".format(k, v) for k, v in sorted(stats.items())))
+
+        for site, site_stats in sorted(retry_stats.get().items()):
+            self.stdout.write(
+                u"retries {0:<30} {1} calls {2:.2f} attempts/call "
+                u"{3} gave up {4:.2f}ms spent".format(
+                    site,
+                    site_stats['calls'],
+                    float(site_stats['attempts']) / site_stats['calls'],
+                    site_stats['failures'],
+                    site_stats['seconds'] * 1000))
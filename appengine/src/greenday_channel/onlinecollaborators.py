@@ -2,13 +2,14 @@
     Defines the online collaborators manager
 """
 import datetime
-
-from google.appengine.api import memcache
+import time
 
 from greenday_core.constants import EventKind
 from greenday_core.eventbus import publish_appevent
+from greenday_core.task_helpers import auto_view
 
-from .utils import retry_until_truthy
+from .backends import get_memcache_backend
+from .utils import retry_with_backoff
 
 
 class OnlineCollaboratorsManager(object):
@@ -16,7 +17,14 @@ class OnlineCollaboratorsManager(object):
         Tracks the online/offline state of collaborators working on
         projects (could be any object though)
 
-        Fires off system events to the eventbus to indicate online/offline users
+        Each client token has its own heartbeat key, so clients never
+        contend with each other. The tokens are found through an index of
+        time buckets: a token is appended to the current bucket the first
+        time it heartbeats in it, and readers get_multi the buckets covering
+        the expiry period. Heartbeats past the expiry are ignored on read.
+
+        Fires off system events to the eventbus to indicate online users.
+        Offline users are announced by :func:`sweep_offline_collaborators`.
     """
     def __init__(
             self,
@@ -24,20 +32,27 @@ class OnlineCollaboratorsManager(object):
             prefix="project",
             namespace="collab",
             collaborator_expiry=90,
+            bucket_size=30,
             online_event_kind=EventKind.PROJECTCOLLABORATORONLINE,
-            offline_event_kind=EventKind.PROJECTCOLLABORATOROFFLINE
+            offline_event_kind=EventKind.PROJECTCOLLABORATOROFFLINE,
+            client=None
             ):
         """
             Creates an online collaborators manager
 
             object_id: the object on which users are collaborating
+            client: the storage backend, defaults to memcache. See
+            :mod:`greenday_channel.backends <greenday_channel.backends>`
         """
         self.object_id = object_id
         self.prefix = prefix
         self.namespace = namespace
-        self.client = memcache.Client()
+        self.client = client or get_memcache_backend()
         self.collaborator_expiry = datetime.timedelta(
             seconds=collaborator_expiry)
+        self.bucket_size = bucket_size
+        # expired heartbeats are kept for the sweeper to find
+        self.heartbeat_ttl = collaborator_expiry * 3
         self.online_event_kind = online_event_kind
         self.offline_event_kind = offline_event_kind
 
@@ -45,6 +60,23 @@ class OnlineCollaboratorsManager(object):
     def key(self):
         return "{0}-{1}".format(self.prefix, self.object_id)
 
+    @property
+    def index_key(self):
+        """
+            The index of the tokens heartbeating on the object
+        """
+        return u"{0}:index".format(self.key)
+
+    @property
+    def active_index_key(self):
+        """
+            The index of the objects with heartbeating tokens
+        """
+        return u"{0}-active:index".format(self.prefix)
+
+    def get_heartbeat_key(self, token):
+        return u"{0}:token:{1}".format(self.key, token)
+
     @classmethod
     def user_to_dict(cls, user):
         return {
@@ -57,135 +89,236 @@ class OnlineCollaboratorsManager(object):
             'timestamp': datetime.datetime.utcnow()
         }
 
-    def filter_expired_collaborators(self, collaborators):
-        now = datetime.datetime.utcnow()
-        for k, v in collaborators.items():
-            if (now - v['timestamp']) > self.collaborator_expiry:
-                publish_appevent(
-                    self.offline_event_kind,
-                    object_id=collaborators[k]['id'],
-                    project_id=self.object_id,
-                    meta=collaborators[k]['id'],
-                    user_id=collaborators[k]['id'])
+    def is_expired(self, collaborator, now=None):
+        now = now or datetime.datetime.utcnow()
+        return (now - collaborator['timestamp']) > self.collaborator_expiry
 
-                del collaborators[k]
+    def get_bucket(self, now=None):
+        return int((now or time.time()) // self.bucket_size)
 
-        return collaborators
+    def get_buckets(self, seconds):
+        """
+            Gets the index buckets covering the last `seconds` seconds
+        """
+        now = time.time()
+        return range(self.get_bucket(now - seconds), self.get_bucket(now) + 1)
 
-    def add_collaborator(self, user, token):
+    def append_to_index(self, index_key, value, bucket):
         """
-            Adds a user to the list of collaborators online for the given object
+            Appends a value to a bucket of an index
 
-            Users linked to the passed token so that they can be later removed
-            using just the token
+            Returns the value's position in the bucket, starting from 1
         """
-        user_dict = self.user_to_dict(user)
+        counter_key = u"{0}:{1}".format(index_key, bucket)
+        ttl = self.heartbeat_ttl + self.bucket_size
 
-        def _add_collaborator():
-            collaborators = self.get_collaborators()
+        def _incr():
+            # the counter is added with a TTL as incr cannot set one
+            self.client.add(counter_key, 0, time=ttl, namespace=self.namespace)
+            return self.client.incr(counter_key, namespace=self.namespace)
 
-            # prevent duplicate collaborator entries if a user has multiple windows open
-            for k, v in collaborators.items():
-                if v['id'] == user.pk:
-                    del collaborators[k]
+        seq = retry_with_backoff(_incr, site="collaborators.incr_index")
+        if seq is not None:
+            retry_with_backoff(
+                self.client.set,
+                site="collaborators.set_index",
+                args=(u"{0}:{1}".format(counter_key, seq), value),
+                kwargs={'time': ttl, 'namespace': self.namespace})
 
-            collaborators[token] = user_dict
+        return seq
 
-            ret = self.client.cas(
-                self.key,
-                collaborators,
-                namespace=self.namespace
-            )
+    def read_index(self, index_key, buckets):
+        """
+            Gets the set of values in the buckets of an index
+        """
+        counter_keys = [u"{0}:{1}".format(index_key, b) for b in buckets]
+        counts = self.client.get_multi(counter_keys, namespace=self.namespace)
 
-            if ret:
-                publish_appevent(
-                    self.online_event_kind,
-                    object_id=user.pk,
-                    project_id=self.object_id,
-                    meta=user.pk,
-                    user=user)
-            return ret
+        slot_keys = [
+            u"{0}:{1}".format(k, seq)
+            for k in counter_keys
+            for seq in xrange(1, int(counts.get(k) or 0) + 1)
+        ]
+        if not slot_keys:
+            return set()
 
-        return retry_until_truthy(_add_collaborator)
+        return set(
+            self.client.get_multi(slot_keys, namespace=self.namespace).values())
 
-    def remove_collaborator(self, token):
+    def set_heartbeat(self, token, heartbeat):
         """
-            Removes a user from the list of collaborators online for the given
-            object
+            Stores a token's heartbeat and indexes the token in the current
+            bucket if it is not there yet
+
+            heartbeat: {'collaborator': user dict, 'bucket': last indexed bucket}
+        """
+        bucket = self.get_bucket()
+        if heartbeat.get('bucket') != bucket:
+            heartbeat['bucket'] = bucket
+            if self.append_to_index(self.index_key, token, bucket) == 1:
+                self.append_to_index(
+                    self.active_index_key, self.object_id, bucket)
+
+        return retry_with_backoff(
+            self.client.set,
+            site="collaborators.set_heartbeat",
+            args=(self.get_heartbeat_key(token), heartbeat),
+            kwargs={'time': self.heartbeat_ttl, 'namespace': self.namespace})
+
+    def get_heartbeats(self, seconds):
         """
-        def _remove_collaborator():
-            collaborators = self.get_collaborators()
+            Gets the {token: heartbeat} of the tokens indexed in the last
+            `seconds` seconds
+        """
+        keys = {
+            self.get_heartbeat_key(token): token
+            for token in self.read_index(
+                self.index_key, self.get_buckets(seconds))
+        }
+        if not keys:
+            return {}
+
+        heartbeats = self.client.get_multi(
+            keys.keys(), namespace=self.namespace)
 
-            if token in collaborators:
-                user_id = collaborators[token]['id']
-                del collaborators[token]
+        return {keys[k]: v for k, v in heartbeats.items()}
 
-                ret = self.client.cas(
-                    self.key,
-                    collaborators,
-                    namespace=self.namespace
-                )
+    def add_collaborator(self, user, token):
+        """
+            Adds a user to the list of collaborators online for the given object
 
-                if ret:
-                    publish_appevent(
-                        self.offline_event_kind,
-                        object_id=user_id,
-                        project_id=self.object_id,
-                        meta=user_id,
-                        user_id=user_id)
+            Users linked to the passed token so that they can be later removed
+            using just the token
+        """
+        self.set_heartbeat(token, {'collaborator': self.user_to_dict(user)})
 
-                return ret
+        publish_appevent(
+            self.online_event_kind,
+            object_id=user.pk,
+            project_id=self.object_id,
+            meta=user.pk,
+            user=user)
 
-        return retry_until_truthy(_remove_collaborator)
+        return True
 
-    def get_collaborators(self, filter_expired=True):
+    def remove_collaborator(self, token):
         """
-            Gets a list of users online
+            Removes a user from the list of collaborators online for the given
+            object
         """
-        collaborators = self.client.gets(
-            self.key, namespace=self.namespace)
+        heartbeat = self.client.get(
+            self.get_heartbeat_key(token), namespace=self.namespace)
 
-        if collaborators is None:
-            self.client.set(self.key, {}, namespace=self.namespace)
-            collaborators = {}
+        if heartbeat is not None:
+            self.client.delete(
+                self.get_heartbeat_key(token), namespace=self.namespace)
 
-        if filter_expired:
-            filtered_collaborators = self.filter_expired_collaborators(collaborators)
+            user_id = heartbeat['collaborator']['id']
+            publish_appevent(
+                self.offline_event_kind,
+                object_id=user_id,
+                project_id=self.object_id,
+                meta=user_id,
+                user_id=user_id)
 
-            if len(filtered_collaborators) != len(collaborators):
-                self.client.set(self.key, filtered_collaborators, namespace=self.namespace)
+        return True
+
+    def get_collaborators(self):
+        """
+            Gets a dict of the users online keyed by token
+
+            Users with several tokens online are only included once, by
+            their latest token. Nothing is written.
+        """
+        now = datetime.datetime.utcnow()
+        latest = {}
+        for token, heartbeat in self.get_heartbeats(
+                self.collaborator_expiry.total_seconds()).items():
+            collaborator = heartbeat['collaborator']
+            if self.is_expired(collaborator, now):
+                continue
 
-            collaborators = filtered_collaborators
+            current = latest.get(collaborator['id'])
+            if (current is None or
+                    current[1]['timestamp'] < collaborator['timestamp']):
+                latest[collaborator['id']] = (token, collaborator)
 
-        return collaborators
+        return dict(latest.values())
 
     def refresh_collaborator(self, token):
         """
             Refreshes a user on a given project so that the cache doesn't expire
 
-            If the collaborator doesn't exist then nothing happens
+            If the collaborator doesn't exist or has expired then nothing
+            happens
         """
-        def _refresh_collaborator():
-            collaborators = self.get_collaborators(filter_expired=False)
+        heartbeat = self.client.get(
+            self.get_heartbeat_key(token), namespace=self.namespace)
 
-            if token in collaborators:
-                collaborators[token]['timestamp'] = datetime.datetime.utcnow()
+        if heartbeat is None or self.is_expired(heartbeat['collaborator']):
+            return True
 
-                return self.client.cas(
-                    self.key,
-                    collaborators,
-                    namespace=self.namespace
-                )
+        heartbeat['collaborator']['timestamp'] = datetime.datetime.utcnow()
+        return self.set_heartbeat(token, heartbeat)
+
+    def keep_alive(self, token, interval=30):
+        """
+            Refreshes the collaborator at most once every `interval` seconds
+
+            Polling clients call this on every request, so the throttle
+            costs a single memcache call when there is nothing to do
+        """
+        if self.client.add(
+                u"refresh-{0}".format(token),
+                True,
+                time=interval,
+                namespace=self.namespace):
+            self.refresh_collaborator(token)
+
+    def get_active_object_ids(self):
+        """
+            Gets the IDs of the objects which have had collaborators within
+            the heartbeat TTL
+        """
+        return self.read_index(
+            self.active_index_key, self.get_buckets(self.heartbeat_ttl))
+
+    def sweep(self):
+        """
+            Deletes expired heartbeats and announces the users who no longer
+            have any token online
+        """
+        now = datetime.datetime.utcnow()
+        online, expired = set(), {}
+        for token, heartbeat in self.get_heartbeats(self.heartbeat_ttl).items():
+            collaborator = heartbeat['collaborator']
+            if self.is_expired(collaborator, now):
+                expired[token] = collaborator['id']
             else:
-                return True
+                online.add(collaborator['id'])
+
+        if not expired:
+            return
 
-        return retry_until_truthy(_refresh_collaborator)
+        self.client.delete_multi(
+            [self.get_heartbeat_key(token) for token in expired],
+            namespace=self.namespace)
 
-    def purge_expired_collaborators(self):
-        collaborators = self.get_collaborators(filter_expired=True)
-        self.client.cas(
-            self.key,
-            collaborators,
-            namespace=self.namespace
-        )
+        for user_id in set(expired.values()) - online:
+            publish_appevent(
+                self.offline_event_kind,
+                object_id=user_id,
+                project_id=self.object_id,
+                meta=user_id,
+                user_id=user_id)
 
+
+@auto_view
+def sweep_offline_collaborators(prefix="project"):
+    """
+        Announces the collaborators who have gone offline on every object
+        with recent collaborators
+    """
+    for object_id in OnlineCollaboratorsManager(
+            None, prefix=prefix).get_active_object_ids():
+        OnlineCollaboratorsManager(object_id, prefix=prefix).sweep()
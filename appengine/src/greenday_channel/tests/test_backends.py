@@ -0,0 +1,159 @@
+"""
+    Tests for :mod:`greenday_channel.backends <greenday_channel.backends>`
+"""
+import threading
+import time
+import mock
+from milkman.dairy import milkman
+
+from django.contrib.auth import get_user_model
+
+from greenday_core.tests.base import AppengineTestBed
+
+from ..backends import LocalMemoryClient, LocalMemoryStore
+from ..channel import GreendayChannelManager
+from ..onlinecollaborators import OnlineCollaboratorsManager
+
+
+class LocalMemoryClientTestCase(AppengineTestBed):
+    """
+        Tests for :class:`greenday_channel.backends.LocalMemoryClient <greenday_channel.backends.LocalMemoryClient>`
+    """
+    def setUp(self):
+        """
+            Bootstrap test data
+        """
+        super(LocalMemoryClientTestCase, self).setUp()
+        self.store = LocalMemoryStore()
+        self.client = LocalMemoryClient(self.store)
+
+    def test_cas(self):
+        """
+            CAS fails if the item was written since the client read it
+        """
+        other_client = LocalMemoryClient(self.store)
+        self.client.set("key", {"a": 1})
+
+        self.client.gets("key")
+        other_client.gets("key")
+
+        self.assertTrue(other_client.cas("key", {"a": 2}))
+        self.assertFalse(self.client.cas("key", {"a": 3}))
+        self.assertEqual({"a": 2}, self.client.get("key"))
+
+        # cas without gets fails
+        self.assertFalse(self.client.cas("key", {"a": 4}))
+        self.assertEqual(2, self.store.stats['cas_failed'])
+
+    def test_values_copied(self):
+        """
+            Mutating a stored or fetched value does not change the item
+        """
+        value = {"a": 1}
+        self.client.set("key", value)
+        value["a"] = 2
+        self.client.get("key")["a"] = 3
+
+        self.assertEqual({"a": 1}, self.client.get("key"))
+
+    def test_add(self):
+        """
+            Items are only added if they do not exist
+        """
+        self.assertEqual([], self.client.add_multi({"a": 1, "b": 2}))
+        self.assertEqual(
+            ["a"], self.client.add_multi({"a": 3, "c": 4}))
+        self.assertEqual(
+            {"a": 1, "b": 2, "c": 4},
+            self.client.get_multi(["a", "b", "c"]))
+
+    def test_incr(self):
+        """
+            Counters are incremented and do not go below zero
+        """
+        self.assertEqual(None, self.client.incr("counter"))
+        self.assertEqual(2, self.client.incr("counter", 2, initial_value=0))
+        self.assertEqual(
+            {"counter": 0, "other": 5},
+            self.client.offset_multi(
+                {"counter": -3, "other": 5}, initial_value=0))
+
+    def test_expiry(self):
+        """
+            Items are gone once they expire
+        """
+        self.client.set("key", 1, time=10)
+
+        with mock.patch(
+                "greenday_channel.backends.time.time",
+                return_value=time.time() + 11):
+            self.assertIsNone(self.client.get("key"))
+
+    def test_namespaces(self):
+        """
+            Keys in different namespaces are different items
+        """
+        self.client.set("key", 1, namespace="a")
+        self.client.set("key", 2, namespace="b")
+
+        self.assertEqual(1, self.client.get("key", namespace="a"))
+        self.assertEqual(2, self.client.get("key", namespace="b"))
+        self.assertIsNone(self.client.get("key"))
+
+    def test_threads(self):
+        """
+            Concurrent increments from many clients are not lost
+        """
+        def _incr():
+            client = LocalMemoryClient(self.store)
+            for _ in range(100):
+                client.incr("counter", initial_value=0)
+
+        threads = [threading.Thread(target=_incr) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1000, self.client.get("counter"))
+
+
+class LocalMemoryManagersTestCase(AppengineTestBed):
+    """
+        Tests the channel managers on a
+        :class:`greenday_channel.backends.LocalMemoryClient <greenday_channel.backends.LocalMemoryClient>`
+    """
+    def test_channel_manager(self):
+        """
+            Messages are published and pulled through the backend
+        """
+        store = LocalMemoryStore()
+        manager = GreendayChannelManager(
+            channels=["channel-1"],
+            pull_timeout=0,
+            client=LocalMemoryClient(store))
+        token = manager.create_client_token()
+        manager.add_client(token)
+
+        GreendayChannelManager(
+            channels=["channel-1"],
+            client=LocalMemoryClient(store)).publish_messages([1, 2])
+
+        self.assertEqual(
+            [1, 2], [m['message'] for m in manager.pop_messages(token)])
+        self.assertEqual(1, store.stats['incr'])
+
+    def test_collaborators_manager(self):
+        """
+            Collaborators are stored in the backend
+        """
+        store = LocalMemoryStore()
+        user = milkman.deliver(get_user_model())
+
+        OnlineCollaboratorsManager(
+            1, client=LocalMemoryClient(store)).add_collaborator(user, "token")
+
+        collaborators = OnlineCollaboratorsManager(
+            1, client=LocalMemoryClient(store)).get_collaborators()
+        self.assertEqual(["token"], collaborators.keys())
+        self.assertEqual(user.pk, collaborators["token"]["id"])
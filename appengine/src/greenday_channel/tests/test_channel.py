@@ -0,0 +1,264 @@
+"""
+    Tests for :mod:`greenday_channel.channel <greenday_channel.channel>`
+"""
+import time
+import mock
+
+from greenday_core.tests.base import AppengineTestBed
+
+from ..channel import GreendayChannelManager
+
+
+class GreendayChannelManagerTestCase(AppengineTestBed):
+    """
+        Tests for :class:`greenday_channel.channel.GreendayChannelManager <greenday_channel.channel.GreendayChannelManager>`
+    """
+    def create_manager(self, channels=("channel-1",), **kwargs):
+        """
+            Creates a channel manager which does not wait between pulls
+        """
+        kwargs.setdefault("pull_timeout", 0)
+        return GreendayChannelManager(channels=list(channels), **kwargs)
+
+    def subscribe(self, manager):
+        """
+            Subscribes a new client
+        """
+        token = manager.create_client_token()
+        manager.add_client(token)
+        return token
+
+    def test_publish_and_pull(self):
+        """
+            Each client pulls every message published since it subscribed
+        """
+        manager = self.create_manager()
+        manager.publish_message("before")
+
+        tokens = [self.subscribe(manager) for _ in range(3)]
+
+        manager.publish_message(1)
+        manager.publish_messages([2, 3])
+
+        for token in tokens:
+            self.assertEqual(
+                [1, 2, 3],
+                [m['message'] for m in manager.pop_messages(token)])
+
+        manager.publish_message(4)
+        self.assertEqual(
+            [4], [m['message'] for m in manager.pop_messages(tokens[0])])
+
+        # nothing new
+        self.assertFalse(manager.pop_messages(tokens[0]))
+
+    def test_publish_cost_independent_of_clients(self):
+        """
+            Publishing does the same memcache calls however many clients
+            are subscribed
+        """
+        manager = self.create_manager(channels=("channel-1", "channel-2"))
+        for _ in range(50):
+            self.subscribe(manager)
+
+        with mock.patch.object(
+                manager.client, "offset_multi",
+                wraps=manager.client.offset_multi) as mock_offset_multi, \
+                mock.patch.object(
+                    manager.client, "set_multi",
+                    wraps=manager.client.set_multi) as mock_set_multi, \
+                mock.patch.object(manager.client, "cas") as mock_cas:
+            manager.publish_messages([1, 2])
+
+        self.assertEqual(1, mock_offset_multi.call_count)
+        self.assertEqual(1, mock_set_multi.call_count)
+        self.assertFalse(mock_cas.called)
+
+    def test_several_channels(self):
+        """
+            Messages from all of the client's channels are pulled together
+        """
+        manager = self.create_manager(channels=("channel-1", "channel-2"))
+        token = self.subscribe(manager)
+
+        self.create_manager(channels=("channel-2",)).publish_message(2)
+        self.create_manager(channels=("channel-1",)).publish_message(1)
+
+        self.assertEqual(
+            [1, 2], [m['message'] for m in manager.pop_messages(token)])
+
+    def test_backlog_overrun(self):
+        """
+            A client which falls more than the backlog behind gets the
+            latest messages
+        """
+        manager = self.create_manager(max_message_backlog=3)
+        token = self.subscribe(manager)
+
+        manager.publish_messages(range(5))
+
+        self.assertEqual(
+            [2, 3, 4], [m['message'] for m in manager.pop_messages(token)])
+
+    def test_unwritten_slot(self):
+        """
+            A message whose slot has not been written yet holds back the
+            messages after it until it is considered lost
+        """
+        manager = self.create_manager(lost_message_timeout=5)
+        token = self.subscribe(manager)
+
+        manager.publish_messages([1, 2, 3])
+        manager.client.delete(
+            manager.get_slot_key("channel-1", 2),
+            namespace=manager.message_namespace)
+
+        self.assertEqual(
+            [1], [m['message'] for m in manager.pop_messages(token)])
+
+        with mock.patch(
+                "greenday_channel.channel.time.time",
+                return_value=time.time() + 10):
+            self.assertEqual(
+                [3], [m['message'] for m in manager.pop_messages(token)])
+
+    def test_expired_client(self):
+        """
+            A client whose cursor has expired is no longer subscribed
+        """
+        manager = self.create_manager()
+        token = self.subscribe(manager)
+        manager.publish_message(1)
+
+        manager.remove_client(token)
+        self.assertIsNone(manager.pop_messages(token))
+
+        manager.publish_message(2)
+        self.assertIsNone(manager.pop_messages(token))
+
+    def test_unknown_client(self):
+        """
+            A token which never subscribed can't pull
+        """
+        manager = self.create_manager()
+        manager.publish_message(1)
+
+        self.assertIsNone(
+            manager.pop_messages(manager.create_client_token()))
+
+    def test_unsubscribed_channel(self):
+        """
+            Clients only pull the channels they subscribed to
+        """
+        token = self.subscribe(self.create_manager(channels=("channel-1",)))
+        self.create_manager(
+            channels=("channel-1", "channel-2")).publish_messages([1])
+
+        self.assertIsNone(
+            self.create_manager(channels=("channel-2",)).pop_messages(token))
+
+        manager = self.create_manager(channels=("channel-1", "channel-2"))
+        self.assertEqual(
+            [1], [m['message'] for m in manager.pop_messages(token)])
+        self.assertEqual(["channel-1"], manager.get_cursor(token).keys())
+
+    def test_idle_pull(self):
+        """
+            An idle pull only reads the sequence numbers, backing off until
+            the time budget runs out
+        """
+        manager = self.create_manager(
+            pull_timeout=10, pull_min_sleep=1, pull_max_sleep=4)
+        token = self.subscribe(manager)
+
+        clock = {"now": time.time()}
+
+        def sleep(seconds):
+            clock["now"] += seconds
+
+        with mock.patch(
+                "greenday_channel.channel.time.time",
+                side_effect=lambda: clock["now"]), \
+                mock.patch(
+                    "greenday_channel.channel.time.sleep",
+                    side_effect=sleep) as mock_sleep, \
+                mock.patch.object(
+                    manager.client, "get_multi",
+                    wraps=manager.client.get_multi) as mock_get_multi:
+            self.assertEqual([], manager.pop_messages(token))
+
+        self.assertEqual(
+            [1, 1.5, 2.25, 3.375, 1.875],
+            [c[0][0] for c in mock_sleep.call_args_list])
+        self.assertEqual(6, mock_get_multi.call_count)
+
+    def test_publish_channel_messages(self):
+        """
+            Different messages for many channels are published in one batch
+        """
+        channels = ["channel-{0}".format(i) for i in range(10)]
+        manager = self.create_manager(channels=channels)
+        token = self.subscribe(manager)
+
+        with mock.patch.object(
+                manager.client, "offset_multi",
+                wraps=manager.client.offset_multi) as mock_offset_multi, \
+                mock.patch.object(
+                    manager.client, "set_multi",
+                    wraps=manager.client.set_multi) as mock_set_multi:
+            manager.publish_channel_messages(
+                {c: [c, i] for i, c in enumerate(channels)})
+
+        self.assertEqual(1, mock_offset_multi.call_count)
+        self.assertEqual(1, mock_set_multi.call_count)
+
+        messages = [m['message'] for m in manager.pop_messages(token)]
+        self.assertEqual(
+            [m for i, c in enumerate(channels) for m in (c, i)], messages)
+
+    @mock.patch("greenday_channel.utils.time.sleep")
+    def test_publish_retries_failed_slots(self, mock_sleep):
+        """
+            Only the slots which failed to be written are written again
+        """
+        manager = self.create_manager(channels=("channel-1", "channel-2"))
+        token = self.subscribe(manager)
+
+        set_multi = manager.client.set_multi
+        failed_key = manager.get_slot_key("channel-2", 1)
+        calls = []
+
+        def flaky_set_multi(mapping, **kwargs):
+            calls.append(sorted(mapping))
+            not_set = set_multi(
+                {k: v for k, v in mapping.items()
+                    if k != failed_key or len(calls) > 1},
+                **kwargs)
+            return not_set + ([failed_key] if len(calls) == 1 else [])
+
+        with mock.patch.object(
+                manager.client, "set_multi", side_effect=flaky_set_multi):
+            manager.publish_message("hello")
+
+        self.assertEqual([failed_key], calls[1])
+        self.assertEqual(
+            ["hello", "hello"],
+            [m['message'] for m in manager.pop_messages(token)])
+
+    @mock.patch("greenday_channel.utils.time.sleep")
+    def test_cursor_write_retried(self, mock_sleep):
+        """
+            A failed cursor write is retried so messages are not pulled
+            twice
+        """
+        manager = self.create_manager()
+        token = self.subscribe(manager)
+        manager.publish_message(1)
+
+        set_results = iter([False, True])
+        with mock.patch.object(
+                manager.client, "set",
+                side_effect=lambda *args, **kwargs: next(set_results)):
+            manager.pop_messages(token)
+
+        self.assertEqual(1, mock_sleep.call_count)
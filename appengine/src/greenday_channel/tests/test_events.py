@@ -0,0 +1,137 @@
+"""
+    Tests for :mod:`greenday_channel.events <greenday_channel.events>`
+"""
+import json
+import mock
+from milkman.dairy import milkman
+
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+
+from greenday_core.constants import EventKind
+from greenday_core.models import Event, Project, ProjectComment
+from greenday_core.tests.base import AppengineTestBed
+
+from ..channel import GreendayChannelManager
+from ..events import (
+    EVENT_PAYLOAD_NAMESPACE,
+    encode_pulled_messages,
+    get_event_reference
+)
+
+
+class EventPayloadsTestCase(AppengineTestBed):
+    """
+        Tests for :func:`greenday_channel.events.encode_pulled_messages <greenday_channel.events.encode_pulled_messages>`
+    """
+    def setUp(self):
+        """
+            Bootstrap test data
+        """
+        super(EventPayloadsTestCase, self).setUp()
+
+        self.project = milkman.deliver(Project)
+        self.user = milkman.deliver(get_user_model())
+        self.channel = "projectid-{0}".format(self.project.pk)
+        self.manager = GreendayChannelManager(
+            channels=[self.channel], pull_timeout=0)
+
+        self.events = []
+        for _ in range(3):
+            comment = ProjectComment.add_root(
+                project=self.project, user=self.user)
+            self.events.append(Event.objects.create(
+                kind=EventKind.PROJECTROOTCOMMENTCREATED,
+                object_id=comment.pk,
+                project_id=self.project.pk,
+                user=self.user,
+                timestamp=timezone.now()))
+
+    def subscribe(self):
+        """
+            Subscribes a new client
+        """
+        token = self.manager.create_client_token()
+        self.manager.add_client(token)
+        return token
+
+    def publish(self):
+        """
+            Publishes the events with the task handler
+        """
+        self.client.post(reverse("channel:publish_events_task"), {
+            "event_ids": ",".join(str(e.pk) for e in self.events)
+        })
+
+    def test_channels_hold_references(self):
+        """
+            Only references to the events are published to channels
+        """
+        token = self.subscribe()
+        self.publish()
+
+        self.assertEqual(
+            [get_event_reference(e.pk) for e in self.events],
+            [m['message'] for m in self.manager.pop_messages(token)])
+
+    def test_payload_fetched_once_per_pull(self):
+        """
+            Each pull gets the payloads of all its events with one memcache
+            call and no queries
+        """
+        tokens = [self.subscribe() for _ in range(3)]
+        self.publish()
+
+        for token in tokens:
+            messages = self.manager.pop_messages(token)
+
+            with mock.patch.object(
+                    self.manager.client, "get_multi",
+                    wraps=self.manager.client.get_multi) as mock_get_multi, \
+                    self.assertNumQueries(0):
+                items = json.loads(encode_pulled_messages(
+                    messages, client=self.manager.client))
+
+            self.assertEqual(1, mock_get_multi.call_count)
+            self.assertEqual(
+                [e.pk for e in self.events],
+                [item['message']['event']['id'] for item in items])
+            self.assertEqual(
+                [e.object_id for e in self.events],
+                [item['message']['model']['id'] for item in items])
+            self.assertEqual(
+                [m['time'] for m in messages],
+                [item['time'] for item in items])
+
+    def test_evicted_payload(self):
+        """
+            Evicted payloads are rebuilt and events which have been deleted
+            are left out
+        """
+        token = self.subscribe()
+        self.publish()
+
+        self.manager.client.delete_multi(
+            [str(e.pk) for e in self.events[:2]],
+            namespace=EVENT_PAYLOAD_NAMESPACE)
+        self.events[0].delete()
+
+        items = json.loads(
+            encode_pulled_messages(self.manager.pop_messages(token)))
+
+        self.assertEqual(
+            [e.pk for e in self.events[1:]],
+            [item['message']['event']['id'] for item in items])
+
+    def test_other_messages(self):
+        """
+            Messages which are not event references are encoded as they are
+        """
+        token = self.subscribe()
+        self.manager.publish_message({"foo": 42})
+
+        items = json.loads(
+            encode_pulled_messages(self.manager.pop_messages(token)))
+
+        self.assertEqual([{"foo": 42}], [item['message'] for item in items])
@@ -0,0 +1,156 @@
+"""
+    Tests for :mod:`greenday_channel.onlinecollaborators <greenday_channel.onlinecollaborators>`
+"""
+import datetime
+import mock
+from milkman.dairy import milkman
+
+from django.contrib.auth import get_user_model
+
+from greenday_core.constants import EventKind
+from greenday_core.tests.base import AppengineTestBed
+
+from ..onlinecollaborators import (
+    OnlineCollaboratorsManager,
+    sweep_offline_collaborators
+)
+
+
+class KeepAliveTestCase(AppengineTestBed):
+    """
+        Tests for :func:`greenday_channel.onlinecollaborators.OnlineCollaboratorsManager.keep_alive <greenday_channel.onlinecollaborators.OnlineCollaboratorsManager.keep_alive>`
+    """
+    @mock.patch.object(OnlineCollaboratorsManager, "refresh_collaborator")
+    def test_throttled(self, mock_refresh):
+        """
+            Collaborators are refreshed once per interval
+        """
+        manager = OnlineCollaboratorsManager(1)
+
+        manager.keep_alive("token-1")
+        manager.keep_alive("token-1")
+        manager.keep_alive("token-2")
+
+        self.assertEqual(
+            [mock.call("token-1"), mock.call("token-2")],
+            mock_refresh.call_args_list)
+
+
+class OnlineCollaboratorsManagerTestCase(AppengineTestBed):
+    """
+        Tests for :class:`greenday_channel.onlinecollaborators.OnlineCollaboratorsManager <greenday_channel.onlinecollaborators.OnlineCollaboratorsManager>`
+    """
+    def setUp(self):
+        """
+            Bootstrap test data
+        """
+        super(OnlineCollaboratorsManagerTestCase, self).setUp()
+        self.manager = OnlineCollaboratorsManager(1)
+        self.user = milkman.deliver(get_user_model())
+        self.user2 = milkman.deliver(get_user_model())
+
+        patcher = mock.patch(
+            "greenday_channel.onlinecollaborators.publish_appevent")
+        self.mock_publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expire(self, token):
+        """
+            Backdates a token's heartbeat past the expiry
+        """
+        key = self.manager.get_heartbeat_key(token)
+        heartbeat = self.manager.client.get(
+            key, namespace=self.manager.namespace)
+        heartbeat['collaborator']['timestamp'] -= datetime.timedelta(
+            seconds=100)
+        self.manager.client.set(
+            key, heartbeat, namespace=self.manager.namespace)
+
+    def get_offline_user_ids(self):
+        """
+            Gets the users announced offline
+        """
+        return [
+            c[1]['object_id'] for c in self.mock_publish.call_args_list
+            if c[0][0] == EventKind.PROJECTCOLLABORATOROFFLINE
+        ]
+
+    def test_add_and_get(self):
+        """
+            Users are online once per user, by their latest token
+        """
+        self.manager.add_collaborator(self.user, "token-1")
+        self.manager.add_collaborator(self.user, "token-2")
+        self.manager.add_collaborator(self.user2, "token-3")
+
+        collaborators = OnlineCollaboratorsManager(1).get_collaborators()
+
+        self.assertEqual(["token-2", "token-3"], sorted(collaborators))
+        self.assertEqual(self.user.pk, collaborators["token-2"]["id"])
+        self.assertEqual(3, self.mock_publish.call_count)
+
+    def test_refresh_does_not_cas(self):
+        """
+            Refreshing a collaborator only writes its own heartbeat
+        """
+        self.manager.add_collaborator(self.user, "token-1")
+
+        with mock.patch.object(self.manager.client, "cas") as mock_cas:
+            self.manager.refresh_collaborator("token-1")
+
+        self.assertFalse(mock_cas.called)
+
+    def test_expired_on_read(self):
+        """
+            Expired collaborators are left out without writing or
+            announcing anything
+        """
+        self.manager.add_collaborator(self.user, "token-1")
+        self.manager.add_collaborator(self.user2, "token-2")
+        self.expire("token-1")
+        self.mock_publish.reset_mock()
+
+        with mock.patch.object(self.manager.client, "set") as mock_set, \
+                mock.patch.object(self.manager.client, "cas") as mock_cas:
+            self.assertEqual(
+                ["token-2"], self.manager.get_collaborators().keys())
+
+        self.assertFalse(mock_set.called)
+        self.assertFalse(mock_cas.called)
+        self.assertFalse(self.mock_publish.called)
+
+        # an expired collaborator cannot be refreshed back online
+        self.manager.refresh_collaborator("token-1")
+        self.assertEqual(
+            ["token-2"], self.manager.get_collaborators().keys())
+
+    def test_sweep(self):
+        """
+            The sweeper announces each user whose tokens have all expired
+            once
+        """
+        self.manager.add_collaborator(self.user, "token-1")
+        self.manager.add_collaborator(self.user2, "token-2")
+        self.manager.add_collaborator(self.user2, "token-3")
+        self.expire("token-1")
+        self.expire("token-2")
+
+        sweep_offline_collaborators()
+        sweep_offline_collaborators()
+
+        self.assertEqual([self.user.pk], self.get_offline_user_ids())
+        self.assertIsNone(self.manager.client.get(
+            self.manager.get_heartbeat_key("token-1"),
+            namespace=self.manager.namespace))
+
+    def test_remove(self):
+        """
+            Removed collaborators are announced and no longer online
+        """
+        self.manager.add_collaborator(self.user, "token-1")
+
+        self.manager.remove_collaborator("token-1")
+        self.manager.remove_collaborator("token-1")
+
+        self.assertEqual({}, self.manager.get_collaborators())
+        self.assertEqual([self.user.pk], self.get_offline_user_ids())
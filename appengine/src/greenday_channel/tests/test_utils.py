@@ -7,18 +7,50 @@ from milkman.dairy import milkman
 import StringIO
 
 from django.conf import settings
+from django.core.cache import caches
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth import get_user_model
-from greenday_core.models import Project
+from django.test.utils import override_settings
+from greenday_core.memoize_cache import MemoiseCacheManager
+from greenday_core.models import Project, ProjectUser
 from greenday_core.tests.base import AppengineTestBed
 
-from ..utils import retry_until_truthy, clean_channels
+from ..utils import (
+    retry_with_backoff,
+    retry_failed_keys,
+    retry_stats,
+    clean_channels
+)
 
 
-class RetryUntilTruthyTestCase(AppengineTestBed):
+class RetryWithBackoffTestCase(AppengineTestBed):
     """
-        Tests for :func:`greenday_channel.utils.retry_until_truthy <greenday_channel.utils.retry_until_truthy>`
+        Tests for :func:`greenday_channel.utils.retry_with_backoff <greenday_channel.utils.retry_with_backoff>`
     """
+    def setUp(self):
+        """
+            Patches the clock and resets the retry stats
+        """
+        super(RetryWithBackoffTestCase, self).setUp()
+        retry_stats.reset()
+
+        self.clock = {"now": 1000.0}
+
+        def sleep(seconds):
+            self.clock["now"] += seconds
+
+        for target, kwargs in (
+                ("greenday_channel.utils.time.time",
+                    {"side_effect": lambda: self.clock["now"]}),
+                ("greenday_channel.utils.time.sleep",
+                    {"side_effect": sleep}),
+                # always wait for the longest time allowed
+                ("greenday_channel.utils.random.uniform",
+                    {"side_effect": lambda low, high: high})):
+            patcher = mock.patch(target, **kwargs)
+            setattr(self, "mock_" + target.split(".")[-1], patcher.start())
+            self.addCleanup(patcher.stop)
+
     def test_ok(self):
         """
             Test the method
@@ -37,15 +69,99 @@ class RetryUntilTruthyTestCase(AppengineTestBed):
 
             return state['count'] == 5
 
-        retry_until_truthy(
+        self.assertTrue(retry_with_backoff(
             method,
-            max_retries=10,
-            sleep=None,
+            max_attempts=10,
             args=test_args,
-            kwargs=test_kwargs)
+            kwargs=test_kwargs))
 
         self.assertEqual(state['count'], 5)
 
+    def test_backoff(self):
+        """
+            Waits double up to the maximum
+        """
+        retry_with_backoff(
+            lambda: False, max_attempts=6, base_sleep=0.01, max_sleep=0.05,
+            budget=10)
+
+        self.assertEqual(
+            [0.01, 0.02, 0.04, 0.05, 0.05],
+            [c[0][0] for c in self.mock_sleep.call_args_list])
+
+    def test_budget(self):
+        """
+            Gives up rather than waiting past the time budget
+        """
+        fn = mock.Mock(return_value=None, __name__="fn")
+
+        self.assertIsNone(retry_with_backoff(
+            fn, max_attempts=100, base_sleep=0.05, max_sleep=1, budget=0.1))
+
+        self.assertEqual(2, fn.call_count)
+        self.assertLessEqual(self.clock["now"], 1000.1)
+
+    def test_stats(self):
+        """
+            Attempts, give-ups and time spent are recorded by call site
+        """
+        results = iter([False, True, False, False])
+
+        for _ in range(2):
+            retry_with_backoff(
+                lambda: next(results), site="site", max_attempts=2,
+                base_sleep=0.5)
+
+        self.assertEqual({
+            "site": {
+                "calls": 2,
+                "attempts": 4,
+                "failures": 1,
+                "seconds": 1.0
+            }
+        }, retry_stats.get())
+
+
+class RetryFailedKeysTestCase(AppengineTestBed):
+    """
+        Tests for :func:`greenday_channel.utils.retry_failed_keys <greenday_channel.utils.retry_failed_keys>`
+    """
+    @mock.patch("greenday_channel.utils.time.sleep")
+    def test_only_failed_keys_retried(self, mock_sleep):
+        """
+            Each retry is passed only the keys which have not succeeded
+        """
+        calls = []
+
+        def method(mapping):
+            calls.append(sorted(mapping))
+            # succeed one key per call
+            key = sorted(mapping)[0]
+            return {key: mapping[key] * 10}
+
+        results = retry_failed_keys(
+            method, {"a": 1, "b": 2, "c": 3}, max_retries=5, sleep=0.1)
+
+        self.assertEqual({"a": 10, "b": 20, "c": 30}, results)
+        self.assertEqual(
+            [["a", "b", "c"], ["b", "c"], ["c"]], calls)
+
+        # jittered backoff doubles its bound each retry
+        self.assertEqual(2, mock_sleep.call_count)
+        self.assertLessEqual(mock_sleep.call_args_list[0][0][0], 0.1)
+        self.assertLessEqual(mock_sleep.call_args_list[1][0][0], 0.2)
+
+    @mock.patch("greenday_channel.utils.time.sleep")
+    def test_gives_up(self, mock_sleep):
+        """
+            Keys which never succeed are left out of the results
+        """
+        results = retry_failed_keys(
+            lambda mapping: {}, {"a": 1}, max_retries=2)
+
+        self.assertEqual({}, results)
+        self.assertEqual(2, mock_sleep.call_count)
+
 
 class CleanChannelsTestCase(AppengineTestBed):
     """
@@ -119,3 +235,101 @@ class CleanChannelsTestCase(AppengineTestBed):
         cleaned_channels = clean_channels(self.user, channels)
 
         self.assertEqual(channels, cleaned_channels)
+
+    def test_queries(self):
+        """
+            Channels are checked with one query per kind of object and one
+            for the user's memberships
+        """
+        self.project.add_assigned(self.user, pending=False)
+        other_project = milkman.deliver(Project)
+        other_project.add_assigned(self.user, pending=False)
+
+        channels = ["projectid-{0}".format(self.project.pk), "generic"] + [
+            "videoid-{0}".format(self.create_video(project=p).pk)
+            for p in (self.project, other_project, other_project)
+        ]
+
+        with self.assertNumQueries(3):
+            cleaned_channels = clean_channels(self.user, channels)
+
+        self.assertEqual(channels, cleaned_channels)
+
+    def test_pending(self):
+        """
+            Users whose membership is pending cannot use the channel
+        """
+        self.project.add_assigned(self.user, pending=True)
+
+        self.assertRaises(
+            PermissionDenied,
+            clean_channels,
+            self.user,
+            ["projectid-{0}".format(self.project.pk)])
+
+    def test_malformed(self):
+        """
+            Project and video channels without a numeric ID are dropped
+        """
+        self.assertEqual(
+            ["generic"],
+            clean_channels(
+                self.user, ["projectid-abc", "videoid-", "generic"]))
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'channel-access-tests',
+    }
+})
+class CleanChannelsCacheTestCase(AppengineTestBed):
+    """
+        Tests caching of :func:`greenday_channel.utils.get_channel_access <greenday_channel.utils.get_channel_access>`
+    """
+    def setUp(self):
+        """
+            Bootstrap test data and a cache manager backed by a real cache
+        """
+        super(CleanChannelsCacheTestCase, self).setUp()
+        caches['default'].clear()
+
+        patcher = mock.patch(
+            "greenday_core.memoize_cache.cache_manager",
+            MemoiseCacheManager(local_cache_size=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = milkman.deliver(get_user_model())
+        self.project = milkman.deliver(Project)
+        self.channels = [
+            "projectid-{0}".format(self.project.pk),
+            "videoid-{0}".format(self.create_video(project=self.project).pk)
+        ]
+
+    def test_cached(self):
+        """
+            Re-subscribing to the same channels runs no queries
+        """
+        self.project.add_assigned(self.user, pending=False)
+        clean_channels(self.user, self.channels)
+
+        # in any order
+        channels = list(reversed(self.channels))
+        with self.assertNumQueries(0):
+            self.assertEqual(channels, clean_channels(self.user, channels))
+
+    def test_membership_changes(self):
+        """
+            Changes to the user's memberships invalidate the cache
+        """
+        self.assertRaises(
+            PermissionDenied, clean_channels, self.user, self.channels)
+
+        self.project.add_assigned(self.user, pending=False)
+        self.assertEqual(
+            self.channels, clean_channels(self.user, self.channels))
+
+        ProjectUser.objects.filter(user=self.user).delete()
+        self.assertRaises(
+            PermissionDenied, clean_channels, self.user, self.channels)
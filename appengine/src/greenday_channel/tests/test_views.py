@@ -6,8 +6,6 @@ import json
 import signal
 from milkman.dairy import milkman
 
-from google.appengine.api import memcache
-
 from django.contrib.auth import get_user_model
 from django.core.urlresolvers import reverse
 from django.utils import timezone
@@ -32,6 +30,7 @@ from ..endpoints_api.containers import (
     ChannelRequestContainer
 )
 from ..channel import GreendayChannelManager
+from ..events import encode_pulled_messages
 
 
 def subscribe(channel):
@@ -44,6 +43,15 @@ def subscribe(channel):
     return token
 
 
+def pull(channel, token):
+    """
+        Helper method to pop the messages published to a given channel
+        since the last pull
+    """
+    manager = GreendayChannelManager(channels=[channel], pull_timeout=0)
+    return json.loads(encode_pulled_messages(manager.pop_messages(token)))
+
+
 def publish(channel, data):
     """
         Helper method to publish data to a given channel
@@ -106,7 +114,7 @@ class PublishEventHandlerViewTestCase(AppengineTestBed):
 
         self.client.post(url)
 
-        messages = memcache.get(token, namespace="channel-buckets")
+        messages = pull(channel, token)
         self.assertEqual(1, len(messages))
 
         message = messages[0]['message']
@@ -151,7 +159,7 @@ class PublishEventHandlerViewTestCase(AppengineTestBed):
 
         self.client.post(url)
 
-        messages = memcache.get(token, namespace="channel-buckets")
+        messages = pull(channel, token)
         self.assertEqual(1, len(messages))
 
         message = messages[0]['message']
@@ -205,7 +213,7 @@ class PublishEventHandlerViewTestCase(AppengineTestBed):
 
         self.client.post(url)
 
-        messages = memcache.get(token, namespace="channel-buckets")
+        messages = pull(channel, token)
         self.assertEqual(1, len(messages))
 
         message = messages[0]['message']
@@ -213,6 +221,76 @@ class PublishEventHandlerViewTestCase(AppengineTestBed):
         self.assertFalse(message['model'])
 
 
+class PublishEventsHandlerViewTestCase(AppengineTestBed):
+    """
+        Tests for :func:`greenday_channel.views.publish_events_task_handler <greenday_channel.views.publish_events_task_handler>`
+    """
+    def setUp(self):
+        """
+            Bootstrap test data
+        """
+        super(PublishEventsHandlerViewTestCase, self).setUp()
+
+        self.project = milkman.deliver(Project)
+        self.user = milkman.deliver(get_user_model())
+
+    def create_comment_event(self, **kwargs):
+        """
+            Creates a project comment and an event for it
+        """
+        comment = ProjectComment.add_root(project=self.project, user=self.user)
+
+        return Event.objects.create(
+            kind=EventKind.PROJECTROOTCOMMENTCREATED,
+            object_id=comment.pk,
+            project_id=self.project.pk,
+            user=self.user,
+            timestamp=timezone.now(),
+            **kwargs
+        )
+
+    def test_batch(self):
+        """
+            Publish a batch of events to several channels
+        """
+        video = self.create_video(project=self.project)
+        project_events = [self.create_comment_event() for _ in range(3)]
+        video_event = self.create_comment_event(video_id=video.pk)
+
+        project_token = subscribe('projectid-{0}'.format(self.project.pk))
+        video_token = subscribe('videoid-{0}'.format(video.pk))
+
+        event_ids = [e.pk for e in project_events + [video_event]]
+        url = reverse("channel:publish_events_task")
+
+        response = self.client.post(url, {
+            "event_ids": ",".join(map(str, event_ids + [99999]))
+        })
+        self.assertEqual(200, response.status_code)
+
+        messages = pull('projectid-{0}'.format(self.project.pk), project_token)
+        self.assertEqual(
+            [e.pk for e in project_events],
+            [m['message']['event']['id'] for m in messages])
+        self.assertEqual(
+            [e.object_id for e in project_events],
+            [m['message']['model']['id'] for m in messages])
+
+        messages = pull('videoid-{0}'.format(video.pk), video_token)
+        self.assertEqual(
+            [video_event.pk],
+            [m['message']['event']['id'] for m in messages])
+
+    def test_invalid_ids(self):
+        """
+            Event IDs must be integers
+        """
+        response = self.client.post(
+            reverse("channel:publish_events_task"), {"event_ids": "1,foo"})
+
+        self.assertEqual(400, response.status_code)
+
+
 class PullViewTestCase(ApiTestCase):
     """
         Tests for :func:`greenday_channel.endpoints_api.api.ChannelsAPI.pull <Tests for :func:`greenday_channel.endpoints_api.api.ChannelsAPI.pull>`
@@ -253,6 +331,36 @@ class PullViewTestCase(ApiTestCase):
         finally:
             signal.alarm(0)
 
+    def test_forged_token(self):
+        """
+            Pulling with a token which was never subscribed is forbidden
+        """
+        self._sign_in(self.user)
+
+        channel = 'projectid-{0}'.format(milkman.deliver(Project).pk)
+        publish(channel, {"foo": 42})
+
+        request = TokenRequestContainer.combined_message_class(
+            token=GreendayChannelManager.create_client_token(),
+            channels=channel)
+
+        self.assertRaises(ForbiddenException, self.api.pull, request)
+
+    def test_unsubscribed_channel(self):
+        """
+            A token can't pull channels it didn't subscribe to
+        """
+        self._sign_in(self.user)
+
+        token = subscribe('dummy-channel')
+        channel = 'projectid-{0}'.format(milkman.deliver(Project).pk)
+        publish(channel, {"foo": 42})
+
+        request = TokenRequestContainer.combined_message_class(
+            token=token, channels=channel)
+
+        self.assertRaises(ForbiddenException, self.api.pull, request)
+
 
 class SubscribeViewTestCase(ApiTestCase):
     """
@@ -275,8 +383,8 @@ class SubscribeViewTestCase(ApiTestCase):
             channels=channel)
         response = self.api.subscribe(request)
 
-        channel_clients = memcache.get(channel, namespace="channel-clients")
-        self.assertIn(response.token, channel_clients)
+        manager = GreendayChannelManager(channels=[channel])
+        self.assertEqual({channel: 0}, manager.get_cursor(response.token))
 
         self.assertEqual([channel], response.channels)
 
@@ -349,5 +457,5 @@ class UnsubscribeViewTestCase(ApiTestCase):
         self.assertFalse(response.token)
         self.assertEqual([channel], response.channels)
 
-        channel_clients = memcache.get(channel, namespace="channel-clients")
-        self.assertNotIn(token, channel_clients)
+        manager = GreendayChannelManager(channels=[channel])
+        self.assertIsNone(manager.get_cursor(token))
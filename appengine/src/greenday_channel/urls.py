@@ -4,7 +4,8 @@
 from django.conf.urls import url, patterns
 
 from .views import (
-    publish_event_task_handler
+    publish_event_task_handler,
+    publish_events_task_handler
 )
 
 urlpatterns = patterns(
@@ -13,4 +14,8 @@ urlpatterns = patterns(
         r'^publish_event_task_handler/(?P<event_id>\d+)/$',
         publish_event_task_handler,
         name='publish_event_task'),
+    url(
+        r'^publish_events_task_handler/$',
+        publish_events_task_handler,
+        name='publish_events_task'),
 )
@@ -2,79 +2,248 @@
     Provides various utility methods for the channels package
 """
 import logging
+import random
+import threading
 import time
 
 from google.appengine.runtime.apiproxy_errors import DeadlineExceededError
 
 from django.core.exceptions import PermissionDenied
 
-from greenday_core.models import Video, Project
+from greenday_core.memoize_cache import memoised
+from greenday_core.models import Video, Project, ProjectUser
 
 
-def retry_until_truthy(fn, max_retries=100, sleep=0.1, args=(), kwargs=None):
+PROJECT_CHANNEL_PREFIX = 'projectid-'
+VIDEO_CHANNEL_PREFIX = 'videoid-'
+
+# seconds that a user's access to channels is cached for
+CHANNEL_ACCESS_TIMEOUT = 60
+
+
+class RetryStats(object):
+    """
+        Counts the calls, attempts, give-ups and seconds spent by each call
+        site of :func:`retry_with_backoff` within this instance
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._stats = {}
+
+    @staticmethod
+    def empty():
+        """
+            Gets the stats of a call site which has not been called yet
+        """
+        return {'calls': 0, 'attempts': 0, 'failures': 0, 'seconds': 0.0}
+
+    def record(self, site, attempts, seconds, succeeded):
+        """
+            Records a call made at `site`
+        """
+        with self.lock:
+            stats = self._stats.setdefault(site, self.empty())
+            stats['calls'] += 1
+            stats['attempts'] += attempts
+            stats['seconds'] += seconds
+            if not succeeded:
+                stats['failures'] += 1
+
+    def get(self):
+        """
+            Gets {call site: stats}
+        """
+        with self.lock:
+            return {site: dict(stats) for site, stats in self._stats.items()}
+
+    def reset(self):
+        """
+            Clears the stats of every call site
+        """
+        with self.lock:
+            self._stats = {}
+
+
+retry_stats = RetryStats()
+
+
+def get_backoff(attempt, base_sleep, max_sleep):
     """
-        Retries the given method until it returns a truthy value or max_retries is hit
+        Gets a random time to wait after the given failed attempt, of up to
+        base_sleep doubled for each earlier attempt and at most max_sleep
+    """
+    return random.uniform(0, min(max_sleep, base_sleep * 2 ** (attempt - 1)))
+
+
+def retry_with_backoff(
+        fn, site=None, max_attempts=10, base_sleep=0.01, max_sleep=0.5,
+        budget=1.0, args=(), kwargs=None):
+    """
+        Calls fn until it returns a truthy value
+
+        Waits a jittered, exponentially growing time between attempts so
+        that contending callers spread out rather than retrying in lockstep.
+        Gives up after max_attempts or before a wait would take it past
+        `budget` seconds.
+
+        The attempts and time taken are recorded in `retry_stats` under
+        `site`, which defaults to the name of fn
+
+        Returns the last value returned by fn
     """
     kwargs = kwargs or {}
+    site = site or getattr(fn, '__name__', repr(fn))
+
+    start = time.time()
+    deadline = start + budget
+    ret = None
 
-    retries = 0
-    while retries < max_retries:
-        retries += 1
+    attempt = 0
+    while attempt < max_attempts:
+        attempt += 1
 
         try:
             ret = fn(*args, **kwargs)
         except DeadlineExceededError:
-            logging.warning("Got DeadlineExceededError whilst executing %s", fn)
+            logging.warning(
+                "Got DeadlineExceededError whilst executing %s", site)
             ret = None
 
         if ret:
-            return ret
+            break
 
-        if sleep:
-            time.sleep(sleep)
+        sleep = get_backoff(attempt, base_sleep, max_sleep)
+        if attempt == max_attempts or time.time() + sleep > deadline:
+            break
 
+        time.sleep(sleep)
 
-def clean_channels(user, channels):
+    seconds = time.time() - start
+    retry_stats.record(site, attempt, seconds, bool(ret))
+
+    if not ret:
+        logging.warning(
+            "Gave up on %s after %s attempts in %.3fs", site, attempt, seconds)
+
+    return ret
+
+
+def retry_failed_keys(
+        fn, mapping, site=None, max_retries=3, sleep=0.05, budget=1.0):
     """
-        Raises a PermissionDenied error if the user cannot access any channel
+        Calls fn with a dict of memcache keys to values and retries it with
+        only the keys which failed
 
-        Returns a list of valid channels
+        fn returns a dict of the results of the keys which succeeded.
+        Retries as :func:`retry_with_backoff` does, starting with waits of up
+        to `sleep` seconds.
+
+        Returns the results of all keys which succeeded
     """
-    valid_channels = []
-    can_access_projects = []
+    results = {}
+    remaining = dict(mapping)
 
-    def _check_project(project):
-        if project.id in can_access_projects:
-            return True
+    def _attempt():
+        results.update(fn(remaining))
+        for key in results:
+            remaining.pop(key, None)
+        return not remaining
 
-        if user.is_superuser or project.is_assigned(user):
-            can_access_projects.append(project.id)
-            return True
+    retry_with_backoff(
+        _attempt,
+        site=site or getattr(fn, '__name__', repr(fn)),
+        max_attempts=max_retries + 1,
+        base_sleep=sleep,
+        max_sleep=sleep * 2 ** max_retries,
+        budget=budget)
 
-        raise PermissionDenied
+    return results
 
-    for channel in channels:
-        if channel.startswith('projectid'):
-            project_id = channel.lstrip('projectid-')
-            try:
-                project = Project.objects.get(pk=project_id)
-            except Project.DoesNotExist:
-                continue
 
-            _check_project(project)
+def get_channel_object_id(channel, prefix):
+    """
+        Gets the object ID of a channel starting with prefix, or None
+    """
+    if channel.startswith(prefix):
+        object_id = channel[len(prefix):]
+        if object_id.isdigit():
+            return int(object_id)
+
+
+@memoised(
+    depends_on=[ProjectUser],
+    scope=lambda user_id, is_superuser, channels: user_id,
+    scope_field='user',
+    timeout=CHANNEL_ACCESS_TIMEOUT)
+def get_channel_access(user_id, is_superuser, channels):
+    """
+        Gets whether the user can access each project and video channel
+        whose object exists
 
-        elif channel.startswith('videoid'):
-            video_id = channel.lstrip('videoid-')
-            try:
-                video = Video.objects.get(pk=video_id)
-            except Video.DoesNotExist:
-                continue
+        Runs one query each for the projects, the videos and the user's
+        memberships of their projects however many channels there are.
+        Cached briefly for the re-subscribes of reconnecting clients.
 
-            _check_project(video.project)
+        Returns {channel: True/False}
+    """
+    project_ids, video_ids = {}, {}
+    for channel in channels:
+        project_id = get_channel_object_id(channel, PROJECT_CHANNEL_PREFIX)
+        video_id = get_channel_object_id(channel, VIDEO_CHANNEL_PREFIX)
+        if project_id is not None:
+            project_ids[channel] = project_id
+        elif video_id is not None:
+            video_ids[channel] = video_id
+
+    # {channel: project ID}
+    channel_projects = {}
+
+    if project_ids:
+        existing_ids = set(
+            Project.objects
+            .filter(pk__in=set(project_ids.values()))
+            .values_list('pk', flat=True))
+        channel_projects.update(
+            (c, pk) for c, pk in project_ids.items() if pk in existing_ids)
+
+    if video_ids:
+        video_projects = dict(
+            Video.objects
+            .filter(pk__in=set(video_ids.values()))
+            .values_list('pk', 'project_id'))
+        channel_projects.update(
+            (c, video_projects[pk]) for c, pk in video_ids.items()
+            if pk in video_projects)
+
+    if is_superuser or not channel_projects:
+        assigned_ids = set(channel_projects.values())
+    else:
+        assigned_ids = set(
+            ProjectUser.objects
+            .filter(
+                user_id=user_id,
+                project_id__in=set(channel_projects.values()),
+                is_pending=False,
+                is_assigned=True)
+            .values_list('project_id', flat=True))
+
+    return {c: pk in assigned_ids for c, pk in channel_projects.items()}
 
-        valid_channels.append(channel)
 
-    return valid_channels
+def clean_channels(user, channels):
+    """
+        Raises a PermissionDenied error if the user cannot access any channel
 
+        Returns a list of valid channels
+    """
+    access = get_channel_access(
+        user.pk, user.is_superuser, frozenset(channels))
 
+    if not all(access.values()):
+        raise PermissionDenied
 
+    return [
+        c for c in channels
+        if c in access or not c.startswith(
+            (PROJECT_CHANNEL_PREFIX, VIDEO_CHANNEL_PREFIX))
+    ]
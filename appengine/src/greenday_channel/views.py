@@ -1,16 +1,19 @@
 """
     Defines request handlers for the channels package
 """
+from collections import OrderedDict
+
 from django.http import (
     HttpResponse,
+    HttpResponseBadRequest,
     Http404
 )
 from django.views.decorators.csrf import csrf_exempt
 
-from greenday_core.eventbus import get_event
-from greenday_api.event.utils import get_model_message
+from greenday_core.eventbus import get_event, get_events_by_id
 
 from .channel import GreendayChannelManager
+from .events import cache_event_payloads, get_event_reference
 
 
 def _get_project_channel(channels):
@@ -30,24 +33,58 @@ def publish_event_task_handler(request, event_id=None):
     if not event:
         raise Http404
 
-    if model:
-        model_dict = get_model_message(event, model)
-    else:
-        model_dict = None
+    cache_event_payloads([(event, model)])
+
+    manager = GreendayChannelManager(channels=[_get_event_channel(event)])
+
+    manager.publish_message(get_event_reference(event.pk))
+
+    return HttpResponse()
+
+
+@csrf_exempt
+def publish_events_task_handler(request):
+    """
+        Task handler to push a batch of events out to all necessary
+        channels
+
+        Takes a comma separated list of `event_ids`. The events' payloads
+        are cached and references to them are published to all of the
+        channels in a single batch.
+    """
+    try:
+        event_ids = [
+            int(event_id)
+            for event_id in request.POST.get("event_ids", "").split(",")
+            if event_id]
+    except ValueError:
+        return HttpResponseBadRequest()
 
+    events = get_events_by_id(event_ids)
+    cache_event_payloads(events)
+
+    messages_by_channel = OrderedDict()
+    for event, _ in events:
+        messages_by_channel.setdefault(
+            _get_event_channel(event), []).append(
+                get_event_reference(event.pk))
+
+    if messages_by_channel:
+        manager = GreendayChannelManager(channels=messages_by_channel.keys())
+        manager.publish_channel_messages(messages_by_channel)
+
+    return HttpResponse()
+
+
+def _get_event_channel(event):
+    """
+        Gets the channel which an event is published to
+    """
     if event.video_id:
-        channel = "videoid-{0}".format(event.video_id)
+        return "videoid-{0}".format(event.video_id)
     elif event.project_id:
         # only publish project messages if there isn't a video ID
-        channel = "projectid-{0}".format(event.project_id)
+        return "projectid-{0}".format(event.project_id)
     else:
-        channel = "generic"
-
-    manager = GreendayChannelManager(channels=[channel])
+        return "generic"
 
-    manager.publish_message({
-        "event": event.to_dict(),
-        "model": model_dict
-    })
-
-    return HttpResponse()
@@ -0,0 +1,184 @@
+"""
+    Retention of application events
+
+    Events older than the retention horizon are rolled up into daily
+    counts, exported to gzipped JSON files in GCS and deleted, so that the
+    Event table only holds recent history
+"""
+import datetime
+import gzip
+import json
+import logging
+from collections import Counter
+from cStringIO import StringIO
+
+import cloudstorage as gcs
+import deferred_manager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Event, EventRollup
+from .task_helpers import auto_view
+
+
+# number of events archived and deleted at a time
+ARCHIVE_CHUNK_SIZE = 1000
+
+# chunks archived by a task before it queues the rest of the day
+ARCHIVE_CHUNKS_PER_TASK = 20
+
+ARCHIVE_FOLDER = "event-archive"
+
+ARCHIVE_FIELDS = (
+    "id",
+    "timestamp",
+    "kind",
+    "object_id",
+    "project_id",
+    "video_id",
+    "meta",
+    "user",
+)
+
+
+def get_retention_horizon(days=None):
+    """
+        Gets the start of the UTC day `days` ago. Events before it are
+        archived.
+
+        Defaults to settings.EVENT_RETENTION_DAYS
+    """
+    if days is None:
+        days = settings.EVENT_RETENTION_DAYS
+
+    today = timezone.now().astimezone(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0)
+
+    return today - datetime.timedelta(days=int(days))
+
+
+@auto_view
+def archive_old_events(days=None):
+    """
+        Queues a task to archive each day of events before the retention
+        horizon
+    """
+    horizon = get_retention_horizon(days)
+
+    oldest = list(
+        Event.objects
+        .filter(timestamp__lt=horizon)
+        .order_by("timestamp")
+        .values_list("timestamp", flat=True)[:1]
+    )
+
+    if not oldest:
+        logging.info("No events before %s to archive", horizon)
+        return
+
+    day = oldest[0].astimezone(timezone.utc).date()
+    day_count = 0
+    while day < horizon.date():
+        deferred_manager.defer(
+            archive_event_day, day.isoformat(), _queue="event-archiving")
+        day += datetime.timedelta(days=1)
+        day_count += 1
+
+    logging.info("Queued archiving of %s days of events", day_count)
+
+
+def archive_event_day(day):
+    """
+        Rolls up, archives and deletes the events of a UTC day, a chunk at
+        a time
+
+        Each chunk is written to its own file named by its first and last
+        event IDs, so a retried chunk overwrites its earlier file
+    """
+    if isinstance(day, basestring):
+        day = datetime.datetime.strptime(day, "%Y-%m-%d").date()
+
+    start = datetime.datetime.combine(
+        day, datetime.time()).replace(tzinfo=timezone.utc)
+
+    qry = (
+        Event.objects
+        .filter(
+            timestamp__gte=start,
+            timestamp__lt=start + datetime.timedelta(days=1))
+        .order_by("pk")
+        .values(*ARCHIVE_FIELDS)
+    )
+
+    archived = 0
+    for _ in xrange(ARCHIVE_CHUNKS_PER_TASK):
+        rows = list(qry[:ARCHIVE_CHUNK_SIZE])
+        if not rows:
+            break
+
+        write_archive_file(day, rows)
+        rollup_and_delete_events(day, rows)
+        archived += len(rows)
+    else:
+        deferred_manager.defer(
+            archive_event_day, day.isoformat(), _queue="event-archiving")
+
+    logging.info("Archived %s events from %s", archived, day)
+
+
+def get_archive_filename(day, rows):
+    """
+        Gets the GCS filename of an archived chunk of events
+    """
+    return "/{bucket}/{folder}/{day}/{first}-{last}.json.gz".format(
+        bucket=settings.GCS_BUCKET,
+        folder=ARCHIVE_FOLDER,
+        day=day.isoformat(),
+        first=rows[0]["id"],
+        last=rows[-1]["id"])
+
+
+def write_archive_file(day, rows):
+    """
+        Writes the event rows to GCS as gzipped JSON, one event per line
+    """
+    buf = StringIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+        for row in rows:
+            row = dict(row, timestamp=row["timestamp"].isoformat())
+            row["user_id"] = row.pop("user")
+            f.write(json.dumps(row))
+            f.write("\n")
+
+    with gcs.open(
+            get_archive_filename(day, rows), "w",
+            content_type="application/json",
+            options={"content-encoding": "gzip"}) as f:
+        f.write(buf.getvalue())
+
+
+@transaction.atomic
+def rollup_and_delete_events(day, rows):
+    """
+        Adds the event rows to the day's rollups by project, kind and user
+        and deletes the events
+    """
+    counts = Counter(
+        (row["project_id"], row["kind"], row["user"]) for row in rows)
+
+    for (project_id, kind, user_id), count in counts.items():
+        rollup, created = EventRollup.objects.get_or_create(
+            date=day,
+            project_id=project_id,
+            kind=kind,
+            user_id=user_id,
+            defaults={"count": count})
+
+        if not created:
+            EventRollup.objects.filter(pk=rollup.pk).update(
+                count=F("count") + count)
+
+    Event.objects.filter(pk__in=[row["id"] for row in rows]).delete()
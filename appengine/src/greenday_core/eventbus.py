@@ -3,16 +3,21 @@
     application events
 """
 # import python deps
+import base64
+import contextlib
 import functools
 import logging
-from collections import Iterable
+import threading
+from collections import Iterable, OrderedDict, defaultdict
 
 from google.appengine.api import taskqueue
 
 # FRAMEWORK
 from django.core.urlresolvers import reverse
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_datetime
 from django.utils.functional import SimpleLazyObject
 
 # GREENDAY
@@ -31,6 +36,17 @@ from .constants import EventModel, EventCommonCodes, CODES_PER_MODEL
 from django.utils import timezone
 
 
+# max number of events published by a single task
+EVENTS_PER_PUBLISH_TASK = 50
+
+# default and max number of events returned by a page of the timeline
+EVENT_PAGE_SIZE = 100
+MAX_EVENT_PAGE_SIZE = 500
+
+# buffer of events to publish in a batch per thread
+_local = threading.local()
+
+
 def noop(*args):  # pragma: no cover
     pass
 
@@ -114,17 +130,18 @@ class EventDecorator(object):
             # check if we are working with a batch request. If we are then
             # object_id will be iterable.
             if isinstance(object_id, Iterable):
-                for obj in object_id:
-                    try:
-                        publish_appevent(
-                            self.kind,
-                            object_id=obj,
-                            project_id=project_id,
-                            video_id=video_id,
-                            meta=meta,
-                            user=user)
-                    except Exception as e:  # pragma: no cover
-                        logging.exception(e)
+                try:
+                    publish_appevents([
+                        {
+                            "kind": self.kind,
+                            "object_id": obj,
+                            "project_id": project_id,
+                            "video_id": video_id,
+                            "meta": meta,
+                            "user": user
+                        } for obj in object_id])
+                except Exception as e:  # pragma: no cover
+                    logging.exception(e)
             else:
                 try:
                     publish_appevent(
@@ -148,7 +165,12 @@ def publish_appevent(
         **kwargs):
     """
         Creates an application event object
+
+        The event is buffered if called within :func:`buffered_appevents`
     """
+    if _buffer_appevent(kind, kwargs):
+        return
+
     event = Event.objects.create(
         timestamp=timezone.now(),
         kind=kind.value,
@@ -164,6 +186,165 @@ def publish_appevent(
     )
 
 
+def publish_appevents(events):
+    """
+        Creates many application events in a single transaction and queues
+        them to be published by tasks of EVENTS_PER_PUBLISH_TASK events
+
+        events: list of dicts of the `kind` and kwargs that
+        :func:`publish_appevent` takes
+
+        The events are buffered if called within :func:`buffered_appevents`
+
+        Returns the IDs of the created events
+    """
+    events = [
+        event_kwargs for event_kwargs in events
+        if not _buffer_appevent(event_kwargs["kind"], event_kwargs)
+    ]
+    if not events:
+        return []
+
+    timestamp = timezone.now()
+    new_events = []
+    for event_kwargs in events:
+        event_kwargs = dict(event_kwargs)
+        kind = event_kwargs.pop("kind").value
+        new_events.append(Event(timestamp=timestamp, kind=kind, **event_kwargs))
+
+    # bulk_create() does not set primary keys on MySQL so the events are
+    # saved one by one, joining any transaction the caller has open
+    with transaction.atomic(savepoint=False):
+        for event in new_events:
+            event.save()
+    event_ids = [event.pk for event in new_events]
+
+    tasks = [
+        create_publish_events_task(event_ids[i:i + EVENTS_PER_PUBLISH_TASK])
+        for i in xrange(0, len(event_ids), EVENTS_PER_PUBLISH_TASK)
+    ]
+    queue = taskqueue.Queue("publish-event")
+    for i in xrange(0, len(tasks), taskqueue.MAX_TASKS_PER_ADD):
+        queue.add(tasks[i:i + taskqueue.MAX_TASKS_PER_ADD])
+
+    return event_ids
+
+
+def _get_event_signature(event):
+    """
+        Gets a tuple of the fields which identify an event
+    """
+    return (
+        event.kind,
+        event.object_id,
+        event.project_id,
+        event.video_id,
+        None if event.meta is None else unicode(event.meta),
+        event.user_id
+    )
+
+
+@contextlib.contextmanager
+def buffered_appevents():
+    """
+        Buffers application events published on this thread within the
+        block and publishes them in one batch when it exits
+
+        Duplicate events are only published once. Events are discarded if
+        the block raises.
+
+        Blocks nested within an open buffer add their events to it
+    """
+    if not open_appevent_buffer():
+        events = _local.appevents
+        size = len(events)
+        try:
+            yield
+        except Exception:
+            # drop just this block's events
+            while len(events) > size:
+                events.popitem()
+            raise
+        return
+
+    try:
+        yield
+    except Exception:
+        close_appevent_buffer(publish=False)
+        raise
+
+    close_appevent_buffer()
+
+
+def with_buffered_appevents(fn):
+    """
+        Decorates a function to run it within :func:`buffered_appevents`
+    """
+    @functools.wraps(fn)
+    def decorated(*args, **kwargs):
+        with buffered_appevents():
+            return fn(*args, **kwargs)
+    return decorated
+
+
+def open_appevent_buffer():
+    """
+        Starts buffering application events published on this thread
+
+        Returns False if a buffer is already open
+    """
+    if getattr(_local, "appevents", None) is not None:
+        return False
+
+    _local.appevents = OrderedDict()
+    return True
+
+
+def close_appevent_buffer(publish=True):
+    """
+        Stops buffering application events on this thread and publishes
+        the buffered events unless `publish` is False
+    """
+    events = getattr(_local, "appevents", None)
+    _local.appevents = None
+
+    if events and publish:
+        try:
+            publish_appevents(events.values())
+        except Exception as e:  # pragma: no cover
+            logging.exception(e)
+
+
+def _buffer_appevent(kind, kwargs):
+    """
+        Adds an event to this thread's buffer if one is open
+
+        Returns whether the event was buffered
+    """
+    events = getattr(_local, "appevents", None)
+    if events is None:
+        return False
+
+    event_kwargs = dict(kwargs, kind=kind)
+    signature = _get_event_signature(Event(
+        kind=kind.value,
+        **{k: v for k, v in event_kwargs.items() if k != "kind"}))
+    events.setdefault(signature, event_kwargs)
+    return True
+
+
+def create_publish_events_task(event_ids):
+    """
+        Creates a task to push a batch of events out to all necessary
+        channels
+    """
+    return taskqueue.Task(
+        url=reverse("channel:publish_events_task"),
+        params={"event_ids": ",".join(map(str, event_ids))},
+        countdown=1
+    )
+
+
 def get_event(event_id):
     """
         Gets an event by its ID along with the model for which it
@@ -187,18 +368,90 @@ def get_event(event_id):
     return event, model
 
 
+def get_events_by_id(event_ids):
+    """
+        Gets events by their IDs along with the models for which they
+        were recorded
+
+        Loads the events with one query and their models with one query
+        per model type. Returns a list of (event, model) tuples ordered by
+        event ID. Events which do not exist are left out.
+    """
+    events = list(Event.objects.filter(pk__in=event_ids).order_by("pk"))
+
+    object_ids_by_model = defaultdict(set)
+    for event in events:
+        model_enum = EventModel(event.kind / CODES_PER_MODEL)
+        if event.object_id and model_enum in EVENT_KIND_MODEL_TO_MODEL:
+            object_ids_by_model[model_enum].add(event.object_id)
+
+    models_by_model_enum = {
+        model_enum: EVENT_KIND_MODEL_TO_MODEL[model_enum].in_bulk(object_ids)
+        for model_enum, object_ids in object_ids_by_model.items()
+    }
+
+    return [
+        (
+            event,
+            models_by_model_enum
+            .get(EventModel(event.kind / CODES_PER_MODEL), {})
+            .get(event.object_id)
+        )
+        for event in events
+    ]
+
+
+def encode_event_cursor(event):
+    """
+        Creates an opaque cursor pointing at the position of the given
+        event in the timeline
+    """
+    return base64.urlsafe_b64encode(
+        "{0}|{1}".format(event.timestamp.isoformat(), event.pk))
+
+
+def decode_event_cursor(cursor):
+    """
+        Gets the (timestamp, pk) position pointed at by a cursor created
+        by encode_event_cursor()
+
+        Raises ValueError if the cursor is malformed
+    """
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(str(cursor)).split("|")
+        timestamp = parse_datetime(timestamp)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeEncodeError):
+        raise ValueError("Invalid event cursor: {0}".format(cursor))
+
+    if timestamp is None:
+        raise ValueError("Invalid event cursor: {0}".format(cursor))
+
+    return timestamp, pk
+
+
 def get_events(
         timestamp,
         kind=None,
         object_id=None,
         project_id=None,
         event_kind=None,
-        object_kind=None):
+        object_kind=None,
+        cursor=None):
     """
-        Gets a list of filtered application events
+        Gets a list of filtered application events, newest first
+
+        If a cursor is passed then only events after that position in the
+        timeline are returned
     """
     qry = Event.objects.filter(timestamp__gte=timestamp)
 
+    if cursor is not None:
+        cursor_timestamp, cursor_pk = decode_event_cursor(cursor)
+        qry = qry.filter(
+            Q(timestamp__lt=cursor_timestamp) |
+            Q(timestamp=cursor_timestamp, pk__lt=cursor_pk))
+
     if kind is not None:
         if hasattr(kind, '__iter__'):
             qry = qry.filter(kind__in=[k.value for k in kind])
@@ -220,17 +473,42 @@ def get_events(
     if object_id:
         qry = qry.filter(object_id=object_id)
 
-    return qry
+    return qry.order_by('-timestamp', '-pk')
 
 
 def get_events_with_objects(*args, **kwargs):
     """
-        Gets application events grouped by the event model and returns the
-        related objects
+        Gets a page of application events grouped by the event model and
+        returns the related objects along with a cursor for the next page,
+        or None if this is the last page
 
-        Takes same arguments as get_events()
+        Takes same arguments as get_events() plus page_size, which is
+        capped at MAX_EVENT_PAGE_SIZE
+
+        All events are returned if neither page_size nor cursor is passed,
+        as clients from before paging expect
+
+        Raises ValueError if page_size is less than 1
     """
-    events = get_events(*args, **kwargs)
+    page_size = kwargs.pop('page_size', None)
+    next_cursor = None
+
+    if page_size is None and kwargs.get('cursor') is None:
+        events = list(get_events(*args, **kwargs))
+    else:
+        if page_size is None:
+            page_size = EVENT_PAGE_SIZE
+        elif page_size < 1:
+            raise ValueError("Invalid page size: {0}".format(page_size))
+
+        page_size = min(page_size, MAX_EVENT_PAGE_SIZE)
+
+        # fetch one extra event to find out whether there is another page
+        events = list(get_events(*args, **kwargs)[:page_size + 1])
+
+        if len(events) > page_size:
+            events = events[:page_size]
+            next_cursor = encode_event_cursor(events[-1])
 
     model_ids = {
         EventModel[enum].value: set() for enum in EventModel.__members__}
@@ -250,7 +528,7 @@ def get_events_with_objects(*args, **kwargs):
         models[model_enum.name.lower()] = list(qs.filter(
             pk__in=object_ids))
 
-    return events, models
+    return events, models, next_cursor
 
 
 def get_event_counts(*args, **kwargs):
@@ -0,0 +1,101 @@
+"""
+    Management command to benchmark building memoise cache keys
+"""
+import hashlib
+import timeit
+from optparse import make_option
+
+from protorpc import messages
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from greenday_core.memoize_cache import MemoiseCacheManager, _get_func_repr
+from greenday_core.models import Project
+
+
+class BenchmarkFilterMessage(messages.Message):
+    """
+        Request message shaped like the video list filters
+    """
+    project_id = messages.IntegerField(1)
+    archived = messages.BooleanField(2)
+    collection_id = messages.IntegerField(3)
+    q = messages.StringField(4)
+    tag_ids = messages.StringField(5)
+    channel_ids = messages.StringField(6)
+    location = messages.StringField(7)
+    date = messages.StringField(8)
+    unwatched = messages.BooleanField(9)
+    exclude_ids = messages.StringField(10)
+    youtube_id = messages.StringField(11)
+
+
+def _legacy_create_key(fn, args, kwargs):
+    """
+        The key derivation used before serialise_key_arg() was introduced
+    """
+    def _sanitise(arg):
+        if isinstance(arg, Project):
+            return u'<{0}: {1}>'.format(arg.__class__.__name__, arg.pk)
+        if hasattr(arg, 'query'):
+            return [
+                u'<{0}: {1}>'.format(o.__class__.__name__, o.pk)
+                for o in arg]
+        return arg
+
+    args = map(_sanitise, args)
+    kwargs = {k: _sanitise(v) for k, v in kwargs.items()}
+
+    query_key = u'{fn_repr}{args}{kwargs}'.format(
+        fn_repr=_get_func_repr(fn),
+        args=unicode(args),
+        kwargs=unicode(kwargs))
+
+    return hashlib.md5(query_key).hexdigest()
+
+
+class Command(BaseCommand):
+    """
+        Times building cache keys for typical memoised API calls with the
+        legacy and current key derivation and reports the database queries
+        each one ran
+    """
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--iterations', '-n', action='store', dest='iterations',
+            default=10000, help='Number of keys to build', type="int"),
+    )
+
+    def handle(self, iterations=10000, **kwargs):
+        def _video_list(request, project):
+            pass
+
+        request = BenchmarkFilterMessage(
+            project_id=1, archived=False, q=u"protest", tag_ids=u"1,2,3")
+        project = Project(pk=1)
+        queryset = Project.objects.filter(pk__in=[1, 2, 3])
+
+        # querysets are cloned for each key as callers pass fresh ones
+        cases = (
+            ("message + model", lambda: (request, project)),
+            ("queryset", lambda: (queryset.all(),)),
+        )
+
+        for name, get_args in cases:
+            for label, create_key in (
+                    ("before", _legacy_create_key),
+                    ("after", MemoiseCacheManager.create_key)):
+                with CaptureQueriesContext(connection) as ctx:
+                    create_key(_video_list, get_args(), {})
+                    queries = len(ctx.captured_queries)
+
+                seconds = timeit.timeit(
+                    lambda: create_key(_video_list, get_args(), {}),
+                    number=iterations)
+
+                self.stdout.write(
+                    u"{0:<16} {1:<7} {2:>8.2f}us/key {3} queries/key".format(
+                        name, label, seconds / iterations * 1e6, queries))
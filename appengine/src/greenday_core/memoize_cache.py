@@ -1,18 +1,305 @@
 """
     Defines a cache manager
 """
+import cPickle
+import datetime
+import functools
 import hashlib
 import logging
+import threading
+import time
 import types
+import uuid
+import zlib
+from collections import OrderedDict
 
+from protorpc import messages
 from protorpc.protojson import decode_message, encode_message
 
 from google.appengine.api.app_identity import get_application_id
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models.sql.datastructures import EmptyResultSet
 from django.core.cache import caches
 from django.conf import settings
 
 
+STAMP_KEY = "memoise-stamp"
+GENERATION_KEY_PREFIX = "memoise-gen-"
+LEASE_KEY_PREFIX = "memoise-lease-"
+STATS_KEY = "memoise-stats"
+STATS_LOCK_KEY = "memoise-stats-lock"
+
+# formats of values held in cache entries
+FORMAT_RAW = 0
+FORMAT_ZLIB = 1
+FORMAT_CHUNKED = 2
+
+# pickled size above which values are compressed
+COMPRESS_THRESHOLD = 1024 * 32
+
+# max size of a single value, leaving headroom under memcache's 1MB limit
+CHUNK_SIZE = 1000 * 1000 - 1024 * 16
+
+
+class LocalLRUCache(object):
+    """
+        A bounded in-process LRU cache
+
+        Entries are tagged with the invalidation stamp that was current
+        when they were stored and are ignored once they have expired or
+        the stamp has moved on.
+
+        Safe to share between request threads.
+    """
+    def __init__(self, max_size, timeout):
+        """
+            Creates the cache
+
+            max_size: maximum number of entries held
+            timeout: maximum number of seconds an entry is held for
+        """
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, stamp):
+        """
+            Gets the value for `key` or None if it is missing, expired or
+            was stored under a different stamp
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return None
+
+            expires, entry_stamp, value = entry
+            if expires < time.time() or entry_stamp != stamp:
+                return None
+
+            # re-insert to mark as most recently used
+            self._data[key] = entry
+            return value
+
+    def set(self, key, value, stamp, timeout=None):
+        """
+            Stores `value` against `key`, evicting the least recently used
+            entries if the cache is full
+
+            The entry never outlives `timeout` if it is shorter than the
+            cache's own timeout
+        """
+        if timeout is None or timeout <= 0:
+            timeout = self.timeout
+        else:
+            timeout = min(timeout, self.timeout)
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.time() + timeout, stamp, value)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        """
+            Removes the given keys
+        """
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        """
+            Removes all entries
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class PreEncodedMessage(object):
+    """
+        A cached protorpc response held in its final encoded form
+
+        Returned by MemoiseCacheManager.get_or_set() when called with an
+        `encoder` so that the encoded response can be served as-is
+    """
+    def __init__(self, message_type, data, message=None):
+        """
+            message_type: the protorpc message class of the response
+            data: the encoded response. Must be JSON that protojson can
+            decode into `message_type`
+            message: the response message if it is already at hand
+        """
+        self.message_type = message_type
+        self.data = data
+        self._message = message
+
+    def to_message(self):
+        """
+            Gets the response as a protorpc message
+
+            Decodes the data if the message is not already at hand
+        """
+        if self._message is None:
+            self._message = decode_message(self.message_type, self.data)
+        return self._message
+
+
+class MemoiseStats(object):
+    """
+        Collects hit/miss counts, compute times and encoded sizes of
+        memoised calls per function
+
+        Stats are aggregated in-process and periodically merged into a
+        single memcache entry so that they can be reported across all
+        instances.
+
+        Safe to share between request threads.
+    """
+    def __init__(self, cache, version, flush_interval=60, max_samples=200):
+        """
+            Creates the stats collector
+
+            flush_interval: seconds between merges into memcache
+            max_samples: max compute times kept per function
+        """
+        self.cache = cache
+        self.version = version
+        self.flush_interval = flush_interval
+        self.max_samples = max_samples
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._flushed = time.time()
+
+    @staticmethod
+    def empty():
+        """
+            Gets an empty stats dict for a function
+        """
+        return {
+            'hits': 0,
+            'misses': 0,
+            'compute_times': [],
+            'size_total': 0,
+            'size_count': 0,
+        }
+
+    def record_hits(self, name, count=1):
+        """
+            Records cache hits for the given function
+        """
+        with self._lock:
+            stats = self._stats.setdefault(name, self.empty())
+            stats['hits'] += count
+
+        self.maybe_flush()
+
+    def record_miss(self, name, compute_time, size=None):
+        """
+            Records a cache miss for the given function along with the time
+            taken to compute the value and its encoded size
+        """
+        with self._lock:
+            stats = self._stats.setdefault(name, self.empty())
+            stats['misses'] += 1
+            stats['compute_times'].append(compute_time)
+            del stats['compute_times'][:-self.max_samples]
+
+            if size is not None:
+                stats['size_total'] += size
+                stats['size_count'] += 1
+
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        """
+            Flushes to memcache if `flush_interval` has passed
+
+            The interval restarts whether or not the flush gets the lock,
+            so that calls made whilst another instance is flushing don't
+            each go to memcache
+        """
+        now = time.time()
+        if now - self._flushed >= self.flush_interval:
+            self._flushed = now
+            self.flush()
+
+    def flush(self):
+        """
+            Merges this instance's stats into memcache
+
+            Stats are kept locally until the next flush if another instance
+            is flushing at the same time
+        """
+        if not self.cache.add(
+                STATS_LOCK_KEY, 1, version=self.version, timeout=10):
+            return False
+
+        try:
+            with self._lock:
+                local_stats, self._stats = self._stats, {}
+                self._flushed = time.time()
+
+            all_stats = self.cache.get(
+                STATS_KEY, version=self.version) or {}
+
+            for name, stats in local_stats.items():
+                merged = all_stats.setdefault(name, self.empty())
+                merged['hits'] += stats['hits']
+                merged['misses'] += stats['misses']
+                merged['size_total'] += stats['size_total']
+                merged['size_count'] += stats['size_count']
+                merged['compute_times'] = (
+                    merged['compute_times'] + stats['compute_times']
+                )[-self.max_samples:]
+
+            self.cache.set(
+                STATS_KEY, all_stats, version=self.version, timeout=None)
+        finally:
+            self.cache.delete(STATS_LOCK_KEY, version=self.version)
+
+        return True
+
+    def reset(self):
+        """
+            Removes all recorded stats
+        """
+        with self._lock:
+            self._stats = {}
+        self.cache.delete(STATS_KEY, version=self.version)
+
+    def get_report(self):
+        """
+            Gets a report of the stats across all instances, sorted by
+            function name
+        """
+        all_stats = self.cache.get(STATS_KEY, version=self.version) or {}
+
+        report = []
+        for name, stats in sorted(all_stats.items()):
+            calls = stats['hits'] + stats['misses']
+            compute_times = sorted(stats['compute_times'])
+
+            report.append({
+                'name': name,
+                'hits': stats['hits'],
+                'misses': stats['misses'],
+                'hit_ratio': float(stats['hits']) / calls if calls else None,
+                'compute_p50': _percentile(compute_times, 0.5),
+                'compute_p95': _percentile(compute_times, 0.95),
+                'mean_size': (
+                    stats['size_total'] / stats['size_count']
+                    if stats['size_count'] else None),
+            })
+
+        return report
+
+
 class MemoiseCacheManager(object):
     """
         A basic caching manager designed to encapsulate caching
@@ -20,11 +307,50 @@ class MemoiseCacheManager(object):
 
         This wraps Django's cache backend
 
+        Decoded values are optionally held in a local LRU cache in front
+        of memcache. Local entries are invalidated across all instances by
+        an invalidation stamp held in memcache which is bumped on every
+        delete. Each instance re-reads the stamp at most once every
+        `stamp_check_interval` seconds.
+
+        Values held in the local cache are shared between requests so
+        should be treated as read-only by callers.
+
+        Hits, misses, compute times and encoded sizes are recorded per
+        function in `stats`.
+
+        Cached calls can be grouped into named scopes (e.g. `project:1`)
+        by passing `scopes=[...]`. Each scope has a generation counter in
+        memcache which is folded into the cache key so that a single
+        `invalidate_scopes()` call invalidates everything cached under it
+        without touching the invalidation stamp.
+
         This object is intended to be kept alive across requests
     """
-    def __init__(self, default_timeout=None):
+    def __init__(
+            self,
+            default_timeout=None,
+            local_cache_size=None,
+            local_timeout=None,
+            stamp_check_interval=None,
+            lease_timeout=30,
+            lease_wait=2,
+            lease_poll=0.1,
+            stats_flush_interval=60):
         """
             Creates the manager
+
+            local_cache_size: max entries in the local cache. 0 disables it
+            local_timeout: max seconds a value is held in the local cache
+            stamp_check_interval: seconds between reads of the invalidation
+            stamp from memcache
+            lease_timeout: seconds after which a lease to recompute a stale
+            value is assumed to have been abandoned
+            lease_wait: max seconds to wait for another caller to compute a
+            missing value
+            lease_poll: seconds between checks whilst waiting
+            stats_flush_interval: seconds between merges of this instance's
+            stats into memcache
         """
         self.cache = caches['default']
 
@@ -40,25 +366,209 @@ class MemoiseCacheManager(object):
             else default_timeout
         )
 
+        if local_cache_size is None:
+            local_cache_size = settings.MEMOISE_LOCAL_CACHE_SIZE
+        if local_timeout is None:
+            local_timeout = settings.MEMOISE_LOCAL_CACHE_TIMEOUT
+        if stamp_check_interval is None:
+            stamp_check_interval = settings.MEMOISE_STAMP_CHECK_INTERVAL
+
+        self.local_cache = (
+            LocalLRUCache(local_cache_size, local_timeout)
+            if local_cache_size
+            else None
+        )
+        self.stamp_check_interval = stamp_check_interval
+        self.lease_timeout = lease_timeout
+        self.lease_wait = lease_wait
+        self.lease_poll = lease_poll
+        self.stats = MemoiseStats(
+            self.cache, self.version, flush_interval=stats_flush_interval)
+        self._stamp = None
+        self._stamp_checked = 0
+
     def get_or_set(self, fn, *args, **kwargs):
         """
             Wraps `fn` and caches the response
 
-            Cache key varys by all *args and **kwargs
+            Cache key varys by all *args and **kwargs and the current
+            generation of any `scopes`
+
+            Pass `stale_timeout` to keep the value for that many seconds
+            after `timeout` has passed. A single caller then takes a lease
+            and recomputes the value whilst all other callers are served
+            the stale value. If there is no value to serve callers wait up
+            to `lease_wait` seconds for the lease holder to set it.
+
+            Pass `encoder` to cache the output of encoder(response) instead
+            of the protojson encoded `message_type` response. The response
+            is then returned as a PreEncodedMessage which is never decoded
+            unless it is needed.
         """
         timeout = kwargs.pop("timeout", None)
         message_type = kwargs.pop("message_type", None)
-        key = self.create_key(fn, args, kwargs)
+        scopes = kwargs.pop("scopes", None)
+        stale_timeout = kwargs.pop("stale_timeout", None)
+        encoder = kwargs.pop("encoder", None)
+        key = self.create_scoped_key(fn, args, kwargs, scopes)
+
+        if encoder is None:
+            compute = functools.partial(fn, *args, **kwargs)
+        else:
+            computed = {}
+
+            def compute():
+                computed['message'] = fn(*args, **kwargs)
+                return encoder(computed['message'])
+
+        obj = self._get_or_set_by_key(
+            key, _get_stats_name(fn), compute,
+            timeout=timeout,
+            message_type=None if encoder else message_type,
+            stale_timeout=stale_timeout)
+
+        if encoder is None:
+            return obj
+
+        return PreEncodedMessage(
+            message_type, obj, message=computed.get('message'))
+
+    def _get_or_set_by_key(
+            self, key, stats_name, compute,
+            timeout=None, message_type=None, stale_timeout=None):
+        """
+            Gets the value of `key` or sets it to the result of compute()
+        """
+        if stale_timeout is not None:
+            return self._get_or_set_leased(
+                key, stats_name, compute,
+                timeout=timeout,
+                message_type=message_type,
+                stale_timeout=stale_timeout)
 
         obj = self.get_by_key(key, message_type=message_type)
 
         if obj is None:
-            obj = fn(*args, **kwargs)
-            self.add_by_key(
+            start = time.time()
+            obj = compute()
+            compute_time = time.time() - start
+
+            size = self.add_by_key(
                 key, obj, timeout=timeout, message_type=message_type)
+            self.stats.record_miss(stats_name, compute_time, size)
+        else:
+            self.stats.record_hits(stats_name)
 
         return obj
 
+    def _get_or_set_leased(
+            self, key, stats_name, compute,
+            timeout=None, message_type=None, stale_timeout=None):
+        """
+            Implementation of get_or_set() for calls with a `stale_timeout`
+        """
+        obj, fresh = self.get_entry_by_key(key, message_type=message_type)
+        if fresh:
+            self.stats.record_hits(stats_name)
+            return obj
+
+        if self.acquire_lease(key):
+            try:
+                start = time.time()
+                obj = compute()
+                compute_time = time.time() - start
+
+                size = self.set_by_key(
+                    key, obj,
+                    timeout=timeout,
+                    message_type=message_type,
+                    stale_timeout=stale_timeout)
+                self.stats.record_miss(stats_name, compute_time, size)
+            finally:
+                self.release_lease(key)
+            return obj
+
+        if obj is not None:
+            # serve the stale value whilst the lease holder recomputes
+            self.stats.record_hits(stats_name)
+            return obj
+
+        deadline = time.time() + self.lease_wait
+        while time.time() < deadline:
+            time.sleep(self.lease_poll)
+            obj, fresh = self.get_entry_by_key(
+                key, message_type=message_type)
+            if obj is not None:
+                return obj
+
+        logging.warning("Gave up waiting on lease for key %s", key)
+        return compute()
+
+    def get_many_or_set(self, fn, arg_tuples, **kwargs):
+        """
+            Bulk version of get_or_set()
+
+            Gets the cached response of calling fn(*args) for each tuple of
+            args in `arg_tuples` with a single memcache call. Only the
+            misses are computed and they are written back with a single
+            memcache call.
+
+            Pass `batch_fn` to compute all misses in one go. It is called
+            with the list of argument tuples that missed and must return a
+            list of results in the same order.
+
+            Returns a list of responses in the same order as `arg_tuples`
+        """
+        timeout = kwargs.pop("timeout", None)
+        message_type = kwargs.pop("message_type", None)
+        scopes = kwargs.pop("scopes", None)
+        batch_fn = kwargs.pop("batch_fn", None)
+
+        arg_tuples = [tuple(args) for args in arg_tuples]
+        keys = [self.create_key(fn, args, {}) for args in arg_tuples]
+
+        if scopes:
+            generations = self.get_generations(scopes)
+            keys = [
+                self.apply_generations(key, scopes, generations)
+                for key in keys]
+
+        results = self.get_many_by_key(keys, message_type=message_type)
+
+        missing = [
+            (key, args) for key, args in zip(keys, arg_tuples)
+            if key not in results]
+
+        stats_name = _get_stats_name(fn)
+        if results:
+            self.stats.record_hits(stats_name, count=len(results))
+
+        if missing:
+            missing_args = [args for key, args in missing]
+
+            start = time.time()
+            if batch_fn:
+                computed = batch_fn(missing_args)
+            else:
+                computed = [fn(*args) for args in missing_args]
+            compute_time = (time.time() - start) / len(missing)
+
+            computed = {
+                key: obj for (key, args), obj in zip(missing, computed)}
+
+            sizes = self.set_many_by_key(
+                {k: v for k, v in computed.items() if v is not None},
+                timeout=timeout,
+                message_type=message_type) or {}
+
+            for key, args in missing:
+                self.stats.record_miss(
+                    stats_name, compute_time, sizes.get(key))
+
+            results.update(computed)
+
+        return [results[key] for key in keys]
+
     def get(self, fn, *args, **kwargs):
         """
             Get cached response of calling fn(*args, **kwargs)
@@ -66,8 +576,9 @@ class MemoiseCacheManager(object):
             Returns None if response is not cached
         """
         message_type = kwargs.pop("message_type", None)
+        scopes = kwargs.pop("scopes", None)
 
-        key = self.create_key(fn, args, kwargs)
+        key = self.create_scoped_key(fn, args, kwargs, scopes)
         return self.get_by_key(key, message_type=message_type)
 
     def get_by_key(self, key, message_type=None):
@@ -76,23 +587,180 @@ class MemoiseCacheManager(object):
 
             Decodes protorpc messages
         """
-        obj = self.cache.get(key, version=self.version)
+        obj, fresh = self.get_entry_by_key(key, message_type=message_type)
+        return obj
 
-        if obj is not None and message_type:
-            return decode_message(message_type, obj)
+    def get_entry_by_key(self, key, message_type=None):
+        """
+            Gets cached response by the cache key along with a flag
+            indicating whether it is still fresh
 
-        return obj
+            Returns (None, False) if the key is not cached
+        """
+        if self.local_cache is not None:
+            stamp = self.get_stamp()
+            obj = self.local_cache.get(key, stamp)
+            if obj is not None:
+                return obj, True
+
+        entry = self.cache.get(key, version=self.version)
+
+        if entry is None:
+            return None, False
+
+        if not isinstance(entry, tuple):
+            # stored before entries carried their expiry. Delete it so
+            # that add_by_key() can replace it
+            self.cache.delete(key, version=self.version)
+            return None, False
+
+        obj = self.unpack_entries(
+            {key: entry}, message_type=message_type).get(key)
+
+        if obj is None:
+            return None, False
+
+        remaining = entry[0] - time.time()
+
+        if remaining > 0 and self.local_cache is not None:
+            self.local_cache.set(key, obj, stamp, timeout=remaining)
+
+        return obj, remaining > 0
+
+    def get_many_by_key(self, keys, message_type=None):
+        """
+            Gets the fresh cached responses for a list of keys
+
+            Returns a dict of key to response. Missing keys are omitted.
+        """
+        results = {}
+
+        if self.local_cache is not None:
+            stamp = self.get_stamp()
+            for key in keys:
+                obj = self.local_cache.get(key, stamp)
+                if obj is not None:
+                    results[key] = obj
+
+        missing = [key for key in keys if key not in results]
+        if not missing:
+            return results
+
+        entries = self.cache.get_many(missing, version=self.version)
+        now = time.time()
+
+        fresh_entries = {
+            key: entry for key, entry in entries.items()
+            if isinstance(entry, tuple) and entry[0] > now
+        }
+
+        for key, obj in self.unpack_entries(
+                fresh_entries, message_type=message_type).items():
+            if self.local_cache is not None:
+                self.local_cache.set(
+                    key, obj, stamp, timeout=fresh_entries[key][0] - now)
+
+            results[key] = obj
+
+        return results
+
+    def pack_entry(self, key, obj, soft_expires, message_type=None):
+        """
+            Packs a value into a cache entry
+
+            Values with a pickled size over COMPRESS_THRESHOLD are zlib
+            compressed. If they are still larger than CHUNK_SIZE they are
+            split across multiple chunk keys and the entry holds a manifest
+            of them.
+
+            Returns the entry along with a dict of chunk key to chunk data
+            which must also be set in the cache and the encoded size of the
+            value
+        """
+        if message_type:
+            obj = encode_message(obj)
+
+        data = cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+        if len(data) < COMPRESS_THRESHOLD:
+            return (soft_expires, FORMAT_RAW, obj), {}, len(data)
+
+        data = zlib.compress(data)
+        if len(data) <= CHUNK_SIZE:
+            return (soft_expires, FORMAT_ZLIB, data), {}, len(data)
+
+        token = uuid.uuid4().hex
+        chunks = {
+            self._chunk_key(key, token, i): data[offset:offset + CHUNK_SIZE]
+            for i, offset in enumerate(xrange(0, len(data), CHUNK_SIZE))
+        }
+
+        return (
+            (soft_expires, FORMAT_CHUNKED, (token, len(chunks))),
+            chunks,
+            len(data))
+
+    def unpack_entries(self, entries, message_type=None):
+        """
+            Unpacks a dict of key to cache entry into a dict of key to value
+
+            All chunks of chunked entries are fetched with a single memcache
+            call. Entries with any missing chunks are omitted.
+        """
+        chunk_keys = []
+        for key, (soft_expires, fmt, payload) in entries.items():
+            if fmt == FORMAT_CHUNKED:
+                token, count = payload
+                chunk_keys += [
+                    self._chunk_key(key, token, i) for i in xrange(count)]
+
+        chunks = (
+            self.cache.get_many(chunk_keys, version=self.version)
+            if chunk_keys
+            else {}
+        )
+
+        results = {}
+        for key, (soft_expires, fmt, payload) in entries.items():
+            if fmt == FORMAT_CHUNKED:
+                token, count = payload
+                try:
+                    payload = ''.join(
+                        chunks[self._chunk_key(key, token, i)]
+                        for i in xrange(count))
+                except KeyError:
+                    # a chunk has been evicted
+                    continue
+
+            if fmt in (FORMAT_ZLIB, FORMAT_CHUNKED):
+                obj = cPickle.loads(zlib.decompress(payload))
+            else:
+                obj = payload
+
+            if message_type:
+                obj = decode_message(message_type, obj)
+
+            results[key] = obj
+
+        return results
+
+    @staticmethod
+    def _chunk_key(key, token, i):
+        """
+            Gets the key of a chunk of a chunked entry
+        """
+        return "{0}-chunk-{1}-{2}".format(key, token, i)
 
     def add(self, fn, *args, **kwargs):
         """
             Calls fn(*args, **kwargs) and caches the response
 
-            Returns the result of the cache set call
+            Returns the encoded size of the value
         """
         timeout = kwargs.pop("timeout", None)
         message_type = kwargs.pop("message_type", None)
+        scopes = kwargs.pop("scopes", None)
 
-        key = self.create_key(fn, args, kwargs)
+        key = self.create_scoped_key(fn, args, kwargs, scopes)
 
         obj = fn(*args, **kwargs)
         return self.add_by_key(
@@ -100,27 +768,139 @@ class MemoiseCacheManager(object):
 
     def add_by_key(self, key, obj, timeout=None, message_type=None):
         """
-            Adds a value to the cache
+            Adds a value to the cache if it is not already set
+
+            Encodes protorpc messages
+
+            Returns the encoded size of the value
+        """
+        return self._store(
+            self.cache.add, key, obj,
+            timeout=timeout, message_type=message_type)
+
+    def set_by_key(
+            self, key, obj,
+            timeout=None, message_type=None, stale_timeout=None):
+        """
+            Sets a value in the cache, overwriting any existing value
+
+            The value is kept for `stale_timeout` seconds after `timeout`
+            has passed so that it can be served whilst being recomputed
+
+            Encodes protorpc messages
+
+            Returns the encoded size of the value
+        """
+        return self._store(
+            self.cache.set, key, obj,
+            timeout=timeout,
+            message_type=message_type,
+            stale_timeout=stale_timeout)
+
+    def set_many_by_key(self, objs, timeout=None, message_type=None):
+        """
+            Sets multiple values in the cache with a single memcache call
+
+            objs: dict of key to value
 
             Encodes protorpc messages
+
+            Returns a dict of key to encoded size
         """
+        if not objs:
+            return
+
         if timeout is None:
             timeout = self.default_timeout
 
-        if message_type:
-            obj = encode_message(obj)
+        if self.local_cache is not None:
+            stamp = self.get_stamp()
+
+        soft_expires = time.time() + timeout
+        entries = {}
+        sizes = {}
+        for key, obj in objs.items():
+            entries[key], chunks, sizes[key] = self.pack_entry(
+                key, obj, soft_expires, message_type=message_type)
+            entries.update(chunks)
+
+        try:
+            self.cache.set_many(
+                entries, version=self.version, timeout=timeout)
+        except ValueError as e:
+            # might have exceeded the key/value memcache size limit
+            logging.debug(e)
+            return sizes
+
+        if self.local_cache is not None:
+            for key, obj in objs.items():
+                self.local_cache.set(key, obj, stamp, timeout=timeout)
+
+        return sizes
+
+    def _store(
+            self, method, key, obj,
+            timeout=None, message_type=None, stale_timeout=None):
+        """
+            Stores a value in memcache using the given cache method and, if
+            that succeeds, in the local cache
+
+            Values are held in memcache alongside the time after which they
+            become stale. Large values are compressed and chunked as per
+            pack_entry()
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+
+        if self.local_cache is not None:
+            stamp = self.get_stamp()
+
+        entry, chunks, size = self.pack_entry(
+            key, obj, time.time() + timeout, message_type=message_type)
+
+        local_timeout = timeout
+        timeout += stale_timeout or 0
 
         try:
-            return self.cache.add(key, obj, version=self.version, timeout=timeout)
+            if chunks:
+                self.cache.set_many(
+                    chunks, version=self.version, timeout=timeout)
+
+            stored = method(key, entry, version=self.version, timeout=timeout)
         except ValueError as e:
             # might have exceeded the key/value memcache size limit
             logging.debug(e)
+            return size
+
+        # add() returns False if another caller set the key first, in which
+        # case their value is the one every other instance sees
+        if self.local_cache is not None and stored is not False:
+            self.local_cache.set(key, obj, stamp, timeout=local_timeout)
+
+        return size
+
+    def acquire_lease(self, key):
+        """
+            Attempts to take the lease to recompute the given key
+
+            Returns True if the lease was acquired
+        """
+        return self.cache.add(
+            LEASE_KEY_PREFIX + key, 1,
+            version=self.version, timeout=self.lease_timeout)
+
+    def release_lease(self, key):
+        """
+            Releases the lease on the given key
+        """
+        self.cache.delete(LEASE_KEY_PREFIX + key, version=self.version)
 
     def delete(self, fn, *args, **kwargs):
         """
             Removes the result of calling fn(*args, **kwargs) from the cache
         """
-        key = self.create_key(fn, args, kwargs)
+        scopes = kwargs.pop("scopes", None)
+        key = self.create_scoped_key(fn, args, kwargs, scopes)
         return self.delete_by_key(key)
 
     def delete_many(self, *calls):
@@ -139,55 +919,397 @@ class MemoiseCacheManager(object):
         """
             Deletes the given key from the cache
         """
-        return self.cache.delete(key, version=self.version)
+        ret = self.cache.delete(key, version=self.version)
+        self.invalidate_local([key])
+        return ret
 
     def delete_many_by_key(self, keys):
         """
             Deletes list of keys from cache
         """
-        return self.cache.delete_many(keys, version=self.version)
+        ret = self.cache.delete_many(keys, version=self.version)
+        self.invalidate_local(keys)
+        return ret
+
+    def get_stamp(self):
+        """
+            Gets the current invalidation stamp for the local cache
+
+            Only reads from memcache if the last read is older than
+            `stamp_check_interval`
+        """
+        now = time.time()
+        if (self._stamp is not None and
+                now - self._stamp_checked < self.stamp_check_interval):
+            return self._stamp
+
+        stamp = self.cache.get(STAMP_KEY, version=self.version)
+        if stamp is None:
+            # seed from the clock so that an evicted stamp never
+            # comes back with a value that was already used
+            stamp = int(now * 1000)
+            self.cache.add(
+                STAMP_KEY, stamp, version=self.version, timeout=None)
+
+        self._stamp = stamp
+        self._stamp_checked = now
+        return stamp
+
+    def invalidate_local(self, keys):
+        """
+            Removes `keys` from this instance's local cache and bumps the
+            invalidation stamp so that other instances drop their local
+            copies on their next stamp check
+        """
+        if self.local_cache is None:
+            return
+
+        self.local_cache.delete_many(keys)
+
+        try:
+            stamp = self.cache.incr(STAMP_KEY, version=self.version)
+        except ValueError:
+            # stamp is missing from memcache
+            stamp = int(time.time() * 1000)
+            self.cache.set(
+                STAMP_KEY, stamp, version=self.version, timeout=None)
+
+        self._stamp = stamp
+        self._stamp_checked = time.time()
+
+    def get_generations(self, scopes):
+        """
+            Gets the current generation of each of the given scopes
+
+            Missing generations are seeded from the clock so that an evicted
+            counter never comes back with a value that was already used
+
+            Generations are held in the local cache for at most
+            `stamp_check_interval` seconds, after which they are re-read
+            from memcache
+        """
+        keys = [GENERATION_KEY_PREFIX + scope for scope in scopes]
+
+        if self.local_cache is not None:
+            stamp = self.get_stamp()
+            generations = {
+                k: self.local_cache.get(k, stamp) for k in keys}
+            missing = [k for k, v in generations.items() if v is None]
+        else:
+            generations = {}
+            missing = keys
+
+        if missing:
+            found = self.cache.get_many(missing, version=self.version)
+
+            for k in missing:
+                generation = found.get(k)
+                if generation is None:
+                    generation = int(time.time() * 1000)
+                    if not self.cache.add(
+                            k, generation,
+                            version=self.version, timeout=None):
+                        generation = self.cache.get(
+                            k, version=self.version) or generation
+
+                generations[k] = generation
+
+                if self.local_cache is not None and self.stamp_check_interval:
+                    self.local_cache.set(
+                        k, generation, stamp,
+                        timeout=self.stamp_check_interval)
+
+        return [generations[k] for k in keys]
+
+    def invalidate_scopes(self, *scopes):
+        """
+            Invalidates everything cached under the given scopes by bumping
+            their generations
+
+            Keys built from the old generations are never read again, so
+            the invalidation stamp is left alone. Other instances see the
+            new generations within `stamp_check_interval` seconds.
+        """
+        keys = [GENERATION_KEY_PREFIX + scope for scope in scopes]
+
+        for key in keys:
+            try:
+                self.cache.incr(key, version=self.version)
+            except ValueError:
+                # generation is missing from memcache
+                self.cache.set(
+                    key, int(time.time() * 1000),
+                    version=self.version, timeout=None)
+
+        if self.local_cache is not None:
+            self.local_cache.delete_many(keys)
+
+    def create_scoped_key(self, fn, args, kwargs, scopes=None):
+        """
+            Creates a cache key for the given function and its arguments
+            which includes the current generation of the given scopes
+        """
+        key = self.create_key(fn, args, kwargs)
+
+        if not scopes:
+            return key
+
+        return self.apply_generations(
+            key, scopes, self.get_generations(scopes))
+
+    @classmethod
+    def apply_generations(cls, key, scopes, generations):
+        """
+            Folds the given scope generations into a cache key
+        """
+        scoped_key = u'{key}{scopes}'.format(
+            key=key,
+            scopes=u''.join(
+                u'|{0}:{1}'.format(scope, generation)
+                for scope, generation in zip(scopes, generations)))
+
+        return hashlib.md5(scoped_key.encode('utf-8')).hexdigest()
 
     @classmethod
     def create_key(cls, fn, args, kwargs):
         """
             Creates a cache key for the given function and its arguments
-        """
-        args = map(cls.sanitise_arg_for_key, args)
-        kwargs = {k: cls.sanitise_arg_for_key(v) for k, v in kwargs.items()}
 
+            Arguments are serialised with serialise_key_arg() which never
+            needs to hit the database
+        """
         if isinstance(fn, basestring):
             fn_repr = fn
         else:
             fn_repr = _get_func_repr(fn)
 
-        query_key = u'{fn_repr}{args}{kwargs}'.format(
+        query_key = u'{fn_repr}({args}|{kwargs})'.format(
             fn_repr=fn_repr,
-            args=unicode(args),
-            kwargs=unicode(kwargs))
+            args=u','.join(serialise_key_arg(arg) for arg in args),
+            kwargs=u','.join(
+                u'{0}={1}'.format(k, serialise_key_arg(kwargs[k]))
+                for k in sorted(kwargs)))
 
-        return hashlib.md5(query_key).hexdigest()
+        return hashlib.md5(query_key.encode('utf-8')).hexdigest()
 
-    @classmethod
-    def sanitise_arg_for_key(cls, arg):
-        """
-            Converts an arg to a value which can be used as part of a cache key
-        """
-        if isinstance(arg, models.Model):
-            return _django_model_repr(arg)
+cache_manager = MemoiseCacheManager()
 
-        if isinstance(arg, models.QuerySet):
-            return map(_django_model_repr, arg)
 
-        return arg
+def project_scope(project):
+    """
+        Gets the name of the cache scope for a project or project ID
+    """
+    return u'project:{0}'.format(getattr(project, 'pk', project))
 
-cache_manager = MemoiseCacheManager()
+
+def user_scope(user):
+    """
+        Gets the name of the cache scope for a user or user ID
+    """
+    return u'user:{0}'.format(getattr(user, 'pk', user))
+
+
+# {model class: {scope field: fn(instance) -> scope ID}}
+_dependencies = {}
+
+
+def register_dependency(model_cls, scope_field, get_scope_id):
+    """
+        Registers how to find the `scope_field` ID of a changed instance of
+        `model_cls` so that memoised calls depending on it can be invalidated
+
+        get_scope_id may return a list of IDs for instances which are shared
+        between several `scope_field` objects
+
+        Must happen at import time on every instance which may save the
+        model, i.e. from :func:`greenday_core.signals.connect_all`
+    """
+    _dependencies.setdefault(model_cls, {})[scope_field] = get_scope_id
+
+
+def dependency_scope(model_cls, scope_field, scope_id):
+    """
+        Gets the name of the cache scope for changes to `model_cls` within
+        the `scope_field` object with the given ID
+    """
+    return u'{0}@{1}:{2}'.format(
+        _django_model_label(model_cls), scope_field, scope_id)
+
+
+def invalidate_dependants(instance):
+    """
+        Invalidates all memoised calls which depend on the model of the
+        given saved or deleted instance
+    """
+    model_cls = instance.__class__
+    scopes = []
+    for scope_field, get_scope_id in _dependencies.get(model_cls, {}).items():
+        try:
+            scope_id = get_scope_id(instance)
+        except ObjectDoesNotExist:
+            # the parent went first in a cascading delete
+            logging.warning(
+                "Could not get %s ID of deleted %s %s",
+                scope_field, _django_model_label(model_cls), instance.pk)
+            continue
+
+        if scope_id is None:
+            continue
+
+        if not isinstance(scope_id, (list, tuple, set, frozenset)):
+            scope_id = [scope_id]
+
+        scopes += [
+            dependency_scope(model_cls, scope_field, i) for i in scope_id]
+
+    if scopes:
+        cache_manager.invalidate_scopes(*scopes)
+
+
+def memoised(depends_on, scope, scope_field='project', **options):
+    """
+        Decorator to cache a function with `cache_manager` until any of
+        the `depends_on` models change
+
+        scope: gets the ID of the `scope_field` object from the function's
+        args. Only changes to `depends_on` instances within that object
+        invalidate the cached call.
+        options: passed to :meth:`MemoiseCacheManager.get_or_set`
+
+        Each model must be registered for `scope_field` with
+        :func:`register_dependency`
+
+            @memoised(
+                depends_on=[ProjectTag, VideoTagInstance],
+                scope=lambda project: project.pk)
+            def _projecttag_list(project):
+                ...
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            scope_id = scope(*args, **kwargs)
+            scopes = [
+                dependency_scope(model_cls, scope_field, scope_id)
+                for model_cls in depends_on
+            ]
+            return cache_manager.get_or_set(
+                fn, *args, scopes=scopes, **dict(options, **kwargs))
+        return wrapper
+    return decorator
+
+
+def serialise_key_arg(arg):
+    """
+        Converts an arg to a canonical string which can be used as part of a
+        cache key
+
+        - protorpc messages are serialised field by field in name order
+        - Django models are reduced to their model label and primary key
+        - Django querysets are reduced to their SQL and are never
+          evaluated. Querysets which can never match anything have no SQL
+          and are reduced to their model label
+        - dicts and sets are serialised in sorted order
+    """
+    if arg is None or isinstance(arg, (bool, float)):
+        return repr(arg)
+
+    if isinstance(arg, (int, long)):
+        # ints and longs with the same value get the same key
+        return str(arg)
+
+    if isinstance(arg, basestring):
+        if isinstance(arg, str):
+            arg = arg.decode('utf-8', 'replace')
+        return repr(arg)
+
+    if isinstance(arg, messages.Message):
+        return u'{0}({1})'.format(
+            arg.__class__.__name__,
+            u','.join(
+                u'{0}={1}'.format(
+                    name, serialise_key_arg(arg.get_assigned_value(name)))
+                for name in _get_message_field_names(arg.__class__)))
+
+    if isinstance(arg, models.Model):
+        return _django_model_repr(arg)
+
+    if isinstance(arg, models.QuerySet):
+        try:
+            sql, params = arg.query.sql_with_params()
+        except EmptyResultSet:
+            # e.g. none() or pk__in=[], which can never match anything
+            return u'<QuerySet {0}: empty>'.format(
+                _django_model_label(arg.model))
+        return u'<QuerySet {0}: {1} {2}>'.format(
+            _django_model_label(arg.model),
+            sql,
+            serialise_key_arg(params))
+
+    if isinstance(arg, dict):
+        return u'{{{0}}}'.format(u','.join(sorted(
+            u'{0}:{1}'.format(serialise_key_arg(k), serialise_key_arg(v))
+            for k, v in arg.items())))
+
+    if isinstance(arg, (set, frozenset)):
+        return u'{{{0}}}'.format(
+            u','.join(sorted(serialise_key_arg(o) for o in arg)))
+
+    if isinstance(arg, (list, tuple, messages.FieldList)):
+        return u'[{0}]'.format(u','.join(serialise_key_arg(o) for o in arg))
+
+    if isinstance(arg, (datetime.datetime, datetime.date)):
+        return arg.isoformat()
+
+    return repr(arg).decode('utf-8', 'replace')
+
+
+_message_field_names = {}
+
+
+def _get_message_field_names(message_cls):
+    """
+        Gets the sorted field names of a protorpc message class
+    """
+    names = _message_field_names.get(message_cls)
+    if names is None:
+        names = _message_field_names[message_cls] = sorted(
+            f.name for f in message_cls.all_fields())
+
+    return names
+
+
+def _django_model_label(model_cls):
+    """
+        Gets the app label and name of a Django model class
+    """
+    return u'{0}.{1}'.format(
+        model_cls._meta.app_label, model_cls._meta.model_name)
 
 
 def _django_model_repr(obj):
     """
         Gets a string uniquely representing a Django model
     """
-    return u'<{0}: {1}>'.format(obj.__class__.__name__, obj.pk)
+    return u'<{0}: {1}>'.format(_django_model_label(obj.__class__), obj.pk)
+
+
+def _get_stats_name(fn):
+    """
+        Gets the name under which stats for calls to `fn` are recorded
+    """
+    if isinstance(fn, basestring):
+        return fn
+    return _get_func_repr(fn)
+
+
+def _percentile(values, percentile):
+    """
+        Gets the given percentile (0-1) of a sorted list of values
+    """
+    if not values:
+        return None
+    return values[int(round(percentile * (len(values) - 1)))]
 
 
 def _get_func_repr(func):
@@ -2,6 +2,7 @@
     Django middleware classes
 """
 # import project deps
+from greenday_core.eventbus import open_appevent_buffer, close_appevent_buffer
 from greenday_core.utils import log_sql_queries_to_console
 from django.utils.functional import SimpleLazyObject
 
@@ -40,3 +41,29 @@ class AuthenticationMiddleware(object):
             Process HTTP response
         """
         request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+class AppEventBufferMiddleware(object):
+    """
+        Buffers application events published whilst handling a request and
+        publishes them together if the request succeeds
+    """
+    def process_request(self, request):
+        """
+            Opens the buffer, discarding any left by a previous request
+        """
+        close_appevent_buffer(publish=False)
+        open_appevent_buffer()
+
+    def process_exception(self, request, exception):
+        """
+            Discards the buffered events
+        """
+        close_appevent_buffer(publish=False)
+
+    def process_response(self, request, response):
+        """
+            Publishes the buffered events if the request succeeded
+        """
+        close_appevent_buffer(publish=response.status_code < 400)
+        return response
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('greenday_core', '0019_auto_20160316_1149'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectUpdateCounter',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('kind', models.IntegerField()),
+                ('since', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('project', models.ForeignKey(related_name='update_counters', to='greenday_core.Project')),
+                ('user', models.ForeignKey(related_name='update_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='projectupdatecounter',
+            unique_together=set([('project', 'user', 'kind')]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('greenday_core', '0020_projectupdatecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRollup',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('date', models.DateField()),
+                ('project_id', models.IntegerField(null=True)),
+                ('kind', models.IntegerField()),
+                ('user_id', models.IntegerField(null=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventrollup',
+            unique_together=set([('date', 'project_id', 'kind', 'user_id')]),
+        ),
+    ]
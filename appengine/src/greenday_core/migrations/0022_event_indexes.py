@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('greenday_core', '0021_eventrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='event',
+            index_together=set([('project_id', 'timestamp'), ('project_id', 'kind', 'timestamp'), ('object_id', 'timestamp')]),
+        ),
+    ]
@@ -13,7 +13,7 @@ from .video import (
     VideoCollection,
     VideoCollectionVideo
 )
-from .event import Event
+from .event import Event, EventRollup, ProjectUpdateCounter
 from .tag import (
     GlobalTag,
     ProjectTag,
@@ -1,5 +1,6 @@
 """
-    Defines the model to hold application events
+    Defines the models to hold application events and the counters
+    derived from them
 """
 from django.conf import settings
 from django.db import models
@@ -16,8 +17,14 @@ class Event(models.Model):
     """
     class Meta:
         ordering = ['-timestamp', '-pk']
+        # match the filters of eventbus.get_events()
+        index_together = [
+            ("project_id", "timestamp"),
+            ("project_id", "kind", "timestamp"),
+            ("object_id", "timestamp"),
+        ]
 
-    timestamp = models.DateTimeField()
+    timestamp = models.DateTimeField(db_index=True)
     kind = models.IntegerField(EventKind.choices)
     object_kind = models.IntegerField()
     event_kind = models.IntegerField()
@@ -86,3 +93,41 @@ by {email} at {timestamp}".format(
             email=self.user.email if self.user else "<none>",
             timestamp=self.timestamp
         )
+
+
+class ProjectUpdateCounter(models.Model):
+    """
+        Materialised count of the events of a kind which a user has not
+        yet seen on a project
+
+        Counts events since `since`, which mirrors the user's
+        `ProjectUser.last_updates_viewed`. A counter whose `since` does
+        not match is stale and is rebuilt from the events.
+    """
+    class Meta:
+        unique_together = ("project", "user", "kind")
+
+    project = models.ForeignKey(
+        "greenday_core.Project", related_name="update_counters")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="update_counters")
+    kind = models.IntegerField()
+    since = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+
+class EventRollup(models.Model):
+    """
+        Daily count of the events of a kind by a user on a project
+
+        Replaces the raw events once they pass the retention horizon and
+        have been archived
+    """
+    class Meta:
+        unique_together = ("date", "project_id", "kind", "user_id")
+
+    date = models.DateField()
+    project_id = models.IntegerField(null=True)
+    kind = models.IntegerField()
+    user_id = models.IntegerField(null=True)
+    count = models.PositiveIntegerField(default=0)
@@ -198,15 +198,26 @@ class Project(BaseModel, TrashableMixin):
     def set_updates_viewed(self, user, last_viewed_at=None):
         """
             Sets the last time that a user viewed events on the project
+
+            Zeroes the user's update counters, or recounts them if viewed
+            at a time other than now
         """
-        last_viewed_at = last_viewed_at or timezone.now()
+        # the counters module imports the models
+        from ..update_counters import (
+            reset_update_counters, rebuild_update_counters)
 
         user_relation = self.get_user_relation(user)
 
         if user_relation:
-            user_relation.last_updates_viewed = last_viewed_at
+            user_relation.last_updates_viewed = (
+                last_viewed_at or timezone.now())
             user_relation.save()
 
+            if last_viewed_at is None:
+                reset_update_counters(user_relation)
+            else:
+                rebuild_update_counters(user_relation)
+
     def add_admin(self, user, pending=True):
         """
             Adds the user as a project admin
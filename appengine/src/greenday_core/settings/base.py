@@ -117,6 +117,7 @@ MIDDLEWARE_CLASSES = (
     # for admin only
     'django.contrib.sessions.middleware.SessionMiddleware',
     'greenday_core.middleware.AuthenticationMiddleware',
+    'greenday_core.middleware.AppEventBufferMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
 
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -156,6 +157,7 @@ INSTALLED_APPS = (
     'greenday_api',
     'greenday_public',
     'greenday_admin',
+    'greenday_channel',
 )
 
 STATIC_DIRNAME = 'static' if APPENGINE_PRODUCTION else 'static-dev'
@@ -173,6 +175,17 @@ CACHES = {
 
 MEMOISE_CACHE_TIMEOUT = 60
 
+# in-process cache in front of memcache for memoised function calls
+MEMOISE_LOCAL_CACHE_SIZE = 500
+MEMOISE_LOCAL_CACHE_TIMEOUT = 5
+MEMOISE_STAMP_CHECK_INTERVAL = 1
+
+# recompute hot project endpoints in the background after invalidation
+MEMOISE_WARM_CACHES = True
+
+# events older than this are rolled up by day, archived to GCS and deleted
+EVENT_RETENTION_DAYS = 180
+
 AUTH_USER_MODEL = 'greenday_core.User'
 
 OAUTH_FAILED_REDIRECT = 'access_denied'
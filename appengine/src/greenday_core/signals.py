@@ -12,6 +12,7 @@ import deferred_manager
 
 from .denormalisers import denormalise_video, denormalise_project
 from .models import (
+    Event,
     Project,
     ProjectUser,
     Video,
@@ -31,6 +32,8 @@ from .indexers import (
     index_auto_complete_user,
 )
 from .image_manager import ImageManager
+from .memoize_cache import register_dependency, invalidate_dependants
+from .update_counters import increment_update_counters
 
 
 def project_saved(sender, instance, created, raw, **kwargs):
@@ -387,6 +390,23 @@ def video_tag_instance_deleted(sender, instance, **kwargs):
     )
 
 
+def memoised_dependency_changed(sender, instance, **kwargs):
+    """
+        Invalidates memoised calls which depend on the saved or deleted
+        model
+    """
+    if not kwargs.get('raw'):
+        invalidate_dependants(instance)
+
+
+def event_saved(sender, instance, created, raw, **kwargs):
+    """
+        Counts a new event towards the project update counters
+    """
+    if created and not raw:
+        increment_update_counters([instance])
+
+
 def x_minutes(x):
     """
         Returns datetime object at `x` minutes from now
@@ -434,6 +454,10 @@ def connect_all():
         delete_youtube_video, sender=YouTubeVideo,
         dispatch_uid='delete_youtube_video')
 
+    post_save.connect(
+        event_saved, sender=Event,
+        dispatch_uid='event_saved')
+
     post_save.connect(
         user_video_detail_saved, sender=UserVideoDetail,
         dispatch_uid='user_video_detail_saved')
@@ -494,4 +518,34 @@ def connect_all():
         sender=TimedVideoComment,
         dispatch_uid='post_delete_reprocess_video_search_document')
 
+    connect_memoised_dependencies()
+
+
+def connect_memoised_dependencies():
+    """
+        Registers the models which memoised calls can depend on and
+        connects the handlers which invalidate them
+    """
+    dependencies = (
+        (ProjectTag, 'project', lambda o: o.project_id),
+        (GlobalTag, 'project', lambda o: list(
+            o.projecttags.values_list('project_id', flat=True).distinct())),
+        (VideoTagInstance, 'project', lambda o: o.video_tag.project_id),
+        (VideoTagInstance, 'user', lambda o: o.user_id),
+        (Video, 'project', lambda o: o.project_id),
+        (UserVideoDetail, 'user', lambda o: o.user_id),
+        (ProjectUser, 'user', lambda o: o.user_id),
+    )
+
+    for model_cls, scope_field, get_scope_id in dependencies:
+        register_dependency(model_cls, scope_field, get_scope_id)
+
+        post_save.connect(
+            memoised_dependency_changed, sender=model_cls,
+            dispatch_uid='memoised_dependency_saved_{0}'.format(
+                model_cls.__name__))
 
+        post_delete.connect(
+            memoised_dependency_changed, sender=model_cls,
+            dispatch_uid='memoised_dependency_deleted_{0}'.format(
+                model_cls.__name__))
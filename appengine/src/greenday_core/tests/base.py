@@ -16,6 +16,7 @@ from django.contrib.auth import get_user_model
 # import lib deps
 from google.appengine.ext import testbed
 
+from ..memoize_cache import cache_manager
 from ..models import (
     GlobalTag,
     ProjectTag,
@@ -39,6 +40,8 @@ class AppengineTestBed(TestCase):
             Activate appengine test stubs
 
             Patch deferred task running to run methods immediately
+
+            Clear memoised values held in-process by earlier tests
         """
         super(AppengineTestBed, self).setUp()
         self.tb = testbed.Testbed()
@@ -54,6 +57,9 @@ class AppengineTestBed(TestCase):
         defer_patcher.start()
         auth_user_patcher.start()
 
+        if cache_manager.local_cache is not None:
+            cache_manager.local_cache.clear()
+
     def tearDown(self):
         """
             Unpatch deferred task running
@@ -85,6 +91,52 @@ class AppengineTestBed(TestCase):
             qs.filter(pk=obj.pk).exists(),
             "{0} unexpectedly found".format(obj))
 
+    def get_index_name(self, model, columns):
+        """
+            Gets the name of the model's index over exactly the given columns
+        """
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table)
+
+        for name, constraint in constraints.items():
+            if constraint["index"] and constraint["columns"] == list(columns):
+                return name
+
+        self.fail(u"No index on {0} over {1}".format(
+            model._meta.db_table, ", ".join(columns)))
+
+    def assertUsesIndex(self, qs, index_name):
+        """
+            Asserts that MySQL reads the queryset's table through the given
+            index and does not fully scan any table in the query
+        """
+        if connection.vendor != 'mysql':
+            self.skipTest("Query plans are only checked on MySQL")
+
+        table = qs.model._meta.db_table
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            # keep the optimiser's row estimates in line with the test data
+            cursor.execute("ANALYZE TABLE " + connection.ops.quote_name(table))
+            cursor.fetchall()
+
+            cursor.execute("EXPLAIN " + sql, params)
+            columns = [col[0] for col in cursor.description]
+            plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        query = sql % params
+        for row in plan:
+            if row["type"] == "ALL":
+                self.fail(u"Full scan of {0} in query: {1}".format(
+                    row["table"], query))
+
+        keys = [row["key"] for row in plan if row["table"] == table]
+        self.assertEqual(
+            [index_name], keys,
+            u"Expected {0} to be read through {1}, used {2} in query: {3}"
+            .format(table, index_name, keys, query))
+
     def create_video(self, youtube_video=None, **kwargs):
         """
             Helper method to create a video
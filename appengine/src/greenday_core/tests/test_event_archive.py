@@ -0,0 +1,117 @@
+"""
+    Tests for :mod:`greenday_core.event_archive <greenday_core.event_archive>`
+"""
+import datetime
+import gzip
+import json
+import mock
+from cStringIO import StringIO
+
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from ..constants import EventKind
+from ..event_archive import (
+    archive_old_events,
+    archive_event_day,
+    get_retention_horizon
+)
+from ..models import Event, EventRollup
+from .base import AppengineTestBed
+
+
+@override_settings(EVENT_RETENTION_DAYS=30)
+class EventArchiveTestCase(AppengineTestBed):
+    """
+        Tests for :func:`greenday_core.event_archive.archive_old_events <greenday_core.event_archive.archive_old_events>`
+    """
+    def setUp(self):
+        """
+            Bootstrap test data
+        """
+        super(EventArchiveTestCase, self).setUp()
+
+        self.horizon = get_retention_horizon()
+        self.old_day = self.horizon - datetime.timedelta(days=2)
+
+        self.old_events = [
+            Event.objects.create(
+                timestamp=self.old_day + datetime.timedelta(hours=i),
+                kind=kind,
+                project_id=1,
+                object_id=i)
+            for i, kind in enumerate((
+                EventKind.VIDEOCREATED,
+                EventKind.VIDEOCREATED,
+                EventKind.VIDEOUPDATED))
+        ]
+        self.recent_event = Event.objects.create(
+            timestamp=timezone.now(),
+            kind=EventKind.VIDEOCREATED,
+            project_id=1,
+            object_id=42)
+
+        patcher = mock.patch("greenday_core.event_archive.gcs")
+        self.mock_gcs = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_archived_rows(self):
+        """
+            Gets the events written to the mocked archive files
+        """
+        gcs_file = self.mock_gcs.open.return_value.__enter__.return_value
+        rows = []
+        for call in gcs_file.write.call_args_list:
+            with gzip.GzipFile(fileobj=StringIO(call[0][0])) as f:
+                rows.extend(json.loads(line) for line in f)
+        return rows
+
+    def test_archive(self):
+        """
+            Old events are archived, rolled up and deleted
+        """
+        archive_old_events()
+
+        self.assertEqual(
+            [self.recent_event.pk],
+            list(Event.objects.values_list("pk", flat=True)))
+
+        self.assertEqual(
+            [e.pk for e in self.old_events],
+            [row["id"] for row in self.get_archived_rows()])
+
+        rollups = {
+            r.kind: r.count
+            for r in EventRollup.objects.filter(date=self.old_day.date())
+        }
+        self.assertEqual({
+            EventKind.VIDEOCREATED.value: 2,
+            EventKind.VIDEOUPDATED.value: 1
+        }, rollups)
+
+    def test_nothing_to_archive(self):
+        """
+            No tasks are queued when there are no old events
+        """
+        Event.objects.filter(timestamp__lt=self.horizon).delete()
+
+        with mock.patch(
+                "greenday_core.event_archive.archive_event_day") as mock_archive:
+            archive_old_events()
+
+        self.assertFalse(mock_archive.called)
+
+    @mock.patch("greenday_core.event_archive.ARCHIVE_CHUNK_SIZE", 1)
+    def test_chunked(self):
+        """
+            A day is archived in chunks which add to the same rollup
+        """
+        archive_event_day(self.old_day.date())
+
+        self.assertEqual(3, self.mock_gcs.open.call_count)
+        self.assertEqual(
+            2,
+            EventRollup.objects.get(
+                date=self.old_day.date(),
+                kind=EventKind.VIDEOCREATED.value).count)
+        self.assertEqual(1, Event.objects.count())
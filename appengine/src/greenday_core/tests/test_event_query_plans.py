@@ -0,0 +1,106 @@
+"""
+    Query plan tests for the :mod:`greenday_core.eventbus <greenday_core.eventbus>`
+    event queries
+"""
+import datetime
+
+from django.utils import timezone
+
+from ..constants import (
+    CODES_PER_MODEL, EventKind, EventCommonCodes, EventModel)
+from ..eventbus import get_events, encode_event_cursor
+from ..models import Event
+from ..update_counters import UPDATE_KINDS
+from .base import AppengineTestBed
+
+
+class EventQueryPlanTests(AppengineTestBed):
+    """
+        Checks that the filters of :func:`greenday_core.eventbus.get_events <greenday_core.eventbus.get_events>`
+        are served by an index
+    """
+    def setUp(self):
+        """
+            Bootstrap test data
+
+            Spreads older events over many projects, objects and kinds so
+            that MySQL picks an index over scanning the table
+        """
+        super(EventQueryPlanTests, self).setUp()
+        now = timezone.now()
+        self.since = now - datetime.timedelta(days=1)
+
+        kinds = list(EventKind)
+        Event.objects.bulk_create(
+            Event(
+                timestamp=now - datetime.timedelta(days=2 + i % 30),
+                kind=kinds[i % len(kinds)].value,
+                object_kind=kinds[i % len(kinds)].value // CODES_PER_MODEL,
+                event_kind=kinds[i % len(kinds)].value % CODES_PER_MODEL,
+                project_id=i % 50,
+                object_id=i)
+            for i in range(1000))
+
+        self.event = Event.objects.create(
+            timestamp=timezone.now(),
+            kind=EventKind.VIDEOCREATED,
+            project_id=1,
+            object_id=1)
+
+    def assertUsesEventIndex(self, qs, *columns):
+        """
+            Asserts that the query reads events through the index over the
+            given columns
+        """
+        self.assertUsesIndex(qs, self.get_index_name(Event, columns))
+
+    def test_timestamp(self):
+        """
+            Events since a timestamp
+        """
+        self.assertUsesEventIndex(get_events(self.since), "timestamp")
+
+    def test_project(self):
+        """
+            Events on a project
+        """
+        self.assertUsesEventIndex(
+            get_events(self.since, project_id=1), "project_id", "timestamp")
+
+    def test_project_kinds(self):
+        """
+            Events of some kinds on a project, as listed for project updates
+        """
+        self.assertUsesEventIndex(
+            get_events(self.since, kind=UPDATE_KINDS, project_id=1),
+            "project_id", "kind", "timestamp")
+
+    def test_project_event_and_object_kind(self):
+        """
+            Events of an event code and object kind on a project
+        """
+        self.assertUsesEventIndex(
+            get_events(
+                self.since,
+                project_id=1,
+                event_kind=EventCommonCodes.CREATED,
+                object_kind=EventModel.VIDEO),
+            "project_id", "timestamp")
+
+    def test_object(self):
+        """
+            Events of an object
+        """
+        self.assertUsesEventIndex(
+            get_events(self.since, object_id=1), "object_id", "timestamp")
+
+    def test_cursor(self):
+        """
+            The next page of events on a project
+        """
+        self.assertUsesEventIndex(
+            get_events(
+                self.since,
+                project_id=1,
+                cursor=encode_event_cursor(self.reload(self.event)))[:100],
+            "project_id", "timestamp")
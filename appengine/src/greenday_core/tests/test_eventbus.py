@@ -1,6 +1,7 @@
 """
     Tests for :mod:`greenday_core.eventbus <greenday_core.eventbus>`
 """
+import base64
 import datetime
 import unittest
 import mock
@@ -14,8 +15,12 @@ from ..constants import EventKind, EventCommonCodes, EventModel
 from ..eventbus import (
     appevent,
     publish_appevent,
+    publish_appevents,
+    buffered_appevents,
     get_events,
-    get_events_with_objects
+    get_events_with_objects,
+    encode_event_cursor,
+    decode_event_cursor
 )
 from ..models import Event, Project
 from .base import AppengineTestBed
@@ -93,8 +98,8 @@ class DecoratorTests(unittest.TestCase):
             user=99*multiplier
         )
 
-    @mock.patch("greenday_core.eventbus.publish_appevent")
-    def test_decorated_iterable(self, publish_appevent_mock):
+    @mock.patch("greenday_core.eventbus.publish_appevents")
+    def test_decorated_iterable(self, publish_appevents_mock):
         """
             Decorate a function with object_ids evaluated as iterable
 
@@ -130,38 +135,22 @@ class DecoratorTests(unittest.TestCase):
         # ids and mock request object.
         mockobj.assert_called_once_with("42", "84", req)
 
-        # now check that the objects were all published as app events.
-        # We assert that the order is correct and that the data they
-        # are called with is correct.
-        publish_appevent_mock.assert_has_calls([
-            mock.call(
-                DEFAULT_KIND,
-                object_id=55,
-                project_id=84,
-                video_id=None,
-                meta=None,
-                user=None,
-            ),
-            mock.call(
-                DEFAULT_KIND,
-                object_id=78,
-                project_id=84,
-                video_id=None,
-                meta=None,
-                user=None,
-            ),
-            mock.call(
-                DEFAULT_KIND,
-                object_id=105,
-                project_id=84,
-                video_id=None,
-                meta=None,
-                user=None,
-            )
-        ], any_order=False)
-
-    @mock.patch("greenday_core.eventbus.publish_appevent")
-    def test_decorated_post_args_iterable(self, publish_appevent_mock):
+        # now check that the objects were all published as app events in
+        # a single batch. We assert that the order is correct and that
+        # the data they are called with is correct.
+        publish_appevents_mock.assert_called_once_with([
+            {
+                "kind": DEFAULT_KIND,
+                "object_id": obj_id,
+                "project_id": 84,
+                "video_id": None,
+                "meta": None,
+                "user": None,
+            } for obj_id in (55, 78, 105)
+        ])
+
+    @mock.patch("greenday_core.eventbus.publish_appevents")
+    def test_decorated_post_args_iterable(self, publish_appevents_mock):
         """
             Decorate a function with object_ids evaluated as iterable after the
             function has executed
@@ -199,35 +188,19 @@ class DecoratorTests(unittest.TestCase):
         # check that the mock endpoint is called with the relevant ids
         mockobj.assert_called_once_with("42", "84")
 
-        # now check that the objects were all published as app events.
-        # We assert that the order is correct and that the data they
-        # are called with is also correct.
-        publish_appevent_mock.assert_has_calls([
-            mock.call(
-                DEFAULT_KIND,
-                object_id=55,
-                project_id=84,
-                video_id=None,
-                meta=None,
-                user=None,
-            ),
-            mock.call(
-                DEFAULT_KIND,
-                object_id=78,
-                project_id=84,
-                video_id=None,
-                meta=None,
-                user=None,
-            ),
-            mock.call(
-                DEFAULT_KIND,
-                object_id=105,
-                project_id=84,
-                video_id=None,
-                meta=None,
-                user=None,
-            )
-        ], any_order=False)
+        # now check that the objects were all published as app events in
+        # a single batch. We assert that the order is correct and that
+        # the data they are called with is also correct.
+        publish_appevents_mock.assert_called_once_with([
+            {
+                "kind": DEFAULT_KIND,
+                "object_id": obj_id,
+                "project_id": 84,
+                "video_id": None,
+                "meta": None,
+                "user": None,
+            } for obj_id in (55, 78, 105)
+        ])
 
 
 class PublishTests(AppengineTestBed):
@@ -257,6 +230,147 @@ class PublishTests(AppengineTestBed):
         self.assertEqual(event.user, user)
 
 
+class PublishManyTests(AppengineTestBed):
+    """
+        Tests for :func:`greenday_core.eventbus.publish_appevents <greenday_core.eventbus.publish_appevents>`
+    """
+    @mock.patch("greenday_core.eventbus.taskqueue.Queue")
+    def test_publish_many(self, mock_queue):
+        """
+            Publish a batch of events in one transaction with batched tasks
+        """
+        user = milkman.deliver(get_user_model())
+
+        event_ids = publish_appevents([
+            {
+                "kind": EventKind.VIDEOCREATED,
+                "object_id": i,
+                "project_id": 84,
+                "video_id": i,
+                "user": user
+            } for i in range(150)])
+
+        events = Event.objects.order_by("pk")
+        self.assertEqual([e.pk for e in events], event_ids)
+        self.assertEqual(range(150), [e.object_id for e in events])
+
+        for event in events:
+            self.assertEqual(EventKind.VIDEOCREATED, event.kind)
+            self.assertEqual(
+                (EventModel.VIDEO, EventCommonCodes.CREATED),
+                (event.object_kind, event.event_kind))
+            self.assertEqual(user, event.user)
+
+        # 3 tasks of 50 events are added in one batch
+        mock_add = mock_queue.return_value.add
+        self.assertEqual(
+            [3], [len(c[0][0]) for c in mock_add.call_args_list])
+
+    @mock.patch("greenday_core.eventbus.taskqueue.Queue")
+    def test_publish_identical(self, mock_queue):
+        """
+            Identical events, even from earlier batches, get their own IDs
+        """
+        event = {"kind": EventKind.VIDEOCREATED, "object_id": 1}
+
+        first_ids = publish_appevents([event])
+        event_ids = publish_appevents([event, event])
+
+        self.assertEqual(
+            [e.pk for e in Event.objects.order_by("pk")],
+            first_ids + event_ids)
+
+    def test_publish_none(self):
+        """
+            Publishing no events does nothing
+        """
+        with self.assertNumQueries(0):
+            self.assertEqual([], publish_appevents([]))
+
+
+class BufferTests(AppengineTestBed):
+    """
+        Tests for :func:`greenday_core.eventbus.buffered_appevents <greenday_core.eventbus.buffered_appevents>`
+    """
+    def setUp(self):
+        """
+            Bootstrap test data
+        """
+        super(BufferTests, self).setUp()
+        self.user = milkman.deliver(get_user_model())
+
+    def publish(self, object_id):
+        """
+            Publishes a test event
+        """
+        publish_appevent(
+            EventKind.VIDEOCREATED,
+            object_id=object_id,
+            project_id=84,
+            video_id=object_id,
+            user=self.user)
+
+    def test_buffered(self):
+        """
+            Events are published once when the block exits
+        """
+        with buffered_appevents():
+            self.publish(1)
+            self.publish(2)
+            self.publish(1)
+            publish_appevents([{
+                "kind": EventKind.VIDEOCREATED,
+                "object_id": 3,
+                "project_id": 84,
+                "video_id": 3,
+                "user": self.user
+            }])
+
+            self.assertEqual(0, Event.objects.count())
+
+        self.assertEqual(
+            [1, 2, 3],
+            list(Event.objects.order_by("pk")
+                 .values_list("object_id", flat=True)))
+
+    def test_discarded_on_error(self):
+        """
+            Events are discarded if the block raises
+        """
+        with self.assertRaises(ValueError):
+            with buffered_appevents():
+                self.publish(1)
+                raise ValueError
+
+        self.assertEqual(0, Event.objects.count())
+
+        # the buffer is closed
+        self.publish(2)
+        self.assertEqual(1, Event.objects.count())
+
+    def test_nested(self):
+        """
+            A nested block which raises only discards its own events
+        """
+        with buffered_appevents():
+            self.publish(1)
+
+            try:
+                with buffered_appevents():
+                    self.publish(2)
+                    raise ValueError
+            except ValueError:
+                pass
+
+            with buffered_appevents():
+                self.publish(3)
+
+        self.assertEqual(
+            [1, 3],
+            list(Event.objects.order_by("pk")
+                 .values_list("object_id", flat=True)))
+
+
 class EventRetrievalTests(AppengineTestBed):
     """
         Tests for :func:`greenday_core.eventbus.get_events <greenday_core.eventbus.get_events>`
@@ -364,6 +478,44 @@ class EventRetrievalTests(AppengineTestBed):
         self.assertEqual(events[2].pk, self.event_1.pk)
         self.assertEqual(events[3].pk, self.event_3.pk)
 
+    def test_cursor(self):
+        """
+            Only events after the cursor's position are returned
+        """
+        events = get_events(
+            self.now - datetime.timedelta(minutes=15),
+            cursor=encode_event_cursor(self.reload(self.event_4)))
+
+        self.assertEqual(
+            [self.event_1.pk, self.event_3.pk], [e.pk for e in events])
+
+    def test_cursor_same_timestamp(self):
+        """
+            Events sharing the cursor's timestamp are split on their pk
+        """
+        event_5 = Event.objects.create(
+            timestamp=self.reload(self.event_4).timestamp,
+            kind=EventKind.PROJECTUPDATED
+        )
+
+        events = get_events(
+            self.now - datetime.timedelta(minutes=15),
+            cursor=encode_event_cursor(self.reload(event_5)))
+
+        self.assertEqual(
+            [self.event_4.pk, self.event_1.pk, self.event_3.pk],
+            [e.pk for e in events])
+
+    def test_invalid_cursor(self):
+        """
+            A malformed cursor raises ValueError
+        """
+        for cursor in (
+                u"rubbish",
+                base64.urlsafe_b64encode("yesterday|1"),
+                base64.urlsafe_b64encode("2015-01-01T00:00:00|x")):
+            self.assertRaises(ValueError, decode_event_cursor, cursor)
+
 
 class EventRetrievalWithObjectsTests(AppengineTestBed):
     """
@@ -396,7 +548,7 @@ class EventRetrievalWithObjectsTests(AppengineTestBed):
             video_id=video.pk
         )
 
-        events, objects = get_events_with_objects(
+        events, objects, next_cursor = get_events_with_objects(
             self.now - datetime.timedelta(minutes=15))
 
         self.assertIn('project', objects)
@@ -418,10 +570,81 @@ class EventRetrievalWithObjectsTests(AppengineTestBed):
             object_id=999
         )
 
-        events, objects = get_events_with_objects(
+        events, objects, next_cursor = get_events_with_objects(
             self.now - datetime.timedelta(minutes=15))
 
         self.assertIn('project', objects)
 
         self.assertEqual(events[0].id, project_event.pk)
         self.assertEqual(len(objects['project']), 0)
+
+    def test_paged(self):
+        """
+            Events are returned a page at a time with a cursor for the next
+            page
+        """
+        created = [
+            Event.objects.create(
+                timestamp=self.now - datetime.timedelta(minutes=i),
+                kind=EventKind.PROJECTCREATED)
+            for i in range(1, 6)
+        ]
+
+        events, objects, next_cursor = get_events_with_objects(
+            self.now - datetime.timedelta(minutes=15), page_size=3)
+
+        self.assertEqual(
+            [e.pk for e in created[:3]], [e.pk for e in events])
+        self.assertIsNotNone(next_cursor)
+
+        events, objects, next_cursor = get_events_with_objects(
+            self.now - datetime.timedelta(minutes=15),
+            page_size=3,
+            cursor=next_cursor)
+
+        self.assertEqual(
+            [e.pk for e in created[3:]], [e.pk for e in events])
+        self.assertIsNone(next_cursor)
+
+    @mock.patch("greenday_core.eventbus.EVENT_PAGE_SIZE", 2)
+    def test_unpaged(self):
+        """
+            All events are returned if no page size or cursor is passed
+        """
+        for i in range(1, 4):
+            Event.objects.create(
+                timestamp=self.now - datetime.timedelta(minutes=i),
+                kind=EventKind.PROJECTCREATED)
+
+        events, objects, next_cursor = get_events_with_objects(
+            self.now - datetime.timedelta(minutes=15))
+
+        self.assertEqual(3, len(events))
+        self.assertIsNone(next_cursor)
+
+    @mock.patch("greenday_core.eventbus.MAX_EVENT_PAGE_SIZE", 2)
+    def test_max_page_size(self):
+        """
+            The page size is capped
+        """
+        for i in range(1, 4):
+            Event.objects.create(
+                timestamp=self.now - datetime.timedelta(minutes=i),
+                kind=EventKind.PROJECTCREATED)
+
+        events, objects, next_cursor = get_events_with_objects(
+            self.now - datetime.timedelta(minutes=15), page_size=100)
+
+        self.assertEqual(2, len(events))
+        self.assertIsNotNone(next_cursor)
+
+    def test_invalid_page_size(self):
+        """
+            Page sizes below 1 are rejected
+        """
+        for page_size in (0, -2):
+            self.assertRaises(
+                ValueError,
+                get_events_with_objects,
+                self.now - datetime.timedelta(minutes=15),
+                page_size=page_size)
@@ -0,0 +1,664 @@
+"""
+    Tests for :mod:`greenday_core.memoize_cache <greenday_core.memoize_cache>`
+"""
+import mock
+import os
+from milkman.dairy import milkman
+from protorpc import messages
+from protorpc.protojson import encode_message
+
+from django.core.cache import caches
+from django.test.utils import override_settings
+
+from ..memoize_cache import (
+    MemoiseCacheManager,
+    LocalLRUCache,
+    FORMAT_ZLIB,
+    FORMAT_CHUNKED,
+    PreEncodedMessage,
+    memoised,
+    serialise_key_arg
+)
+from ..models import Project, ProjectTag, GlobalTag
+from .base import AppengineTestBed
+
+
+class DummyMessage(messages.Message):
+    """
+        Message used to test encoding of cached values
+    """
+    name = messages.StringField(1)
+    count = messages.IntegerField(2)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'memoise-tests',
+    }
+})
+class MemoiseCacheTestBase(AppengineTestBed):
+    """
+        Test base giving a cache manager backed by a real cache
+    """
+    def setUp(self):
+        """
+            Creates a cache manager
+        """
+        super(MemoiseCacheTestBase, self).setUp()
+        caches['default'].clear()
+        self.manager = self.create_manager()
+
+    def create_manager(self, **kwargs):
+        """
+            Creates a manager with local caching enabled
+        """
+        kwargs.setdefault('default_timeout', 60)
+        kwargs.setdefault('local_cache_size', 10)
+        kwargs.setdefault('local_timeout', 5)
+        kwargs.setdefault('stamp_check_interval', 0)
+        return MemoiseCacheManager(**kwargs)
+
+
+class GetOrSetTestCase(MemoiseCacheTestBase):
+    """
+        Tests for :func:`greenday_core.memoize_cache.MemoiseCacheManager.get_or_set <greenday_core.memoize_cache.MemoiseCacheManager.get_or_set>`
+    """
+    def test_get_or_set(self):
+        """
+            Function should only be called on a cache miss
+        """
+        fn = mock.Mock(return_value=42, __name__="fn")
+
+        self.assertEqual(42, self.manager.get_or_set(fn, 1, foo="bar"))
+        self.assertEqual(42, self.manager.get_or_set(fn, 1, foo="bar"))
+        fn.assert_called_once_with(1, foo="bar")
+
+        self.manager.get_or_set(fn, 2, foo="bar")
+        self.assertEqual(2, fn.call_count)
+
+    def test_message_type(self):
+        """
+            Protorpc messages are encoded in memcache and decoded on reads
+        """
+        fn = mock.Mock(
+            return_value=DummyMessage(name="foo", count=3), __name__="fn")
+
+        self.manager.get_or_set(fn, message_type=DummyMessage)
+
+        # read from a different manager so the local cache isn't hit
+        other = self.create_manager()
+        obj = other.get_or_set(fn, message_type=DummyMessage)
+
+        self.assertEqual(1, fn.call_count)
+        self.assertEqual("foo", obj.name)
+        self.assertEqual(3, obj.count)
+
+    def test_encoder(self):
+        """
+            Responses cached with an encoder are returned pre-encoded
+        """
+        message = DummyMessage(name="foo", count=3)
+        fn = mock.Mock(return_value=message, __name__="fn")
+
+        obj = self.manager.get_or_set(
+            fn, message_type=DummyMessage, encoder=encode_message)
+        self.assertIsInstance(obj, PreEncodedMessage)
+        self.assertEqual(encode_message(message), obj.data)
+        self.assertIs(message, obj.to_message())
+
+        other = self.create_manager()
+        obj = other.get_or_set(
+            fn, message_type=DummyMessage, encoder=encode_message)
+
+        self.assertEqual(1, fn.call_count)
+        self.assertEqual(encode_message(message), obj.data)
+        self.assertEqual(message, obj.to_message())
+
+
+class LocalCacheTestCase(MemoiseCacheTestBase):
+    """
+        Tests for the local cache tier of :class:`greenday_core.memoize_cache.MemoiseCacheManager <greenday_core.memoize_cache.MemoiseCacheManager>`
+    """
+    def test_local_hit(self):
+        """
+            Warm local cache should not touch memcache
+        """
+        fn = mock.Mock(return_value=42, __name__="fn")
+        self.manager.get_or_set(fn)
+
+        with mock.patch.object(self.manager.cache, 'get') as get_mock:
+            self.manager.stamp_check_interval = 60
+            self.assertEqual(42, self.manager.get_or_set(fn))
+            self.assertFalse(get_mock.called)
+
+    def test_delete_seen_by_other_instances(self):
+        """
+            Deleting on one manager invalidates the local cache of another
+        """
+        fn = mock.Mock(side_effect=[1, 2, 3], __name__="fn")
+        other = self.create_manager()
+
+        self.assertEqual(1, self.manager.get_or_set(fn))
+        self.assertEqual(1, other.get_or_set(fn))
+
+        self.manager.delete(fn)
+
+        self.assertEqual(2, other.get_or_set(fn))
+        self.assertEqual(2, self.manager.get_or_set(fn))
+
+    def test_lost_add_not_cached_locally(self):
+        """
+            A value is not held locally if another caller set the key first
+        """
+        fn = mock.Mock(return_value=1, __name__="fn")
+        key = self.manager.create_key(fn, (), {})
+        other = self.create_manager()
+        other.add_by_key(key, 2)
+
+        with mock.patch.object(
+                self.manager, 'get_by_key', return_value=None):
+            self.assertEqual(1, self.manager.get_or_set(fn))
+
+        self.assertEqual(2, self.manager.get_or_set(fn))
+
+    def test_legacy_entry_replaced(self):
+        """
+            Entries stored before they carried their expiry are recomputed
+            once and replaced
+        """
+        fn = mock.Mock(return_value=42, __name__="fn")
+        key = self.manager.create_key(fn, (), {})
+        self.manager.cache.set(key, 41, version=self.manager.version)
+
+        self.assertEqual(42, self.manager.get_or_set(fn))
+        self.manager.local_cache.clear()
+        self.assertEqual(42, self.manager.get_or_set(fn))
+        fn.assert_called_once_with()
+
+    def test_disabled(self):
+        """
+            Local cache can be switched off
+        """
+        manager = self.create_manager(local_cache_size=0)
+        self.assertIsNone(manager.local_cache)
+
+        fn = mock.Mock(return_value=42, __name__="fn")
+        self.assertEqual(42, manager.get_or_set(fn))
+        self.assertEqual(42, manager.get_or_set(fn))
+        fn.assert_called_once_with()
+
+
+class LocalLRUCacheTestCase(AppengineTestBed):
+    """
+        Tests for :class:`greenday_core.memoize_cache.LocalLRUCache <greenday_core.memoize_cache.LocalLRUCache>`
+    """
+    def test_eviction(self):
+        """
+            Least recently used entries are evicted first
+        """
+        cache = LocalLRUCache(2, 60)
+        cache.set("a", 1, 0)
+        cache.set("b", 2, 0)
+        cache.get("a", 0)
+        cache.set("c", 3, 0)
+
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.get("a", 0))
+        self.assertIsNone(cache.get("b", 0))
+        self.assertEqual(3, cache.get("c", 0))
+
+    def test_expiry(self):
+        """
+            Expired entries are not returned
+        """
+        cache = LocalLRUCache(2, 60)
+
+        with mock.patch("greenday_core.memoize_cache.time.time") as time_mock:
+            time_mock.return_value = 1000
+            cache.set("a", 1, 0, timeout=10)
+
+            time_mock.return_value = 1011
+            self.assertIsNone(cache.get("a", 0))
+
+    def test_stamp(self):
+        """
+            Entries stored under an old stamp are not returned
+        """
+        cache = LocalLRUCache(2, 60)
+        cache.set("a", 1, 0)
+
+        self.assertIsNone(cache.get("a", 1))
+
+
+class ScopesTestCase(MemoiseCacheTestBase):
+    """
+        Tests for cache scopes on :class:`greenday_core.memoize_cache.MemoiseCacheManager <greenday_core.memoize_cache.MemoiseCacheManager>`
+    """
+    def test_invalidate_scope(self):
+        """
+            Invalidating a scope invalidates all calls cached under it
+        """
+        fn = mock.Mock(side_effect=lambda x: x * 2, __name__="fn")
+
+        for x in (1, 2):
+            self.manager.get_or_set(fn, x, scopes=["project:1"])
+        self.manager.get_or_set(fn, 3, scopes=["project:2"])
+        self.assertEqual(3, fn.call_count)
+
+        self.manager.invalidate_scopes("project:1")
+
+        # a second instance should also see the invalidation
+        other = self.create_manager()
+        for x in (1, 2):
+            self.assertEqual(x * 2, other.get_or_set(
+                fn, x, scopes=["project:1"]))
+        self.assertEqual(5, fn.call_count)
+
+        # project:2 is unaffected
+        other.get_or_set(fn, 3, scopes=["project:2"])
+        self.assertEqual(5, fn.call_count)
+
+    def test_local_cache_kept(self):
+        """
+            Invalidating a scope leaves other values in the local cache
+            of every instance
+        """
+        fn = mock.Mock(return_value=42, __name__="fn")
+        self.manager.get_or_set(fn)
+        stamp = self.manager.get_stamp()
+
+        self.create_manager().invalidate_scopes("project:1")
+
+        self.assertEqual(stamp, self.manager.get_stamp())
+        with mock.patch.object(self.manager.cache, 'get') as get_mock:
+            self.manager.stamp_check_interval = 60
+            self.assertEqual(42, self.manager.get_or_set(fn))
+            self.assertFalse(get_mock.called)
+
+    def test_local_generation_expires(self):
+        """
+            Generations held locally are re-read after
+            `stamp_check_interval`
+        """
+        fn = mock.Mock(side_effect=[1, 2], __name__="fn")
+        manager = self.create_manager(stamp_check_interval=1)
+
+        with mock.patch("greenday_core.memoize_cache.time.time") as time_mock:
+            time_mock.return_value = 1000
+            self.assertEqual(
+                1, manager.get_or_set(fn, scopes=["project:1"]))
+
+            self.create_manager().invalidate_scopes("project:1")
+            self.assertEqual(
+                1, manager.get_or_set(fn, scopes=["project:1"]))
+
+            time_mock.return_value = 1002
+            self.assertEqual(
+                2, manager.get_or_set(fn, scopes=["project:1"]))
+
+    def test_missing_generation(self):
+        """
+            Invalidating a scope with no generation in memcache creates one
+        """
+        self.manager.invalidate_scopes("user:1")
+
+        self.assertEqual(1, len(self.manager.get_generations(["user:1"])))
+
+
+class LeaseTestCase(MemoiseCacheTestBase):
+    """
+        Tests for stale-while-revalidate behaviour of :func:`greenday_core.memoize_cache.MemoiseCacheManager.get_or_set <greenday_core.memoize_cache.MemoiseCacheManager.get_or_set>`
+    """
+    def setUp(self):
+        """
+            Disable the local cache so that memcache is always read
+        """
+        super(LeaseTestCase, self).setUp()
+        self.manager = self.create_manager(local_cache_size=0, lease_wait=0)
+
+    def test_stale_served_whilst_leased(self):
+        """
+            Callers get the stale value whilst another caller holds the lease
+        """
+        fn = mock.Mock(side_effect=[1, 2], __name__="fn")
+
+        with mock.patch("greenday_core.memoize_cache.time.time") as time_mock:
+            time_mock.return_value = 1000
+            self.assertEqual(
+                1, self.manager.get_or_set(
+                    fn, timeout=10, stale_timeout=60))
+
+            time_mock.return_value = 1011
+            key = self.manager.create_key(fn, (), {})
+            self.assertTrue(self.manager.acquire_lease(key))
+
+            self.assertEqual(
+                1, self.manager.get_or_set(
+                    fn, timeout=10, stale_timeout=60))
+            self.assertEqual(1, fn.call_count)
+
+            self.manager.release_lease(key)
+
+            self.assertEqual(
+                2, self.manager.get_or_set(
+                    fn, timeout=10, stale_timeout=60))
+            self.assertEqual(2, fn.call_count)
+
+            # lease is released after recomputing
+            self.assertTrue(self.manager.acquire_lease(key))
+
+    def test_missing_value_leased(self):
+        """
+            Callers compute the value themselves if there is nothing to serve
+            and the lease holder doesn't set it in time
+        """
+        fn = mock.Mock(return_value=1, __name__="fn")
+        key = self.manager.create_key(fn, (), {})
+        self.manager.acquire_lease(key)
+
+        self.assertEqual(
+            1, self.manager.get_or_set(fn, timeout=10, stale_timeout=60))
+        fn.assert_called_once_with()
+
+
+class GetManyOrSetTestCase(MemoiseCacheTestBase):
+    """
+        Tests for :func:`greenday_core.memoize_cache.MemoiseCacheManager.get_many_or_set <greenday_core.memoize_cache.MemoiseCacheManager.get_many_or_set>`
+    """
+    def test_get_many_or_set(self):
+        """
+            Only misses are computed and results are returned in order
+        """
+        fn = mock.Mock(side_effect=lambda x: x * 2, __name__="fn")
+
+        self.manager.get_or_set(fn, 2)
+        self.assertEqual(1, fn.call_count)
+
+        other = self.create_manager()
+        with mock.patch.object(
+                other.cache, 'get_many',
+                wraps=other.cache.get_many) as get_many_mock:
+            results = other.get_many_or_set(fn, [(1,), (2,), (3,)])
+
+        self.assertEqual([2, 4, 6], results)
+        self.assertEqual(1, get_many_mock.call_count)
+        self.assertEqual(3, fn.call_count)
+
+        # all cached now
+        self.assertEqual(
+            [2, 4, 6],
+            self.create_manager().get_many_or_set(fn, [(1,), (2,), (3,)]))
+        self.assertEqual(3, fn.call_count)
+
+    def test_batch_fn(self):
+        """
+            Misses are computed with a single call to the batch function
+        """
+        fn = mock.Mock(__name__="fn")
+        batch_fn = mock.Mock(
+            side_effect=lambda arg_tuples: [
+                DummyMessage(name=name) for name, in arg_tuples])
+
+        results = self.manager.get_many_or_set(
+            fn, [("a",), ("b",)],
+            batch_fn=batch_fn,
+            message_type=DummyMessage)
+
+        self.assertEqual(["a", "b"], [r.name for r in results])
+        batch_fn.assert_called_once_with([("a",), ("b",)])
+        self.assertFalse(fn.called)
+
+        results = self.create_manager().get_many_or_set(
+            fn, [("b",), ("a",)],
+            batch_fn=batch_fn,
+            message_type=DummyMessage)
+        self.assertEqual(["b", "a"], [r.name for r in results])
+        self.assertEqual(1, batch_fn.call_count)
+
+
+@mock.patch("greenday_core.memoize_cache.COMPRESS_THRESHOLD", 10)
+@mock.patch("greenday_core.memoize_cache.CHUNK_SIZE", 20)
+class LargeValueTestCase(MemoiseCacheTestBase):
+    """
+        Tests for compression and chunking of large values by :class:`greenday_core.memoize_cache.MemoiseCacheManager <greenday_core.memoize_cache.MemoiseCacheManager>`
+    """
+    def setUp(self):
+        """
+            Disable the local cache so that memcache is always read
+        """
+        super(LargeValueTestCase, self).setUp()
+        self.manager = self.create_manager(local_cache_size=0)
+
+    def test_compressed(self):
+        """
+            Values over the threshold are compressed
+        """
+        value = "a" * 100
+        entry, chunks, size = self.manager.pack_entry("key", value, 0)
+
+        self.assertEqual(FORMAT_ZLIB, entry[1])
+        self.assertEqual({}, chunks)
+
+        fn = mock.Mock(return_value=value, __name__="fn")
+        self.manager.get_or_set(fn)
+        self.assertEqual(value, self.manager.get_or_set(fn))
+        fn.assert_called_once_with()
+
+    def test_chunked(self):
+        """
+            Values still over the chunk size once compressed are chunked
+        """
+        value = DummyMessage(name=os.urandom(200).encode('hex'))
+        entry, chunks, size = self.manager.pack_entry(
+            "key", value, 0, message_type=DummyMessage)
+
+        self.assertEqual(FORMAT_CHUNKED, entry[1])
+        self.assertGreater(len(chunks), 1)
+
+        fn = mock.Mock(return_value=value, __name__="fn")
+        self.manager.get_or_set(fn, message_type=DummyMessage)
+        self.assertEqual(
+            value.name,
+            self.manager.get_or_set(fn, message_type=DummyMessage).name)
+        fn.assert_called_once_with()
+
+    def test_missing_chunk(self):
+        """
+            A missing chunk is treated as a cache miss
+        """
+        value = os.urandom(200)
+        fn = mock.Mock(return_value=value, __name__="fn")
+        self.manager.get_or_set(fn)
+
+        key = self.manager.create_key(fn, (), {})
+        entry = self.manager.cache.get(key, version=self.manager.version)
+        token, count = entry[2]
+        self.manager.cache.delete(
+            self.manager._chunk_key(key, token, count - 1),
+            version=self.manager.version)
+
+        self.assertIsNone(self.manager.get_by_key(key))
+
+
+class MemoisedTestCase(MemoiseCacheTestBase):
+    """
+        Tests for :func:`greenday_core.memoize_cache.memoised <greenday_core.memoize_cache.memoised>`
+    """
+    def setUp(self):
+        """
+            Uses the test manager for memoised calls
+        """
+        super(MemoisedTestCase, self).setUp()
+        patcher = mock.patch(
+            "greenday_core.memoize_cache.cache_manager", self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.project = milkman.deliver(Project)
+        self.other_project = milkman.deliver(Project)
+
+    def add_tag(self, project):
+        """
+            Adds a ProjectTag to the given project
+        """
+        return ProjectTag.add_root(
+            project=project, global_tag=milkman.deliver(GlobalTag))
+
+    def test_invalidated_by_dependency(self):
+        """
+            Saving or deleting a dependency within the scope invalidates the
+            cached call
+        """
+        fn = mock.Mock(side_effect=lambda project: project.pk, __name__="fn")
+        cached_fn = memoised(
+            depends_on=[ProjectTag],
+            scope=lambda project: project.pk)(fn)
+
+        for _ in range(2):
+            self.assertEqual(self.project.pk, cached_fn(self.project))
+        self.assertEqual(1, fn.call_count)
+
+        # other projects' tags are not a dependency
+        self.add_tag(self.other_project)
+        cached_fn(self.project)
+        self.assertEqual(1, fn.call_count)
+
+        tag = self.add_tag(self.project)
+        cached_fn(self.project)
+        self.assertEqual(2, fn.call_count)
+
+        tag.delete()
+        cached_fn(self.project)
+        self.assertEqual(3, fn.call_count)
+
+
+class CreateKeyTestCase(AppengineTestBed):
+    """
+        Tests for :func:`greenday_core.memoize_cache.MemoiseCacheManager.create_key <greenday_core.memoize_cache.MemoiseCacheManager.create_key>`
+    """
+    def test_message_field_order(self):
+        """
+            Keys don't depend on the order message fields were assigned in
+        """
+        msg_1 = DummyMessage(name="foo")
+        msg_1.count = 1
+        msg_2 = DummyMessage(count=1)
+        msg_2.name = "foo"
+
+        self.assertEqual(
+            MemoiseCacheManager.create_key("fn", (msg_1,), {}),
+            MemoiseCacheManager.create_key("fn", (msg_2,), {}))
+        self.assertNotEqual(
+            MemoiseCacheManager.create_key("fn", (msg_1,), {}),
+            MemoiseCacheManager.create_key(
+                "fn", (DummyMessage(name="foo", count=2),), {}))
+
+    def test_kwargs_order(self):
+        """
+            Keys don't depend on kwarg or dict ordering
+        """
+        self.assertEqual(
+            MemoiseCacheManager.create_key(
+                "fn", (), {"a": 1, "b": {"x": 1, "y": 2}}),
+            MemoiseCacheManager.create_key(
+                "fn", (), {"b": {"y": 2, "x": 1}, "a": 1L}))
+
+    def test_model(self):
+        """
+            Models are reduced to their label and primary key
+        """
+        self.assertEqual(
+            u"<greenday_core.project: 42>",
+            serialise_key_arg(Project(pk=42)))
+
+    def test_queryset_not_evaluated(self):
+        """
+            Querysets are serialised without running a query
+        """
+        project = milkman.deliver(Project)
+        qs = Project.objects.filter(pk=project.pk)
+
+        with self.assertNumQueries(0):
+            key = MemoiseCacheManager.create_key("fn", (qs,), {})
+
+        self.assertIsNone(qs._result_cache)
+        self.assertNotEqual(
+            key,
+            MemoiseCacheManager.create_key(
+                "fn", (Project.objects.filter(pk=project.pk + 1),), {}))
+
+    def test_empty_queryset(self):
+        """
+            Querysets which can never match anything are serialised without
+            running a query
+        """
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                serialise_key_arg(Project.objects.none()),
+                serialise_key_arg(Project.objects.filter(pk__in=[])))
+
+        self.assertNotEqual(
+            serialise_key_arg(Project.objects.none()),
+            serialise_key_arg(GlobalTag.objects.none()))
+
+
+class StatsTestCase(MemoiseCacheTestBase):
+    """
+        Tests for :class:`greenday_core.memoize_cache.MemoiseStats <greenday_core.memoize_cache.MemoiseStats>`
+    """
+    def test_report(self):
+        """
+            Hits and misses are recorded per function and merged across
+            instances
+        """
+        fn = mock.Mock(return_value=42, __name__="fn")
+        other = self.create_manager()
+
+        self.manager.get_or_set(fn)
+        self.manager.get_or_set(fn)
+        other.get_or_set(fn)
+
+        self.assertTrue(self.manager.stats.flush())
+        self.assertTrue(other.stats.flush())
+
+        report = self.manager.stats.get_report()
+        self.assertEqual(1, len(report))
+        self.assertEqual("mock.fn", report[0]['name'])
+        self.assertEqual(2, report[0]['hits'])
+        self.assertEqual(1, report[0]['misses'])
+        self.assertAlmostEqual(2.0 / 3, report[0]['hit_ratio'])
+        self.assertIsNotNone(report[0]['compute_p95'])
+        self.assertGreater(report[0]['mean_size'], 0)
+
+    def test_flush_locked(self):
+        """
+            Stats are kept locally whilst another instance is flushing
+        """
+        self.manager.stats.record_hits("fn")
+        self.manager.stats.cache.add(
+            "memoise-stats-lock", 1, version=self.manager.version)
+
+        self.assertFalse(self.manager.stats.flush())
+        self.assertEqual([], self.manager.stats.get_report())
+
+        self.manager.stats.cache.delete(
+            "memoise-stats-lock", version=self.manager.version)
+        self.assertTrue(self.manager.stats.flush())
+        self.assertEqual(1, self.manager.stats.get_report()[0]['hits'])
+
+    def test_maybe_flush_locked(self):
+        """
+            Calls made whilst another instance is flushing don't each try
+            to take the lock
+        """
+        stats = self.manager.stats
+        stats.cache.add("memoise-stats-lock", 1, version=self.manager.version)
+        stats._flushed = 0
+
+        with mock.patch.object(
+                stats.cache, 'add', wraps=stats.cache.add) as add_mock:
+            stats.record_hits("fn")
+            stats.record_hits("fn")
+
+        self.assertEqual(1, add_mock.call_count)
@@ -0,0 +1,154 @@
+"""
+    Tests for :mod:`greenday_core.update_counters <greenday_core.update_counters>`
+"""
+import datetime
+from milkman.dairy import milkman
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from ..constants import EventKind
+from ..eventbus import publish_appevents
+from ..models import Event, Project, ProjectUpdateCounter
+from ..update_counters import (
+    UPDATE_KINDS,
+    get_update_counts,
+    rebuild_update_counters,
+    reconcile_update_counters
+)
+from .base import AppengineTestBed
+
+
+class UpdateCountersTestCase(AppengineTestBed):
+    """
+        Tests for :func:`greenday_core.update_counters.get_update_counts <greenday_core.update_counters.get_update_counts>`
+    """
+    def setUp(self):
+        """
+            Bootstrap test data
+        """
+        super(UpdateCountersTestCase, self).setUp()
+        self.now = timezone.now()
+
+        self.user = milkman.deliver(get_user_model())
+        self.project = milkman.deliver(Project)
+        self.project.set_owner(self.user)
+        self.project.set_updates_viewed(
+            self.user, last_viewed_at=self.now - datetime.timedelta(hours=1))
+
+    def get_counts(self):
+        """
+            Gets the user's update counts
+        """
+        return get_update_counts(
+            self.reload(self.project.get_user_relation(self.user)))
+
+    def create_event(self, kind, minutes_ago=1):
+        """
+            Creates an event on the project
+        """
+        return Event.objects.create(
+            timestamp=self.now - datetime.timedelta(minutes=minutes_ago),
+            kind=kind,
+            project_id=self.project.pk,
+            object_id=1)
+
+    def test_incremented(self):
+        """
+            New update events are counted
+        """
+        self.create_event(EventKind.VIDEOCREATED)
+        self.create_event(EventKind.VIDEOCREATED)
+        self.create_event(EventKind.USERACCEPTEDPROJECTINVITE)
+        self.create_event(EventKind.VIDEOUPDATED)
+
+        project_user = self.reload(
+            self.project.get_user_relation(self.user))
+        with self.assertNumQueries(1):
+            counts = get_update_counts(project_user)
+
+        self.assertEqual(2, counts[EventKind.VIDEOCREATED])
+        self.assertEqual(1, counts[EventKind.USERACCEPTEDPROJECTINVITE])
+
+    def test_incremented_by_batch(self):
+        """
+            Events published in a batch are counted
+        """
+        publish_appevents([
+            {"kind": EventKind.VIDEOCREATED,
+             "object_id": i,
+             "project_id": self.project.pk}
+            for i in range(3)
+        ])
+
+        self.assertEqual(3, self.get_counts()[EventKind.VIDEOCREATED])
+
+    def test_reset(self):
+        """
+            Viewing the updates zeroes the counters
+        """
+        self.create_event(EventKind.VIDEOCREATED)
+
+        self.project.set_updates_viewed(self.user)
+
+        self.assertEqual(0, self.get_counts()[EventKind.VIDEOCREATED])
+
+    def test_stale_rebuilt(self):
+        """
+            Counters which count from a different timestamp are rebuilt
+        """
+        self.create_event(EventKind.VIDEOCREATED, minutes_ago=30)
+        self.create_event(EventKind.VIDEOCREATED, minutes_ago=10)
+
+        project_user = self.project.get_user_relation(self.user)
+        project_user.last_updates_viewed = (
+            self.now - datetime.timedelta(minutes=20))
+        project_user.save()
+
+        self.assertEqual(1, self.get_counts()[EventKind.VIDEOCREATED])
+        self.assertEqual(
+            1,
+            ProjectUpdateCounter.objects.get(
+                project=self.project,
+                user=self.user,
+                kind=EventKind.VIDEOCREATED.value).count)
+
+    def test_reconcile(self):
+        """
+            Reconciling fixes counters which have drifted
+        """
+        self.create_event(EventKind.VIDEOCREATED)
+        ProjectUpdateCounter.objects.filter(
+            project=self.project, user=self.user).update(count=42)
+
+        reconcile_update_counters()
+
+        self.assertEqual(1, self.get_counts()[EventKind.VIDEOCREATED])
+
+    def test_rebuild_upserts(self):
+        """
+            Rebuilding updates existing counters in place and creates any
+            which are missing
+        """
+        self.create_event(EventKind.VIDEOCREATED)
+        self.create_event(EventKind.USERACCEPTEDPROJECTINVITE)
+        ProjectUpdateCounter.objects.filter(
+            project=self.project,
+            user=self.user,
+            kind=EventKind.USERACCEPTEDPROJECTINVITE.value).delete()
+        existing = ProjectUpdateCounter.objects.get(
+            project=self.project,
+            user=self.user,
+            kind=EventKind.VIDEOCREATED.value)
+
+        project_user = self.project.get_user_relation(self.user)
+        rebuild_update_counters(project_user)
+        rebuild_update_counters(project_user)
+
+        counters = ProjectUpdateCounter.objects.filter(
+            project=self.project, user=self.user)
+        self.assertEqual(len(UPDATE_KINDS), counters.count())
+        self.assertEqual(1, self.reload(existing).count)
+        self.assertEqual(
+            1,
+            counters.get(kind=EventKind.USERACCEPTEDPROJECTINVITE.value).count)
@@ -0,0 +1,213 @@
+"""
+    Materialised per-user counts of the project updates which have not
+    yet been seen
+"""
+import logging
+from collections import defaultdict
+
+import deferred_manager
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .constants import EventKind
+from .memoize_cache import cache_manager
+from .models import Event, ProjectUser, ProjectUpdateCounter
+from .task_helpers import auto_view
+
+
+# the kinds of event shown to users as project updates
+UPDATE_KINDS = (
+    EventKind.VIDEOCREATED,
+    EventKind.USERACCEPTEDPROJECTINVITE,
+)
+
+
+def update_counters_scope(project_id):
+    """
+        Gets the name of the cache scope for the update counters of a project
+    """
+    return u'project-update-counters:{0}'.format(project_id)
+
+
+def get_update_counts(project_user):
+    """
+        Gets the number of events of each of UPDATE_KINDS that the user has
+        not seen on the project since they last viewed its updates
+
+        Returns a dict of {EventKind: count}
+    """
+    counts = cache_manager.get_or_set(
+        _get_update_counts,
+        project_user.project_id,
+        project_user.user_id,
+        project_user.last_updates_viewed,
+        scopes=[update_counters_scope(project_user.project_id)])
+
+    return {EventKind(kind): count for kind, count in counts.items()}
+
+
+def _get_update_counts(project_id, user_id, since):
+    """
+        Reads the counters, rebuilding them from the events if they are
+        missing or count from a different timestamp
+    """
+    counters = list(ProjectUpdateCounter.objects.filter(
+        project_id=project_id, user_id=user_id))
+
+    if (len(counters) != len(UPDATE_KINDS) or
+            any(c.since != since for c in counters)):
+        return _rebuild(project_id, user_id, since)
+
+    return {c.kind: c.count for c in counters}
+
+
+def reset_update_counters(project_user):
+    """
+        Zeroes the user's counters after they have viewed the project's
+        updates at `project_user.last_updates_viewed`
+    """
+    updated = (
+        ProjectUpdateCounter.objects
+        .filter(project_id=project_user.project_id,
+                user_id=project_user.user_id)
+        .update(count=0, since=project_user.last_updates_viewed)
+    )
+
+    if updated != len(UPDATE_KINDS):
+        _save_counters(
+            project_user.project_id,
+            project_user.user_id,
+            project_user.last_updates_viewed,
+            {})
+    else:
+        cache_manager.invalidate_scopes(
+            update_counters_scope(project_user.project_id))
+
+
+def rebuild_update_counters(project_user):
+    """
+        Recounts the user's counters from the events since
+        `project_user.last_updates_viewed`
+    """
+    return _rebuild(
+        project_user.project_id,
+        project_user.user_id,
+        project_user.last_updates_viewed)
+
+
+def _rebuild(project_id, user_id, since):
+    """
+        Counts the events and stores the counters
+    """
+    counts = {
+        row["kind"]: row["kind__count"]
+        for row in (
+            Event.objects
+            .filter(
+                project_id=project_id,
+                kind__in=[k.value for k in UPDATE_KINDS],
+                timestamp__gte=since)
+            .order_by()
+            .values("kind")
+            .annotate(Count("kind"))
+        )
+    }
+
+    return _save_counters(project_id, user_id, since, counts)
+
+
+def _save_counters(project_id, user_id, since, counts):
+    """
+        Replaces the user's counters with the given {kind value: count}
+
+        Counters are upserted by kind so that concurrent rebuilds for the
+        same user don't collide on the unique constraint
+    """
+    counts = {k.value: counts.get(k.value, 0) for k in UPDATE_KINDS}
+
+    with transaction.atomic():
+        (
+            ProjectUpdateCounter.objects
+            .filter(project_id=project_id, user_id=user_id)
+            .exclude(kind__in=counts.keys())
+            .delete()
+        )
+
+        for kind, count in counts.items():
+            ProjectUpdateCounter.objects.update_or_create(
+                project_id=project_id,
+                user_id=user_id,
+                kind=kind,
+                defaults={'since': since, 'count': count})
+
+    cache_manager.invalidate_scopes(update_counters_scope(project_id))
+
+    return counts
+
+
+def increment_update_counters(events):
+    """
+        Increments the counters of every user of the events' projects who
+        had last viewed updates before the event happened
+
+        Runs a single UPDATE per project and kind
+    """
+    kinds = set(k.value for k in UPDATE_KINDS)
+
+    # {(project ID, kind): [timestamps]}
+    grouped = defaultdict(list)
+    for event in events:
+        if event.project_id and event.kind in kinds:
+            grouped[(event.project_id, event.kind)].append(event.timestamp)
+
+    if not grouped:
+        return
+
+    for (project_id, kind), timestamps in grouped.items():
+        (
+            ProjectUpdateCounter.objects
+            .filter(
+                project_id=project_id,
+                kind=kind,
+                since__lte=min(timestamps))
+            .update(count=F("count") + len(timestamps))
+        )
+
+    cache_manager.invalidate_scopes(*set(
+        update_counters_scope(project_id) for project_id, _ in grouped))
+
+
+@auto_view
+def reconcile_update_counters(project_id=None):
+    """
+        Rebuilds the update counters of all users of a project from the
+        events in case they have drifted
+
+        Queues a task per project if no project is given
+    """
+    if project_id is None:
+        project_ids = (
+            ProjectUpdateCounter.objects
+            .order_by()
+            .values_list("project_id", flat=True)
+            .distinct()
+        )
+
+        for project_id in project_ids:
+            deferred_manager.defer(reconcile_update_counters, project_id)
+
+        logging.info(
+            "Queued update counter reconciliation for %s projects",
+            len(project_ids))
+        return
+
+    project_users = ProjectUser.objects.filter(
+        project_id=project_id, user__isnull=False)
+
+    for project_user in project_users:
+        rebuild_update_counters(project_user)
+
+    logging.info(
+        "Rebuilt update counters for %s users on project %s",
+        len(project_users), project_id)